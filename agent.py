@@ -5,13 +5,38 @@ import threading
 import time
 import tkinter as tk
 import webbrowser
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime
+from itertools import islice
 from tkinter import PhotoImage, filedialog, font, scrolledtext, ttk
 
 from utils.ai_utils import GPT4oAssistant
 from utils.api_utils import get_news, get_notes, get_weather, save_note
+from utils.browser_pool import SharedBrowserLease
+from utils.intent_utils import (
+    classify_intent,
+    get_intent_classifier,
+    is_confident,
+)
+from utils.result_utils import (
+    SEARCH_RESULTS_SHOWN,
+    SITE_NAMES,
+    SITE_PATTERN,
+    fan_out_search,
+    format_results,
+    iter_search_results,
+    parse_results,
+    parse_sites,
+)
+from utils.router_utils import CommandRouter
+from utils.session_utils import attach_browser, detach_browser, ensure_attached
+from utils.tool_utils import build_default_registry
 from utils.web_utils import (
+    EXTRACT_MAX_CHARS,
+    build_search_url,
     click_button,
+    close_browser,
     extract_text,
     fill_form,
     open_website,
@@ -27,20 +52,103 @@ from utils.web_utils import (
 
 USE_GUI = True
 SKIP_BROWSER = False  # Set to True to skip browser initialization
+PRECONNECT_API = True  # Open the OpenAI connection in the background at startup
+STREAM_FLUSH_INTERVAL = 0.05  # Seconds between chat redraws while streaming
+BROWSER_READY_TIMEOUT = 15  # Seconds a command waits for the browser to start
+DETACHED_BROWSER = False  # Keep the browser open across restarts and reattach to it
+BROWSER_LIVENESS_INTERVAL = 5  # Seconds between checks that it is still alive
 APP_VERSION = "1.0.0"
 
+# Command patterns in priority order. Each pattern must match the whole
+# command (case-insensitively); its groups are passed to the handler.
+COMMAND_PATTERNS = {
+    "open_website": [
+        r"open website\s+(.+)",
+        r"open\s+(.+)",
+        r"(?:please\s+)?go to\s+(.+)",
+    ],
+    "multi_search": [
+        r"(?:search for|search|find|look for|look up)\s+(.+?)\s+on\s+"
+        rf"((?:{SITE_PATTERN})(?:(?:\s*(?:,|&|\band\b)\s*)+(?:{SITE_PATTERN}))+)",
+    ],
+    "youtube_search": [
+        r"(?:search|find|look)\s+(?:on\s+)?youtube\s+for\s+(.+)",
+        r"youtube\s+(?:search|find)\s+(?:for\s+)?(.+)",
+        r"(?:search|find) on youtube\s+(.+)",
+        r"(?:search for|search|find|look for|play)\s+(.+?)\s+on\s+youtube",
+    ],
+    "google_search": [
+        r"(?:search|find|look)\s+(?:on\s+)?google\s+for\s+(.+)",
+        r"google\s+(?:search|find)\s+(?:for\s+)?(.+)",
+        r"search google\s+(.+)",
+        r"(?:search for|search|find|look for|look up)\s+(.+?)\s+on\s+google",
+    ],
+    "amazon_search": [
+        r"search amazon for\s+(.+)",
+        r"(?:find|search for|look for|buy)\s+(.+?)\s+on amazon",
+    ],
+    "github_search": [
+        r"search github for\s+(.+)",
+        r"(?:look for|find|search for)\s+(.+?)\s+on github",
+    ],
+    "stackoverflow_search": [
+        r"search stack\s*overflow for\s+(.+)",
+        r"(?:find|look for|search for)\s+(.+?)\s+on stack\s*overflow",
+    ],
+    "weather": [
+        r"(?:what(?:'s|\s+is)\s+the\s+)?weather\s+(?:like\s+)?(?:in|for|at)\s+(.+?)\??",
+        r"how(?:'s|\s+is)\s+the\s+weather\s+in\s+(.+?)\??",
+        r"(?:what(?:'s|\s+is)\s+the\s+)?weather\??",
+    ],
+    "notes_save": [r"save note(?:\s*:|\s)\s*(.*)"],
+    "notes_read": [r"(?:show|get|read)\s+(?:my\s+)?notes", r"my notes"],
+    "news": [r"(?:show\s+|get\s+)?(?:the\s+)?(?:latest\s+)?news"],
+    "help": [r"help", r"show help", r"what can you do\??"],
+    "exit": [r"exit", r"quit", r"close"],
+    "clear": [r"clear (?:chat|conversation)"],
+    "scroll": [r"scroll\s+(up|down)(?:\s+(\d+))?"],
+    "click": [r"click\s+(?:on\s+)?(.+)"],
+    "extract": [r"extract (?:the )?text(?: from the page)?"],
+    "screenshot": [r"(?:take a )?screenshot"],
+    "chat": [r"(.*)"],
+}
+
 
 class PersonalAssistant:
     def __init__(self, use_voice=False, use_chat=True):
         self.use_voice = use_voice
         self.use_chat = use_chat
-        self.browser = None
+        # The browser starts in the background so the window opens at once
+        self._browser_future = Future()
+        # When the running commands stop waiting for it to start, shared by
+        # commands that overlap and reset once none are running
+        self._browser_deadline = None
+        self._running_commands = 0
+        self._browser_wait_lock = threading.Lock()
+        # Whether the browser is a detached one, and when it last answered
+        self._browser_detached = False
+        self._browser_checked = 0.0
+        self._browser_check_lock = threading.Lock()
+        self._lean_browser = None
+        # Set once the app is closing; browsers that finish starting after
+        # that are closed right away
+        self._closing = False
+        self._lean_browser_lock = threading.Lock()
+        # Held while a multi-site search uses the lean browser
+        self._lean_browser_lease_lock = threading.Lock()
         self.setup_browser()
         self.root = None
         self.chat_window = None
         self.chat_input = None
         self.chat_history = None
         self.ai_assistant = GPT4oAssistant()
+        if PRECONNECT_API:
+            self.ai_assistant.preconnect()
+        self.tools = build_default_registry(
+            lambda: self.browser, lambda: self.get_browser("lean")
+        )
+        # Train the local intent classifier before the first message arrives
+        threading.Thread(target=get_intent_classifier, daemon=True).start()
         self.chat_count = 0
         self.conversation_context = []
         self.command_history = []
@@ -64,63 +172,103 @@ class PersonalAssistant:
             "button_secondary": "#f0f2f5",
         }
 
-        # Initialize command patterns
-        self.command_patterns = {
-            "open_website": [
-                r"open\s+(https?://[^ ]+)",
-                r"open\s+([^ ]+\.[^ ]+)",
-                r"open website\s+(.*)",
-                r"go to\s+(.*)",
-            ],
-            "youtube_search": [
-                r"search youtube for\s+(.*)",
-                r"youtube search for\s+(.*)",
-                r"find on youtube\s+(.*)",
-            ],
-            "google_search": [
-                r"search google for\s+(.*)",
-                r"google search for\s+(.*)",
-                r"google\s+(search\s+.*)",
-            ],
-            "weather": [
-                r"weather in\s+(.*)",
-                r"what's the weather in\s+(.*)",
-                r"what is the weather in\s+(.*)",
-            ],
-            "notes_save": [r"save note:\s+(.*)", r"save note\s+(.*)"],
-            "notes_read": [
-                r"show my notes",
-                r"show notes",
-                r"get notes",
-                r"read notes",
-                r"my notes",
-            ],
-            "help": [r"help"],
-            "exit": [r"exit", r"quit", r"close"],
-            "clear": [r"clear chat"],
-            "news": [r"news", r"show news", r"latest news", r"get news"],
-            "scroll": [r"scroll\s+(up|down)\s+(\d+)"],
-            "click": [r"click\s+(.*)"],
-            "extract": [r"extract text from the page"],
-            "screenshot": [r"take a screenshot"],
-            "amazon": [r"find\s+(.*)\s+on amazon"],
-            "github": [r"look for\s+(.*)\s+on github"],
-            "stackoverflow": [r"find\s+(.*)\s+on stack overflow"],
-            "chat": [r"^.*$"],
+        # Site searches: display name and search method, by SEARCH_URLS key
+        self.search_sites = {
+            "youtube": ("YouTube", self.open_youtube),
+            "google": ("Google", self.google_search),
+            "amazon": ("Amazon", self.amazon_search),
+            "github": ("GitHub", self.github_search),
+            "stackoverflow": ("Stack Overflow", self.stackoverflow_search),
         }
 
+        # Commands are routed by one regex compiled from COMMAND_PATTERNS
+        self.command_patterns = COMMAND_PATTERNS
+        self.router = self._build_router()
+
     def setup_browser(self):
-        """Initialize the web browser."""
+        """Start initializing the web browser in a background thread."""
         if SKIP_BROWSER:
             print("Skipping browser initialization for testing...")
-            self.browser = None
-        else:
+            self._browser_future.set_result(None)
+            return
+
+        def _launch():
             try:
-                self.browser = setup_browser()
+                browser = attach_browser() if DETACHED_BROWSER else None
+                self._browser_detached = browser is not None
+                if browser is None:
+                    browser = setup_browser()
                 print("Browser initialized successfully")
             except Exception as e:
                 print(f"Error initializing browser: {e}")
-                self.browser = None
+                browser = None
+            self._browser_future.set_result(browser)
+
+        # Not a daemon, so exiting waits for a launch in progress and the
+        # browser it starts is closed rather than left running
+        threading.Thread(target=_launch).start()
+
+    @property
+    def browser(self):
+        """
+        The web browser, or None if it couldn't be started.
+
+        Commands that arrive while the browser is still starting wait for
+        it, for up to BROWSER_READY_TIMEOUT seconds in all; after that they
+        get None and use the default browser instead. The wait and its
+        message happen once per command, however often it uses the browser.
+
+        A detached browser is checked to still be alive, at most every
+        BROWSER_LIVENESS_INTERVAL seconds, and reattached or relaunched if
+        its session died, e.g. because its window was closed.
+        """
+        if not self._browser_future.done():
+            with self._browser_wait_lock:
+                if self._browser_deadline is None:
+                    self._browser_deadline = time.monotonic() + BROWSER_READY_TIMEOUT
+                    self.add_message("System", "Waiting for the browser to start...")
+                remaining = max(0, self._browser_deadline - time.monotonic())
+            try:
+                self._browser_future.result(timeout=remaining)
+            except FutureTimeout:
+                print("Browser is still starting; using the default browser instead")
+                return None
+        browser = self._browser_future.result()
+
+        if not self._browser_detached:
+            return browser
+        with self._browser_check_lock:
+            browser = self._browser_future.result()
+            if time.monotonic() - self._browser_checked < BROWSER_LIVENESS_INTERVAL:
+                return browser
+            live_browser = ensure_attached(browser)
+            if live_browser is not browser:
+                self._browser_future = Future()
+                self._browser_future.set_result(live_browser)
+                self._browser_detached = live_browser is not None
+            self._browser_checked = time.monotonic()
+            return live_browser
+
+    def get_browser(self, profile="interactive"):
+        """
+        Return the browser for a browser profile.
+
+        "interactive" is the visible browser. "lean" is a headless browser
+        without images, fonts, media or trackers, for scripted runs the
+        user doesn't watch; it is started on first use.
+        """
+        if profile != "lean":
+            return self.browser
+
+        with self._lean_browser_lock:
+            if self._closing:
+                return None
+            if self._lean_browser is None and not SKIP_BROWSER:
+                try:
+                    self._lean_browser = setup_browser(profile="lean")
+                except Exception as e:
+                    print(f"Error initializing lean browser: {e}")
+            return self._lean_browser
 
     def open_website(self, url):
         """Open a specific website."""
@@ -172,7 +320,7 @@ class PersonalAssistant:
         try:
             if self.browser is None:
                 # Fallback to webbrowser module if Selenium browser is not available
-                search_url = f"https://www.youtube.com/results?search_query={search_query.replace(' ', '+')}"
+                search_url = build_search_url("youtube", search_query)
                 webbrowser.open(search_url)
                 return True
 
@@ -180,7 +328,7 @@ class PersonalAssistant:
         except Exception as e:
             print(f"Error searching YouTube with Selenium: {e}")
             # Fallback to webbrowser module
-            search_url = f"https://www.youtube.com/results?search_query={search_query.replace(' ', '+')}"
+            search_url = build_search_url("youtube", search_query)
             webbrowser.open(search_url)
             return True
 
@@ -189,9 +337,7 @@ class PersonalAssistant:
         try:
             if self.browser is None:
                 # Fallback to webbrowser module if Selenium browser is not available
-                search_url = (
-                    f"https://www.google.com/search?q={query.replace(' ', '+')}"
-                )
+                search_url = build_search_url("google", query)
                 webbrowser.open(search_url)
                 return True
 
@@ -199,7 +345,7 @@ class PersonalAssistant:
         except Exception as e:
             print(f"Error searching Google with Selenium: {e}")
             # Fallback to webbrowser module
-            search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
+            search_url = build_search_url("google", query)
             webbrowser.open(search_url)
             return True
 
@@ -208,7 +354,7 @@ class PersonalAssistant:
         try:
             if self.browser is None:
                 # Fallback to webbrowser module
-                search_url = f"https://www.amazon.com/s?k={query.replace(' ', '+')}"
+                search_url = build_search_url("amazon", query)
                 webbrowser.open(search_url)
                 return True
 
@@ -216,7 +362,7 @@ class PersonalAssistant:
         except Exception as e:
             print(f"Error searching Amazon: {e}")
             # Fallback to webbrowser module
-            search_url = f"https://www.amazon.com/s?k={query.replace(' ', '+')}"
+            search_url = build_search_url("amazon", query)
             webbrowser.open(search_url)
             return True
 
@@ -225,7 +371,7 @@ class PersonalAssistant:
         try:
             if self.browser is None:
                 # Fallback to webbrowser module
-                search_url = f"https://github.com/search?q={query.replace(' ', '+')}"
+                search_url = build_search_url("github", query)
                 webbrowser.open(search_url)
                 return True
 
@@ -233,7 +379,7 @@ class PersonalAssistant:
         except Exception as e:
             print(f"Error searching GitHub: {e}")
             # Fallback to webbrowser module
-            search_url = f"https://github.com/search?q={query.replace(' ', '+')}"
+            search_url = build_search_url("github", query)
             webbrowser.open(search_url)
             return True
 
@@ -242,9 +388,7 @@ class PersonalAssistant:
         try:
             if self.browser is None:
                 # Fallback to webbrowser module
-                search_url = (
-                    f"https://stackoverflow.com/search?q={query.replace(' ', '+')}"
-                )
+                search_url = build_search_url("stackoverflow", query)
                 webbrowser.open(search_url)
                 return True
 
@@ -252,7 +396,7 @@ class PersonalAssistant:
         except Exception as e:
             print(f"Error searching Stack Overflow: {e}")
             # Fallback to webbrowser module
-            search_url = f"https://stackoverflow.com/search?q={query.replace(' ', '+')}"
+            search_url = build_search_url("stackoverflow", query)
             webbrowser.open(search_url)
             return True
 
@@ -272,7 +416,7 @@ class PersonalAssistant:
             return "Browser is not initialized. Cannot scroll page."
 
         try:
-            return scroll_down(self.browser, direction, amount)
+            return scroll_down(self.browser, amount, direction)
         except Exception as e:
             return f"Error scrolling page: {e}"
 
@@ -282,7 +426,7 @@ class PersonalAssistant:
             return "Browser is not initialized. Cannot fill form."
 
         try:
-            return fill_form(self.browser, field_name, value)
+            return fill_form(self.browser, {field_name: value})
         except Exception as e:
             return f"Error filling form: {e}"
 
@@ -296,16 +440,45 @@ class PersonalAssistant:
         except Exception as e:
             return f"Error clicking button: {e}"
 
-    def get_page_text(self, selector_type="body", selector_value="body"):
-        """Extract text from the current page."""
+    def get_page_text(self, selector_type="body", selector_value="body", mode="main"):
+        """Extract text from the current page, by default its main content."""
         if self.browser is None:
             return "Browser is not initialized. Cannot extract text."
 
         try:
-            return extract_text(self.browser, selector_type, selector_value)
+            return extract_text(
+                self.browser,
+                selector_type,
+                selector_value,
+                mode=mode,
+                max_chars=EXTRACT_MAX_CHARS,
+            )
         except Exception as e:
             return f"Error extracting text: {e}"
 
+    def show_search_results(self, site, query, in_browser=True):
+        """
+        List the top results of a search in the chat, without asking the AI.
+
+        Args:
+            site: The searched site
+            query: The search query
+            in_browser: Whether the results page is open in the browser
+        """
+        try:
+            if in_browser and self.browser is not None:
+                # Read the results page the search just opened
+                results = parse_results(self.browser, site)
+            else:
+                results = iter_search_results(site, query)
+            results = list(islice(results, SEARCH_RESULTS_SHOWN))
+        except Exception as e:
+            print(f"Error reading {site} results: {e}")
+            return
+
+        if results:
+            self.add_message("Assistant", format_results(results))
+
     def check_weather(self, city):
         """Get weather information for a city."""
         try:
@@ -898,6 +1071,15 @@ class PersonalAssistant:
         )
         self.chat_history.tag_configure("url_link", foreground="blue", underline=1)
 
+    def _message_tags(self, sender):
+        """Return the label, label tag and message tag used for a sender."""
+        if sender == "User":
+            return "You: ", "user_tag", "user_message"
+        elif sender == "System":
+            return "System: ", "system_tag", "system_message"
+        else:
+            return "Assistant: ", "assistant_tag", "assistant_message"
+
     def add_message(self, sender, message):
         """Add a message to the chat history with support for clickable links."""
         if self.chat_history is None:
@@ -911,15 +1093,9 @@ class PersonalAssistant:
             self.chat_history.insert("end", "\n\n")
 
         # Format based on sender
-        if sender == "User":
-            self.chat_history.insert("end", "You: ", "user_tag")
-            self.chat_history.insert("end", message, "user_message")
-        elif sender == "System":
-            self.chat_history.insert("end", "System: ", "system_tag")
-            self.chat_history.insert("end", message, "system_message")
-        else:
-            self.chat_history.insert("end", "Assistant: ", "assistant_tag")
-            self.chat_history.insert("end", message, "assistant_message")
+        label, label_tag, message_tag = self._message_tags(sender)
+        self.chat_history.insert("end", label, label_tag)
+        self.chat_history.insert("end", message, message_tag)
 
         # Make URLs clickable
         self.make_urls_clickable()
@@ -931,6 +1107,65 @@ class PersonalAssistant:
         self.conversation_context.append(f"{sender}: {message}")
         self.chat_count += 1
 
+    def stream_message(self, sender, chunks):
+        """
+        Add a message to the chat history while it is still being generated.
+
+        Text is buffered and flushed to the widget at most once every
+        STREAM_FLUSH_INTERVAL seconds, so fast token streams don't redraw the
+        chat on every delta.
+
+        Args:
+            sender: Who the message is from
+            chunks: An iterable of text pieces, e.g. from GPT4oAssistant.ask_stream
+        """
+        parts = []
+
+        if self.chat_history is None:
+            print(f"{sender}: ", end="", flush=True)
+            for chunk in chunks:
+                print(chunk, end="", flush=True)
+                parts.append(chunk)
+            print()
+        else:
+            label, label_tag, message_tag = self._message_tags(sender)
+
+            self.chat_history.configure(state="normal")
+            if self.chat_history.index("end-1c") != "1.0":
+                self.chat_history.insert("end", "\n\n")
+            self.chat_history.insert("end", label, label_tag)
+            self.chat_history.configure(state="disabled")
+
+            buffer = []
+            last_flush = time.monotonic()
+            for chunk in chunks:
+                parts.append(chunk)
+                buffer.append(chunk)
+                if time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                    self._append_to_last_message("".join(buffer), message_tag)
+                    buffer = []
+                    last_flush = time.monotonic()
+
+            if buffer:
+                self._append_to_last_message("".join(buffer), message_tag)
+
+            # Make URLs clickable once the full message is in place
+            self.chat_history.configure(state="normal")
+            self.make_urls_clickable()
+            self.chat_history.configure(state="disabled")
+
+        message = "".join(parts)
+        self.conversation_context.append(f"{sender}: {message}")
+        self.chat_count += 1
+        return message
+
+    def _append_to_last_message(self, text, tag):
+        """Append text to the end of the chat history."""
+        self.chat_history.configure(state="normal")
+        self.chat_history.insert("end", text, tag)
+        self.chat_history.configure(state="disabled")
+        self.chat_history.see("end")
+
     def make_urls_clickable(self):
         """Find URLs in the latest message and make them clickable."""
         if self.chat_history is None:
@@ -1017,225 +1252,248 @@ class PersonalAssistant:
         self.send_message()
         return "break"  # Prevents the default behavior (new line)
 
+    def _build_router(self):
+        """Compile the command patterns and register a handler for each command."""
+        router = CommandRouter(self.command_patterns)
+
+        router.register("open_website", self._route_open_website)
+        router.register("multi_search", self._route_multi_search)
+        for command, command_type in [
+            ("youtube_search", "youtube"),
+            ("google_search", "google"),
+            ("amazon_search", "amazon"),
+            ("github_search", "github"),
+            ("stackoverflow_search", "stackoverflow"),
+        ]:
+            router.register(
+                command, lambda query, t=command_type: self._route_search(t, query)
+            )
+        router.register("weather", self._route_weather)
+        router.register("notes_save", self._route_save_note)
+        router.register("scroll", self._route_scroll)
+        router.register(
+            "click", lambda text: self.dispatch_intent("click", {"text": text})
+        )
+        for command, command_type in [
+            ("notes_read", "note_read"),
+            ("news", "news"),
+            ("help", "help"),
+            ("exit", "exit"),
+            ("extract", "extract"),
+            ("screenshot", "screenshot"),
+        ]:
+            router.register(command, lambda t=command_type: self.dispatch_intent(t, {}))
+        router.register("clear", self.clear_chat)
+        router.register("chat", self._route_chat)
+
+        return router
+
     def handle_chat_command(self, command):
-        """Process a chat command with advanced pattern matching and context awareness."""
-        command_lower = command.lower()
-
-        # Website commands - Check this first since it's a common use case
-        if (
-            command_lower.startswith("open ")
-            or "open website" in command_lower
-            or "go to" in command_lower
-        ):
-            url = ""
-            if command_lower.startswith("open website"):
-                url = command_lower.replace("open website", "", 1).strip()
-            elif command_lower.startswith("open "):
-                url = command_lower.replace("open", "", 1).strip()
-            elif "go to" in command_lower:
-                url = command_lower.split("go to", 1)[1].strip()
-
-            if url:
-                self.add_message("Assistant", f"Opening {url}...")
-
-                # Create a clickable link for the user
-                if not url.startswith(("http://", "https://")):
-                    full_url = "https://" + url
-                else:
-                    full_url = url
-
-                self.add_message("System", f"Click here to open {full_url}")
-
-                # Actually open the website
-                try:
-                    success = self.open_website(url)
-                except Exception as e:
-                    print(f"Error opening website: {e}")
-                    # Fallback to webbrowser
-                    try:
-                        if not url.startswith(("http://", "https://")):
-                            url = "https://" + url
-                        webbrowser.open(url)
-                        self.add_message(
-                            "System", f"Opened {url} using default browser."
-                        )
-                    except Exception as e2:
-                        self.add_message("System", f"Error opening website: {str(e2)}")
-            else:
-                self.add_message("Assistant", "Please specify a website to open.")
-            return
+        """Process a chat command by routing it to the matching handler."""
+        with self._browser_wait_lock:
+            if not self._running_commands:
+                self._browser_deadline = None
+            self._running_commands += 1
+        try:
+            self.router.dispatch(command)
+        finally:
+            with self._browser_wait_lock:
+                self._running_commands -= 1
+
+    def _route_open_website(self, url):
+        """Open a website named in an "open" or "go to" command."""
+        url = url.lower()
+        self.add_message("Assistant", f"Opening {url}...")
 
-        # YouTube search
-        elif "youtube" in command_lower and (
-            "search" in command_lower
-            or "find" in command_lower
-            or "play" in command_lower
-        ):
-            query = ""
-            if "for" in command_lower:
-                query = command_lower.split("for", 1)[1].strip()
-            elif "play" in command_lower:
-                query = command_lower.split("play", 1)[1].strip()
-                if "on youtube" in query:
-                    query = query.split("on youtube")[0].strip()
-            else:
-                # Try to extract query from the command
-                parts = command_lower.split("youtube", 1)
-                if len(parts) > 1:
-                    query = parts[1].strip()
+        # Create a clickable link for the user
+        if not url.startswith(("http://", "https://")):
+            full_url = "https://" + url
+        else:
+            full_url = url
 
-            if query:
-                self.add_message("Assistant", f"Searching YouTube for '{query}'...")
-                try:
-                    success = self.open_youtube(query)
-                    if not success:
-                        # Fallback to webbrowser
-                        search_url = f"https://www.youtube.com/results?search_query={query.replace(' ', '+')}"
-                        webbrowser.open(search_url)
-                        self.add_message(
-                            "System", f"Opened YouTube search in default browser."
-                        )
-                except Exception as e:
-                    print(f"Error searching YouTube: {e}")
-                    # Fallback to webbrowser
-                    search_url = f"https://www.youtube.com/results?search_query={query.replace(' ', '+')}"
-                    webbrowser.open(search_url)
-                    self.add_message(
-                        "System", f"Opened YouTube search in default browser."
-                    )
-            else:
-                self.add_message(
-                    "Assistant", "Please specify what to search for on YouTube."
-                )
-            return
+        self.add_message("System", f"Click here to open {full_url}")
 
-        # Google search
-        elif "google" in command_lower and (
-            "search" in command_lower or "find" in command_lower
-        ):
-            query = ""
-            if "for" in command_lower:
-                query = command_lower.split("for", 1)[1].strip()
-            else:
-                # Try to extract query from the command
-                parts = command_lower.split("google", 1)
-                if len(parts) > 1:
-                    query = parts[1].strip()
-                    if query.startswith("search"):
-                        query = query.replace("search", "", 1).strip()
-
-            if query:
-                self.add_message("Assistant", f"Searching Google for '{query}'...")
-                try:
-                    success = self.google_search(query)
-                    if not success:
-                        # Fallback to webbrowser
-                        search_url = (
-                            f"https://www.google.com/search?q={query.replace(' ', '+')}"
-                        )
-                        webbrowser.open(search_url)
-                        self.add_message(
-                            "System", f"Opened Google search in default browser."
-                        )
-                except Exception as e:
-                    print(f"Error searching Google: {e}")
-                    # Fallback to webbrowser
-                    search_url = (
-                        f"https://www.google.com/search?q={query.replace(' ', '+')}"
-                    )
-                    webbrowser.open(search_url)
-                    self.add_message(
-                        "System", f"Opened Google search in default browser."
-                    )
-            else:
-                self.add_message(
-                    "Assistant", "Please specify what to search for on Google."
-                )
-            return
+        # Actually open the website
+        try:
+            self.open_website(url)
+        except Exception as e:
+            print(f"Error opening website: {e}")
+            # Fallback to webbrowser
+            try:
+                webbrowser.open(full_url)
+                self.add_message("System", f"Opened {full_url} using default browser.")
+            except Exception as e2:
+                self.add_message("System", f"Error opening website: {str(e2)}")
 
-        # Weather command
-        elif "weather" in command_lower:
-            city = ""
-            if "in" in command_lower:
-                city = command_lower.split("in", 1)[1].strip()
+    def _route_search(self, command_type, query):
+        """Run a site search, asking for a query if the command had none."""
+        if not self.dispatch_intent(command_type, {"query": query}):
+            site = self.search_sites[command_type][0]
+            self.add_message(
+                "Assistant", f"Please specify what to search for on {site}."
+            )
 
-            if city:
-                self.add_message("Assistant", f"Getting weather for {city}...")
-                try:
-                    weather_info = get_weather(city)
-                    self.add_message("Assistant", weather_info)
-                except Exception as e:
-                    print(f"Error getting weather: {e}")
-                    self.add_message(
-                        "System", f"Error getting weather information: {str(e)}"
-                    )
-            else:
-                self.add_message(
-                    "Assistant", "Please specify a city for weather information."
-                )
+    def _route_multi_search(self, query, sites):
+        """Search several sites at once, posting each site's results as they arrive."""
+        sites = parse_sites(sites)
+        if len(sites) == 1:
+            # "google and Google" names one site once its repeat is dropped
+            self._route_search(sites[0], query)
             return
+        names = [SITE_NAMES[site] for site in sites]
+        names = ", ".join(names[:-1]) + " and " + names[-1]
+        self.add_message("Assistant", f"Searching {names} for '{query}'...")
+
+        # Sites that need a browser take turns on the lean one
+        def _lease():
+            return SharedBrowserLease(
+                lambda: self.get_browser("lean"), self._lean_browser_lease_lock
+            )
 
-        # Notes commands
-        elif command_lower.startswith("save note:") or command_lower.startswith(
-            "save note "
-        ):
-            note = ""
-            if ":" in command:
-                note = command.split(":", 1)[1].strip()
+        for site, results in fan_out_search(sites, query, _lease):
+            if results is None:
+                self.add_message("System", f"{SITE_NAMES[site]} took too long.")
+            elif results:
+                self.add_message(
+                    "Assistant", f"{SITE_NAMES[site]}:\n{format_results(results)}"
+                )
             else:
-                note = command.replace("save note", "", 1).strip()
+                self.add_message("System", f"No {SITE_NAMES[site]} results found.")
 
-            if note:
-                self.add_message("Assistant", "Saving your note...")
-                try:
-                    result = save_note(note)
-                    self.add_message("Assistant", result)
-                except Exception as e:
-                    print(f"Error saving note: {e}")
-                    self.add_message("System", f"Error saving note: {str(e)}")
-            else:
-                self.add_message("Assistant", "Please provide content for your note.")
+    def _route_weather(self, city=None):
+        """Report the weather for a city, asking for one if it's missing."""
+        if not city:
+            self.add_message(
+                "Assistant", "Please specify a city for weather information."
+            )
             return
 
-        elif (
-            command_lower == "show my notes"
-            or command_lower == "show notes"
-            or command_lower == "get notes"
-        ):
-            self.add_message("Assistant", "Retrieving your notes...")
-            try:
-                notes = get_notes()
-                self.add_message("Assistant", notes)
-            except Exception as e:
-                print(f"Error getting notes: {e}")
-                self.add_message("System", f"Error retrieving notes: {str(e)}")
-            return
+        self.add_message("Assistant", f"Getting weather for {city}...")
+        try:
+            weather_info = get_weather(city)
+            self.add_message("Assistant", weather_info)
+        except Exception as e:
+            print(f"Error getting weather: {e}")
+            self.add_message("System", f"Error getting weather information: {str(e)}")
 
-        # News command
-        elif (
-            command_lower == "news"
-            or command_lower == "show news"
-            or command_lower == "get news"
-        ):
-            self.add_message("Assistant", "Fetching the latest news headlines...")
-            try:
-                news_info = get_news()
-                self.add_message("Assistant", news_info)
-            except Exception as e:
-                print(f"Error getting news: {e}")
-                self.add_message("System", f"Error fetching news: {str(e)}")
+    def _route_save_note(self, note):
+        """Save a note, asking for its content if it's empty."""
+        if not note:
+            self.add_message("Assistant", "Please provide content for your note.")
             return
 
-        # If no direct command match, use AI for general chat
+        self.add_message("Assistant", "Saving your note...")
+        try:
+            result = save_note(note)
+            self.add_message("Assistant", result)
+        except Exception as e:
+            print(f"Error saving note: {e}")
+            self.add_message("System", f"Error saving note: {str(e)}")
+
+    def _route_scroll(self, direction, amount=None):
+        """Scroll the page by the given number of screens."""
+        self.dispatch_intent(
+            "scroll",
+            {"direction": direction.lower(), "amount": int(amount) if amount else 1},
+        )
+
+    def _route_chat(self, command):
+        """Handle a command no pattern matched: classify it locally, else ask the AI."""
+        # Routine commands phrased differently are resolved by the local
+        # classifier without an API call
+        analysis = classify_intent(command)
+        if is_confident(analysis):
+            if self.dispatch_intent(analysis["command_type"], analysis["parameters"]):
+                return
+
+        # If no direct command match, let the AI answer or call a tool itself
         try:
-            response = self.ai_assistant.ask(command)
-            self.add_message("Assistant", response)
+            self.stream_message(
+                "Assistant", self.ai_assistant.ask_stream(command, tools=self.tools)
+            )
         except Exception as e:
             print(f"Error getting AI response: {e}")
             self.add_message(
                 "System", "I'm having trouble understanding. Please try again."
             )
 
+    def dispatch_intent(self, command_type, parameters):
+        """
+        Run a command classified by analyze_command or the local classifier.
+
+        Args:
+            command_type: One of the command types analyze_command returns
+            parameters: The extracted parameters
+
+        Returns:
+            True if the command was handled, False if it should go to the AI
+        """
+        if command_type in self.search_sites:
+            query = parameters.get("query", "").strip()
+            if not query:
+                return False
+            site, search = self.search_sites[command_type]
+            self.add_message("Assistant", f"Searching {site} for '{query}'...")
+            searched = search(query)
+            if not searched:
+                # Fallback to webbrowser
+                webbrowser.open(build_search_url(command_type, query))
+                self.add_message("System", f"Opened {site} search in default browser.")
+            self.show_search_results(command_type, query, in_browser=searched)
+
+        elif command_type == "website":
+            url = parameters.get("url", "").strip()
+            if not url:
+                return False
+            self.add_message("Assistant", f"Opening {url}...")
+            self.open_website(url)
+
+        elif command_type == "weather":
+            city = parameters.get("city", "").strip()
+            if not city:
+                return False
+            self.add_message("Assistant", f"Getting weather for {city}...")
+            self.add_message("Assistant", self.check_weather(city))
+
+        elif command_type == "note_save":
+            note = parameters.get("note", "").strip()
+            if not note:
+                return False
+            self.add_message("Assistant", self.save_user_note(note))
+
+        elif command_type == "note_read":
+            self.add_message("Assistant", self.get_user_notes())
+        elif command_type == "news":
+            self.add_message("Assistant", self.get_latest_news())
+        elif command_type == "screenshot":
+            self.add_message("Assistant", self.take_screenshot())
+        elif command_type == "scroll":
+            result = self.scroll_page(
+                parameters.get("direction", "down"), parameters.get("amount", 1)
+            )
+            if isinstance(result, str):
+                self.add_message("System", result)
+        elif command_type == "click":
+            text = parameters.get("text", "").strip()
+            if not text:
+                return False
+            result = self.click_button_on_page(text)
+            if isinstance(result, str):
+                self.add_message("System", result)
+        elif command_type == "extract":
+            self.add_message("Assistant", self.get_page_text())
+        elif command_type == "help":
+            self.show_advanced_help()
+        elif command_type == "exit":
+            if self.root:
+                self.root.after(0, self.close_application)
+            else:
+                self.close_application()
+        else:
+            return False
+
+        return True
+
     def get_conversation_context(self):
         """Get relevant context from previous interactions."""
         if not self.conversation_context:
@@ -1352,11 +1610,15 @@ Let me know if you need help with any specific feature!
     def close_application(self):
         """Properly close the application."""
         print("Closing application...")
-        if self.browser:
-            try:
-                self.browser.quit()
-            except Exception as e:
-                print(f"Error closing browser: {e}")
+        # A browser that is still starting is closed as soon as it is up,
+        # from the launch thread, which the interpreter waits for on exit
+        self._browser_future.add_done_callback(self._release_browser)
+        # Waits for a lean browser being started, which is then closed too
+        with self._lean_browser_lock:
+            self._closing = True
+            if self._lean_browser:
+                close_browser(self._lean_browser)
+                self._lean_browser = None
 
         try:
             if self.root:
@@ -1367,6 +1629,17 @@ Let me know if you need help with any specific feature!
         # Force exit
         sys.exit(0)
 
+    def _release_browser(self, future):
+        """Close the browser a launch produced, or detach it if it is detached."""
+        browser = future.result()
+        if not browser:
+            return
+        if self._browser_detached:
+            # Leave the browser and its tabs open for the next start
+            detach_browser(browser)
+        else:
+            close_browser(browser)
+
     def clear_chat(self):
         """Clear the chat history."""
         if self.chat_history:
@@ -0,0 +1,142 @@
+"""
+Compare web_agent's keyword-prefiltered CommandProcessor with the old
+sequential regex matcher, on normal commands and adversarial long inputs.
+
+Run from the repository root:
+
+    python benchmarks/command_processor_benchmark.py
+"""
+
+import os
+import re
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web_agent import CommandProcessor  # noqa: E402
+
+LEGACY_PATTERNS = {
+    "youtube": [
+        r'(?:search|find|look\s+for|show)?\s*(?:on)?\s*youtube\s+(?:for)?\s*["\']?([^"\']+)["\']?',
+        r'youtube\s+(?:search|find)?\s*["\']?([^"\']+)["\']?',
+        r'find\s+videos?\s+(?:of|about|on)?\s*["\']?([^"\']+)["\']?',
+    ],
+    "google": [
+        r'(?:search|find|look\s+for)?\s*(?:on)?\s*google\s+(?:for)?\s*["\']?([^"\']+)["\']?',
+        r'google\s+(?:search|find)?\s*["\']?([^"\']+)["\']?',
+        r'search\s+(?:for|about)?\s*["\']?([^"\']+)["\']?',
+    ],
+    "weather": [
+        r"(?:what\'?s?\s+the)?\s*weather\s+(?:in|at|for)?\s*([^?]+)",
+        r"(?:how\'?s?\s+the)?\s*weather\s+(?:in|at|for)?\s*([^?]+)",
+    ],
+    "open": [
+        r"open\s+(?:the\s+)?(?:website\s+)?([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+        r"go\s+to\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+        r"visit\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+    ],
+}
+
+COMMANDS = [
+    "search youtube for lofi hip hop",
+    "find videos of cooking pasta",
+    "google python decorators",
+    "search for 'best pizza near me'",
+    "what's the weather in Paris?",
+    "open github.com",
+    "go to wikipedia.org",
+    "tell me a joke about programmers",
+    "what is the difference between a list and a tuple in python",
+]
+
+ADVERSARIAL = {
+    "whitespace run": lambda n: "tell me" + " " * n + "x?",
+    "mixed whitespace": lambda n: "hi" + "\n\t " * (n // 3) + "?",
+    "pasted prose": lambda n: ("the quick brown fox jumps over the lazy dog " * n)[:n],
+    # Real keywords, repeated, so every occurrence is tried; "search" also
+    # starts a multi-site search attempt
+    "search spam": lambda n: ("search " * n)[:n],
+    "find spam": lambda n: ("find " * n)[:n],
+    "open spam": lambda n: ("open " * n)[:n],
+    "keyword mix": lambda n: ("go search open weather look visit " * n)[:n],
+}
+
+# Largest allowed growth of the prefiltered time from 10,000 to 100,000
+# characters; linear growth is 10x, quadratic 100x
+MAX_GROWTH = 25
+
+
+def legacy_extract_command(text):
+    """The old CommandProcessor.extract_command: every pattern, in sequence."""
+    text = text.lower().strip()
+    names = {"youtube": "query", "google": "query", "weather": "location"}
+    for command, patterns in LEGACY_PATTERNS.items():
+        for pattern in patterns:
+            match = re.search(pattern, text)
+            if match:
+                return {
+                    "command": command,
+                    names.get(command, "website"): match.group(1).strip(),
+                }
+    return {"command": "chat", "message": text}
+
+
+def time_once(function, text):
+    start = time.perf_counter()
+    function(text)
+    return (time.perf_counter() - start) * 1e3
+
+
+def main(number=5000):
+    processor = CommandProcessor()
+
+    for command in COMMANDS:
+        legacy = legacy_extract_command(command)
+        current = processor.extract_command(command)
+        marker = "" if legacy == current else "  <-- differs"
+        print(f"{command:<62} {current['command']:>8}{marker}")
+
+    legacy = timeit.timeit(
+        lambda: [legacy_extract_command(command) for command in COMMANDS],
+        number=number,
+    )
+    current = timeit.timeit(
+        lambda: [processor.extract_command(command) for command in COMMANDS],
+        number=number,
+    )
+    per_call = 1e6 / (number * len(COMMANDS))
+    print()
+    print(
+        f"typical commands: legacy {legacy * per_call:.1f} us, "
+        f"prefiltered {current * per_call:.1f} us"
+    )
+
+    print()
+    print(f"{'input':<18} {'chars':>7} {'legacy ms':>12} {'prefiltered ms':>16}")
+    nonlinear = []
+    for name, make in ADVERSARIAL.items():
+        current = {}
+        for size in (100, 300, 1000, 10000, 100000):
+            text = make(size)
+            # The old matcher is cubic on whitespace runs; skip sizes that
+            # would take minutes
+            legacy_ms = (
+                f"{time_once(legacy_extract_command, text):.2f}"
+                if size <= 1000
+                else "-"
+            )
+            # Best of three, so one slow run doesn't look like growth
+            current[size] = min(
+                time_once(processor.extract_command, text) for _ in range(3)
+            )
+            print(f"{name:<18} {size:>7} {legacy_ms:>12} {current[size]:>16.2f}")
+        if current[100000] > MAX_GROWTH * max(current[10000], 0.1):
+            nonlinear.append(name)
+
+    assert not nonlinear, f"routing time grows faster than linearly: {nonlinear}"
+
+
+if __name__ == "__main__":
+    main()
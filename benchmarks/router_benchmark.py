@@ -0,0 +1,227 @@
+"""
+Compare the compiled command router with the old if/elif substring chain.
+
+Run from the repository root:
+
+    python benchmarks/router_benchmark.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import COMMAND_PATTERNS  # noqa: E402
+from utils.intent_utils import (  # noqa: E402
+    DESTRUCTIVE_INTENTS,
+    classify_intent,
+    get_intent_classifier,
+    is_confident,
+)
+from utils.router_utils import CommandRouter  # noqa: E402
+
+COMMANDS = [
+    "open github.com",
+    "go to wikipedia.org",
+    "search youtube for lofi hip hop",
+    "play despacito on youtube",
+    "search google for python decorators",
+    "what's the weather in Paris?",
+    "save note: call the dentist on Monday",
+    "show my notes",
+    "news",
+    "find wireless headphones on amazon",
+    "scroll down 3",
+    "click sign in",
+    "tell me a joke about programmers",
+    "what is the difference between a list and a tuple in python",
+]
+
+
+def legacy_route(command):
+    """
+    The old handle_chat_command chain, with its argument extraction but
+    without side effects.
+    """
+    command_lower = command.lower()
+
+    if (
+        command_lower.startswith("open ")
+        or "open website" in command_lower
+        or "go to" in command_lower
+    ):
+        url = ""
+        if command_lower.startswith("open website"):
+            url = command_lower.replace("open website", "", 1).strip()
+        elif command_lower.startswith("open "):
+            url = command_lower.replace("open", "", 1).strip()
+        elif "go to" in command_lower:
+            url = command_lower.split("go to", 1)[1].strip()
+        return "open_website", (url,)
+    elif "youtube" in command_lower and (
+        "search" in command_lower or "find" in command_lower or "play" in command_lower
+    ):
+        query = ""
+        if "for" in command_lower:
+            query = command_lower.split("for", 1)[1].strip()
+        elif "play" in command_lower:
+            query = command_lower.split("play", 1)[1].strip()
+            if "on youtube" in query:
+                query = query.split("on youtube")[0].strip()
+        else:
+            parts = command_lower.split("youtube", 1)
+            if len(parts) > 1:
+                query = parts[1].strip()
+        return "youtube_search", (query,)
+    elif "google" in command_lower and (
+        "search" in command_lower or "find" in command_lower
+    ):
+        query = ""
+        if "for" in command_lower:
+            query = command_lower.split("for", 1)[1].strip()
+        else:
+            parts = command_lower.split("google", 1)
+            if len(parts) > 1:
+                query = parts[1].strip()
+                if query.startswith("search"):
+                    query = query.replace("search", "", 1).strip()
+        return "google_search", (query,)
+    elif "weather" in command_lower:
+        city = ""
+        if "in" in command_lower:
+            city = command_lower.split("in", 1)[1].strip()
+        return "weather", (city,)
+    elif command_lower.startswith("save note:") or command_lower.startswith(
+        "save note "
+    ):
+        if ":" in command:
+            note = command.split(":", 1)[1].strip()
+        else:
+            note = command.replace("save note", "", 1).strip()
+        return "notes_save", (note,)
+    elif (
+        command_lower == "show my notes"
+        or command_lower == "show notes"
+        or command_lower == "get notes"
+    ):
+        return "notes_read", ()
+    elif (
+        command_lower == "news"
+        or command_lower == "show news"
+        or command_lower == "get news"
+    ):
+        return "news", ()
+    return "chat", (command,)
+
+
+# Chat messages that look like destructive commands and must never run one
+NEAR_MISSES = [
+    "close the popup",
+    "close the tab",
+    "close the cookie banner",
+    "quit smoking tips",
+    "exit the loop in python",
+    "i want to quit my job",
+    "clear the cache",
+    "clear my head",
+]
+
+
+# The commands the old chain knew, so both are timed on the same table
+LEGACY_COMMANDS = [
+    "open_website",
+    "youtube_search",
+    "google_search",
+    "weather",
+    "notes_save",
+    "notes_read",
+    "news",
+    "chat",
+]
+
+
+def with_fallback(route, command):
+    """Route a command, running the local classifier when nothing matched."""
+    routed = route(command)
+    if routed[0] == "chat":
+        return classify_intent(command)
+    return routed
+
+
+def check_near_misses(router):
+    """Assert that no near-miss phrasing is acted on as a destructive command."""
+    acted_on = []
+    for command in NEAR_MISSES:
+        # What agent.py runs: the router's match, else a confident guess
+        routed = router.route(command)[0]
+        if routed == "chat":
+            analysis = classify_intent(command)
+            if is_confident(analysis):
+                routed = analysis["command_type"]
+        if routed in DESTRUCTIVE_INTENTS:
+            acted_on.append(command)
+    assert not acted_on, f"ran a destructive command for: {acted_on}"
+    assert router.route("close")[0] == "exit"
+    assert router.route("clear chat")[0] == "clear"
+
+
+def per_command(function, number, repeat=5):
+    """Time routing every command, returning the best run in us per command."""
+    best = min(
+        timeit.repeat(
+            lambda: [function(command) for command in COMMANDS],
+            number=number,
+            repeat=repeat,
+        )
+    )
+    return best * 1e6 / (number * len(COMMANDS))
+
+
+def main(number=20000):
+    router = CommandRouter(COMMAND_PATTERNS)
+    legacy_router = CommandRouter(
+        {command: COMMAND_PATTERNS[command] for command in LEGACY_COMMANDS}
+    )
+    get_intent_classifier()
+
+    print(f"{'command':<62} {'legacy':>14} {'router':>14}")
+    for command in COMMANDS:
+        routed = router.route(command)
+        print(f"{command:<62} {legacy_route(command)[0]:>14} {routed[0]:>14}")
+
+    check_near_misses(router)
+
+    compile_time = timeit.timeit(lambda: CommandRouter(COMMAND_PATTERNS), number=100)
+    print()
+    print(f"router compile:  {compile_time * 10:.2f} ms")
+
+    print()
+    print("Matching only, same command table as the legacy chain:")
+    print(f"legacy chain:    {per_command(legacy_route, number):.2f} us/command")
+    print(f"compiled router: {per_command(legacy_router.route, number):.2f} us/command")
+    print()
+    print("Matching only, full command table:")
+    print(f"compiled router: {per_command(router.route, number):.2f} us/command")
+
+    # The full table sends fewer commands to the classifier, so this
+    # compares coverage as much as matching speed
+    fallback_number = number // 100
+    print()
+    print("Including the local classifier for commands routed to chat:")
+    legacy_fallback = per_command(
+        lambda command: with_fallback(legacy_route, command), fallback_number
+    )
+    same_table = per_command(
+        lambda command: with_fallback(legacy_router.route, command), fallback_number
+    )
+    full_table = per_command(
+        lambda command: with_fallback(router.route, command), fallback_number
+    )
+    print(f"legacy chain:               {legacy_fallback:.2f} us/command")
+    print(f"router, legacy table:       {same_table:.2f} us/command")
+    print(f"router, full command table: {full_table:.2f} us/command")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,202 @@
+import asyncio
 import json
 import os
-from typing import Any, Dict, Optional
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
-import requests
+from utils.cache_utils import (
+    CACHE_CHAT_TTL,
+    CompletionCache,
+    get_completion_cache,
+    make_cache_key,
+)
+from utils.history_utils import (
+    HISTORY_TOKEN_BUDGET,
+    TokenBudgetHistory,
+    estimate_message_tokens,
+)
+from utils.http_utils import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HTTPClient,
+    get_http_client,
+)
+from utils.intent_utils import DESTRUCTIVE_INTENTS, classify_intent, is_confident
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 try:
     from config import OPENAI_API_KEY
 except ImportError:
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 
+DEFAULT_SYSTEM_PROMPT = (
+    "You are a helpful AI assistant integrated into a personal automation tool. "
+    "Provide concise, accurate responses. If asked to perform a task that requires "
+    "web automation (like opening websites or searching), explain that you'll pass "
+    "the command to the automation system."
+)
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI "
+    "assistant. Update the summary with the new messages. Keep names, facts, "
+    "preferences and open tasks; drop pleasantries. Reply with the summary only, "
+    "in a few short sentences."
+)
+
+NO_API_KEY_MESSAGE = (
+    "I can't process this request because the OpenAI API key is not configured."
+)
+
+
+COMMAND_ANALYZER_PROMPT = (
+    "Classify the command for a web automation assistant as one of: website, "
+    "youtube, google, amazon, github, stackoverflow, screenshot, scroll, click, "
+    "extract, weather, news, note_save, note_read, chat, help, exit. "
+    "Extract parameters such as query, url, city, note, direction, amount or text. "
+    'Reply with JSON only: {"command_type": "...", "parameters": {...}}'
+)
+
+# Classification replies are short, deterministic JSON objects
+COMMAND_ANALYZER_OPTIONS = {
+    "temperature": 0,
+    "max_tokens": 100,
+    "response_format": {"type": "json_object"},
+}
+
+
+def build_command_analysis_messages(command: str) -> List[Dict[str, str]]:
+    """Build the stateless message list for classifying a command."""
+    return [
+        {"role": "system", "content": COMMAND_ANALYZER_PROMPT},
+        {"role": "user", "content": command},
+    ]
+
+
+def parse_command_analysis(response: str, command: str) -> Dict[str, Any]:
+    """Parse the analyzer's JSON reply, defaulting to a chat command."""
+    try:
+        # Try to parse the response as JSON
+        return json.loads(response)
+    except json.JSONDecodeError:
+        # If the response isn't valid JSON, return a default
+        return {"command_type": "chat", "parameters": {"message": command}}
+
+
+def iter_stream_chunks(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """
+    Parse a server-sent event stream from the completions endpoint.
+
+    Args:
+        lines: Raw lines of the streamed response body
+
+    Yields:
+        Each decoded chunk of the stream
+    """
+    for line in lines:
+        if not line:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            break
+
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
+
+
+def iter_stream_deltas(lines: Iterable[bytes]) -> Iterator[str]:
+    """
+    Parse a server-sent event stream from the completions endpoint.
+
+    Args:
+        lines: Raw lines of the streamed response body
+
+    Yields:
+        The text content of each delta in the stream
+    """
+    for chunk in iter_stream_chunks(lines):
+        for choice in chunk.get("choices", []):
+            content = choice.get("delta", {}).get("content")
+            if content:
+                yield content
+
+
+def merge_tool_call_deltas(
+    tool_calls: List[Dict[str, Any]], deltas: List[Dict[str, Any]]
+):
+    """
+    Accumulate streamed tool call fragments into complete tool calls.
+
+    Args:
+        tool_calls: The tool calls assembled so far, updated in place
+        deltas: The tool_calls field of one streamed delta
+    """
+    for delta in deltas:
+        index = delta.get("index", 0)
+        while len(tool_calls) <= index:
+            tool_calls.append(
+                {
+                    "id": "",
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""},
+                }
+            )
+
+        tool_call = tool_calls[index]
+        if delta.get("id"):
+            tool_call["id"] = delta["id"]
+        function = delta.get("function", {})
+        if function.get("name"):
+            tool_call["function"]["name"] += function["name"]
+        if function.get("arguments"):
+            tool_call["function"]["arguments"] += function["arguments"]
+
 
 class GPT4oAssistant:
     """Class to handle interactions with OpenAI's GPT-4o API."""
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the GPT-4o assistant with API key."""
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        http_client: Optional[HTTPClient] = None,
+        cache: Optional[CompletionCache] = None,
+        use_cache: bool = True,
+        history_tokens: int = HISTORY_TOKEN_BUDGET,
+    ):
+        """
+        Initialize the GPT-4o assistant with API key.
+
+        Args:
+            api_key: OpenAI API key, defaults to the configured key
+            http_client: HTTP client to send requests with, defaults to the shared one
+            cache: Completion cache to use, defaults to the shared one
+            use_cache: Whether to cache completions at all
+            history_tokens: Token budget for the prompt: system prompt, history
+                and query together
+        """
         self.api_key = api_key or OPENAI_API_KEY
+        self.http_client = http_client or get_http_client()
+        self.cache = (cache or get_completion_cache()) if use_cache else None
         if not self.api_key:
             print(
                 "Warning: OpenAI API key not found. GPT-4o functionality will be limited."
@@ -28,76 +209,201 @@ class GPT4oAssistant:
             "Authorization": f"Bearer {self.api_key}",
         }
 
-        # Initialize conversation history
-        self.conversation_history = []
-        self.max_history_length = 10  # Maximum number of message pairs to keep
+        # Initialize conversation history; old turns are summarized off the hot path
+        self.history = TokenBudgetHistory(
+            max_tokens=history_tokens, summarizer=self._summarize_history
+        )
+
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """The history messages that are sent with the next query."""
+        return self.history.messages()
+
+    def _build_messages(
+        self, query: str, system_prompt: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Build the message list for a chat request, including history."""
+        messages = []
+
+        # Add system prompt if provided
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        else:
+            messages.append({"role": "system", "content": DEFAULT_SYSTEM_PROMPT})
+
+        # Add as much conversation history as fits the budget; the system
+        # prompt and the query are always sent
+        query_message = {"role": "user", "content": query}
+        reserve = estimate_message_tokens(messages + [query_message])
+        messages.extend(self.history.messages(reserve_tokens=reserve))
+
+        # Add the current query
+        messages.append(query_message)
+        return messages
+
+    def _build_payload(self, messages: List[Dict[str, str]], **overrides) -> dict:
+        """Build the request payload for the completions endpoint."""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 1000,
+        }
+        payload.update(overrides)
+        return payload
+
+    def _cache_key(
+        self, query: str, system_prompt: Optional[str] = None, tools=None
+    ) -> str:
+        """
+        Build the cache key for a query given the current history.
+
+        The whole history, rolling summary included, is part of the key: a
+        reply can depend on anything said before, and the cache is shared
+        by every user of the process and persisted to disk. So are the
+        definitions of any tools offered, which change what the model says.
+        """
+        return make_cache_key(
+            self.model,
+            system_prompt or DEFAULT_SYSTEM_PROMPT,
+            self.conversation_history,
+            query,
+            self._tool_options(tools).get("tools"),
+        )
+
+    def _cached_response(
+        self, query: str, system_prompt: Optional[str], bypass_cache: bool, tools=None
+    ):
+        """
+        Look up a query in the cache.
+
+        Returns:
+            A (cache_key, cached_response) pair; the key is None when caching
+            is off for this call and the response is None on a miss
+        """
+        if self.cache is None or bypass_cache:
+            return None, None
+
+        cache_key = self._cache_key(query, system_prompt, tools)
+        return cache_key, self.cache.get(cache_key)
+
+    def _record_exchange(self, query: str, assistant_response: str):
+        """Add a query/response pair to the conversation history."""
+        self.history.add_exchange(query, assistant_response)
+
+    def _tool_options(self, tools) -> dict:
+        """Return the payload fields that offer a registry's tools to the model."""
+        if tools is None or not tools.tools:
+            return {}
+        return {"tools": tools.schemas(), "tool_choice": "auto"}
+
+    def _join_tool_results(self, content: str, results: List[str]) -> str:
+        """Combine any text the model wrote with the results of its tool calls."""
+        return "\n\n".join(part for part in [content.strip()] + results if part)
+
+    def _complete(self, messages: List[Dict[str, str]], **overrides) -> str:
+        """
+        Send a one-off request that doesn't read or update the history.
+
+        Raises:
+            RuntimeError: If the API returns an error
+        """
+        response = self.http_client.post(
+            self.api_url,
+            headers=self.headers,
+            json=self._build_payload(messages, **overrides),
+        )
+        response_data = response.json()
+
+        if response.status_code != 200:
+            error_message = response_data.get("error", {}).get(
+                "message", "Unknown error"
+            )
+            raise RuntimeError(f"Error from OpenAI API: {error_message}")
+
+        return response_data["choices"][0]["message"]["content"]
 
-    def ask(self, query: str, system_prompt: Optional[str] = None) -> str:
+    def _summarize_history(
+        self, previous_summary: str, messages: List[Dict[str, str]]
+    ) -> str:
+        """Fold old history messages into the rolling summary."""
+        transcript = "\n".join(
+            f"{message['role'].capitalize()}: {message['content']}"
+            for message in messages
+        )
+        return self._complete(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Current summary:\n{previous_summary or '(none)'}\n\n"
+                    f"New messages:\n{transcript}",
+                },
+            ],
+            temperature=0.3,
+            max_tokens=self.history.summary_tokens,
+        )
+
+    def ask(
+        self,
+        query: str,
+        system_prompt: Optional[str] = None,
+        bypass_cache: bool = False,
+        tools=None,
+    ) -> str:
         """
         Send a query to GPT-4o and get a response.
 
         Args:
             query: The user's question or command
             system_prompt: Optional system prompt to guide the model's behavior
+            bypass_cache: Skip the completion cache for this call
+            tools: Optional ToolRegistry; the model may call its tools, which
+                are run and their results returned as the response, all in
+                a single completion
 
         Returns:
             The model's response as a string
         """
         if not self.api_key:
-            return "I can't process this request because the OpenAI API key is not configured."
+            return NO_API_KEY_MESSAGE
 
-        # Prepare messages
-        messages = []
-
-        # Add system prompt if provided
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        else:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": "You are a helpful AI assistant integrated into a personal automation tool. "
-                    "Provide concise, accurate responses. If asked to perform a task that requires "
-                    "web automation (like opening websites or searching), explain that you'll pass "
-                    "the command to the automation system.",
-                }
-            )
+        # Tool calls have side effects, so only plain text replies of a
+        # tool-enabled request are cached; a hit means the model answered
+        # without calling a tool
+        if tools is not None:
+            system_prompt = system_prompt or tools.system_prompt
 
-        # Add conversation history
-        messages.extend(self.conversation_history)
+        cache_key, cached = self._cached_response(
+            query, system_prompt, bypass_cache, tools
+        )
+        if cached is not None:
+            self._record_exchange(query, cached)
+            return cached
 
-        # Add the current query
-        messages.append({"role": "user", "content": query})
+        messages = self._build_messages(query, system_prompt)
 
         try:
-            # Prepare the request payload
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000,
-            }
-
             # Send the request
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            response = self.http_client.post(
+                self.api_url,
+                headers=self.headers,
+                json=self._build_payload(messages, **self._tool_options(tools)),
+            )
             response_data = response.json()
 
             if response.status_code == 200:
-                # Extract the response text
-                assistant_response = response_data["choices"][0]["message"]["content"]
-
-                # Update conversation history
-                self.conversation_history.append({"role": "user", "content": query})
-                self.conversation_history.append(
-                    {"role": "assistant", "content": assistant_response}
-                )
-
-                # Trim history if it gets too long
-                if len(self.conversation_history) > self.max_history_length * 2:
-                    self.conversation_history = self.conversation_history[
-                        -self.max_history_length * 2 :
-                    ]
-
+                # Extract the response text, running any tools the model chose
+                message = response_data["choices"][0]["message"]
+                assistant_response = message.get("content") or ""
+                if message.get("tool_calls"):
+                    assistant_response = self._join_tool_results(
+                        assistant_response,
+                        tools.run_tool_calls(message["tool_calls"]),
+                    )
+                elif cache_key is not None:
+                    self.cache.set(cache_key, assistant_response, ttl=CACHE_CHAT_TTL)
+                self._record_exchange(query, assistant_response)
                 return assistant_response
             else:
                 error_message = response_data.get("error", {}).get(
@@ -108,9 +414,98 @@ class GPT4oAssistant:
         except Exception as e:
             return f"Error communicating with OpenAI API: {str(e)}"
 
+    def ask_stream(
+        self,
+        query: str,
+        system_prompt: Optional[str] = None,
+        bypass_cache: bool = False,
+        tools=None,
+    ) -> Iterator[str]:
+        """
+        Send a query to GPT-4o and yield the response as it is generated.
+
+        The conversation history is updated once the stream has finished.
+        Errors are yielded as text, the same way ask() returns them. A cached
+        response is yielded in one piece.
+
+        Args:
+            query: The user's question or command
+            system_prompt: Optional system prompt to guide the model's behavior
+            bypass_cache: Skip the completion cache for this call
+            tools: Optional ToolRegistry; tool calls are collected from the
+                stream, run once it ends, and their results yielded
+
+        Yields:
+            Pieces of the model's response as they arrive
+        """
+        if not self.api_key:
+            yield NO_API_KEY_MESSAGE
+            return
+
+        if tools is not None:
+            system_prompt = system_prompt or tools.system_prompt
+
+        cache_key, cached = self._cached_response(
+            query, system_prompt, bypass_cache, tools
+        )
+        if cached is not None:
+            self._record_exchange(query, cached)
+            yield cached
+            return
+
+        messages = self._build_messages(query, system_prompt)
+        payload = self._build_payload(
+            messages, stream=True, **self._tool_options(tools)
+        )
+        parts = []
+        tool_calls = []
+
+        try:
+            with self.http_client.post(
+                self.api_url, headers=self.headers, json=payload, stream=True
+            ) as response:
+                if response.status_code != 200:
+                    error_message = (
+                        response.json().get("error", {}).get("message", "Unknown error")
+                    )
+                    yield f"Error from OpenAI API: {error_message}"
+                    return
+
+                for chunk in iter_stream_chunks(response.iter_lines()):
+                    for choice in chunk.get("choices", []):
+                        delta = choice.get("delta", {})
+                        if delta.get("tool_calls"):
+                            merge_tool_call_deltas(tool_calls, delta["tool_calls"])
+                        if delta.get("content"):
+                            parts.append(delta["content"])
+                            yield delta["content"]
+
+            if tool_calls:
+                results = self._join_tool_results("", tools.run_tool_calls(tool_calls))
+                if results:
+                    # The streamed text was already shown as it was
+                    tail = f"\n\n{results}" if "".join(parts).strip() else results
+                    parts.append(tail)
+                    yield tail
+
+        except Exception as e:
+            yield f"Error communicating with OpenAI API: {str(e)}"
+            return
+
+        assistant_response = "".join(parts)
+        # Replies that ran tools are never cached, see ask()
+        if cache_key is not None and not tool_calls:
+            self.cache.set(cache_key, assistant_response, ttl=CACHE_CHAT_TTL)
+        self._record_exchange(query, assistant_response)
+
+    def preconnect(self):
+        """Warm up the connection to the API so the first message skips the handshake."""
+        if self.api_key:
+            self.http_client.preconnect(self.api_url)
+
     def clear_history(self):
         """Clear the conversation history."""
-        self.conversation_history = []
+        self.history.clear()
         return "Conversation history cleared."
 
     def analyze_command(self, command: str) -> Dict[str, Any]:
@@ -123,36 +518,315 @@ class GPT4oAssistant:
         Returns:
             A dictionary with the command type and parameters
         """
-        system_prompt = """
-        You are a command analyzer for an AI assistant that can perform web automation tasks.
-        Analyze the user's command and categorize it into one of these types:
-        - website (opening a website)
-        - youtube (searching YouTube)
-        - google (searching Google)
-        - amazon (searching Amazon)
-        - github (searching GitHub)
-        - stackoverflow (searching Stack Overflow)
-        - screenshot (taking a screenshot)
-        - scroll (scrolling the page)
-        - click (clicking a button)
-        - extract (extracting text from the page)
-        - weather (checking weather)
-        - news (getting news)
-        - note_save (saving a note)
-        - note_read (reading saved notes)
-        - chat (general conversation)
-        - help (asking for help)
-        - exit (quitting the application)
-        
-        Extract any relevant parameters (like search queries, website names, city names, note content).
-        Respond with a JSON object containing 'command_type' and 'parameters'.
+        # Routine commands are resolved by the local classifier; the API is
+        # only asked when it isn't confident
+        local = classify_intent(command)
+        if is_confident(local):
+            return local
+        if not self.api_key:
+            if local["command_type"] in DESTRUCTIVE_INTENTS:
+                return {"command_type": "chat", "parameters": {"message": command}}
+            return local
+
+        # Classification has its own stateless request: no history is sent
+        # and nothing is added to it
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(self.model, COMMAND_ANALYZER_PROMPT, [], command)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return parse_command_analysis(cached, command)
+
+        try:
+            response = self._complete(
+                build_command_analysis_messages(command),
+                **COMMAND_ANALYZER_OPTIONS,
+            )
+        except Exception as e:
+            print(f"Error analyzing command: {e}")
+            return {"command_type": "chat", "parameters": {"message": command}}
+
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        return parse_command_analysis(response, command)
+
+
+class AsyncGPT4oAssistant(GPT4oAssistant):
+    """Asyncio counterpart of GPT4oAssistant with a cap on in-flight requests."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 100,
+        pool_size: int = HTTP_POOL_SIZE,
+        cache: Optional[CompletionCache] = None,
+        use_cache: bool = True,
+    ):
+        """
+        Initialize the async assistant.
+
+        Args:
+            api_key: OpenAI API key, defaults to the configured key
+            max_concurrency: Maximum number of requests in flight at once;
+                further calls wait for a free slot
+            pool_size: Maximum number of kept-alive connections to the API
+            cache: Completion cache to use, defaults to the shared one
+            use_cache: Whether to cache completions at all
+        """
+        if httpx is None:
+            raise ImportError(
+                "AsyncGPT4oAssistant requires httpx. Install it with 'pip install httpx'."
+            )
+
+        super().__init__(api_key, cache=cache, use_cache=use_cache)
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """The pooled async HTTP client, created on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            )
+        return self._client
+
+    async def ask(
+        self,
+        query: str,
+        system_prompt: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> str:
+        """
+        Send a query to GPT-4o and get a response.
+
+        Cancelling the calling task aborts the upstream request and frees
+        its concurrency slot.
+
+        Args:
+            query: The user's question or command
+            system_prompt: Optional system prompt to guide the model's behavior
+            bypass_cache: Skip the completion cache for this call
+
+        Returns:
+            The model's response as a string
         """
+        if not self.api_key:
+            return NO_API_KEY_MESSAGE
+
+        cache_key, cached = self._cached_response(query, system_prompt, bypass_cache)
+        if cached is not None:
+            self._record_exchange(query, cached)
+            return cached
+
+        messages = self._build_messages(query, system_prompt)
 
         try:
-            response = self.ask(command, system_prompt)
-            # Try to parse the response as JSON
-            result = json.loads(response)
-            return result
-        except json.JSONDecodeError:
-            # If the response isn't valid JSON, return a default
+            async with self._semaphore:
+                response = await self.client.post(
+                    self.api_url,
+                    headers=self.headers,
+                    json=self._build_payload(messages),
+                )
+            response_data = response.json()
+
+            if response.status_code == 200:
+                assistant_response = response_data["choices"][0]["message"]["content"]
+                if cache_key is not None:
+                    self.cache.set(cache_key, assistant_response, ttl=CACHE_CHAT_TTL)
+                self._record_exchange(query, assistant_response)
+                return assistant_response
+            else:
+                error_message = response_data.get("error", {}).get(
+                    "message", "Unknown error"
+                )
+                return f"Error from OpenAI API: {error_message}"
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"Error communicating with OpenAI API: {str(e)}"
+
+    async def ask_stream(
+        self,
+        query: str,
+        system_prompt: Optional[str] = None,
+        bypass_cache: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Send a query to GPT-4o and yield the response as it is generated.
+
+        The concurrency slot is held until the stream finishes or the
+        consumer stops iterating.
+
+        Args:
+            query: The user's question or command
+            system_prompt: Optional system prompt to guide the model's behavior
+            bypass_cache: Skip the completion cache for this call
+
+        Yields:
+            Pieces of the model's response as they arrive
+        """
+        if not self.api_key:
+            yield NO_API_KEY_MESSAGE
+            return
+
+        cache_key, cached = self._cached_response(query, system_prompt, bypass_cache)
+        if cached is not None:
+            self._record_exchange(query, cached)
+            yield cached
+            return
+
+        messages = self._build_messages(query, system_prompt)
+        payload = self._build_payload(messages, stream=True)
+        parts = []
+
+        try:
+            async with self._semaphore:
+                async with self.client.stream(
+                    "POST", self.api_url, headers=self.headers, json=payload
+                ) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        error_message = (
+                            response.json()
+                            .get("error", {})
+                            .get("message", "Unknown error")
+                        )
+                        yield f"Error from OpenAI API: {error_message}"
+                        return
+
+                    async for line in response.aiter_lines():
+                        for delta in iter_stream_deltas([line]):
+                            parts.append(delta)
+                            yield delta
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            yield f"Error communicating with OpenAI API: {str(e)}"
+            return
+
+        assistant_response = "".join(parts)
+        if cache_key is not None:
+            self.cache.set(cache_key, assistant_response, ttl=CACHE_CHAT_TTL)
+        self._record_exchange(query, assistant_response)
+
+    async def analyze_command(self, command: str) -> Dict[str, Any]:
+        """
+        Analyze a user command to determine intent and extract parameters.
+
+        Args:
+            command: The user's command
+
+        Returns:
+            A dictionary with the command type and parameters
+        """
+        local = classify_intent(command)
+        if is_confident(local):
+            return local
+        if not self.api_key:
+            if local["command_type"] in DESTRUCTIVE_INTENTS:
+                return {"command_type": "chat", "parameters": {"message": command}}
+            return local
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = make_cache_key(self.model, COMMAND_ANALYZER_PROMPT, [], command)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return parse_command_analysis(cached, command)
+
+        try:
+            response = await self._acomplete(
+                build_command_analysis_messages(command),
+                **COMMAND_ANALYZER_OPTIONS,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error analyzing command: {e}")
             return {"command_type": "chat", "parameters": {"message": command}}
+
+        if cache_key is not None:
+            self.cache.set(cache_key, response)
+        return parse_command_analysis(response, command)
+
+    async def _acomplete(self, messages: List[Dict[str, str]], **overrides) -> str:
+        """
+        Send a one-off request that doesn't read or update the history.
+
+        Raises:
+            RuntimeError: If the API returns an error
+        """
+        async with self._semaphore:
+            response = await self.client.post(
+                self.api_url,
+                headers=self.headers,
+                json=self._build_payload(messages, **overrides),
+            )
+        response_data = response.json()
+
+        if response.status_code != 200:
+            error_message = response_data.get("error", {}).get(
+                "message", "Unknown error"
+            )
+            raise RuntimeError(f"Error from OpenAI API: {error_message}")
+
+        return response_data["choices"][0]["message"]["content"]
+
+    def preconnect(self):
+        """Connections are opened lazily by the async client on first use."""
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def cancel_on_disconnect(
+    coro: Awaitable,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float = 0.5,
+):
+    """
+    Run a coroutine, cancelling it if the client goes away first.
+
+    Meant for async web handlers, e.g. with Starlette's
+    ``request.is_disconnected``:
+
+        reply = await cancel_on_disconnect(
+            assistant.ask(message), request.is_disconnected
+        )
+
+    Args:
+        coro: The coroutine to run, typically AsyncGPT4oAssistant.ask(...)
+        is_disconnected: Async callable returning True once the client has gone
+        poll_interval: Seconds between disconnect checks
+
+    Returns:
+        The coroutine's result, or None if the client disconnected
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
@@ -2,7 +2,7 @@ import json
 import os
 from datetime import datetime
 
-import requests
+from utils.http_utils import get_http_client
 
 try:
     from config import NEWS_API_KEY, WEATHER_API_KEY
@@ -18,7 +18,7 @@ def get_weather(city):
 
     try:
         url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-        response = requests.get(url)
+        response = get_http_client().get(url)
         data = response.json()
 
         if response.status_code == 200:
@@ -49,7 +49,7 @@ def get_news():
 
     try:
         url = f"https://newsapi.org/v2/top-headlines?country=us&apiKey={NEWS_API_KEY}"
-        response = requests.get(url)
+        response = get_http_client().get(url)
         data = response.json()
 
         if response.status_code == 200 and data.get("status") == "ok":
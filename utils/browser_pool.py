@@ -0,0 +1,337 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.web_utils import close_browser, setup_browser
+
+try:
+    import psutil
+except ImportError:  # Memory-based recycling is skipped without psutil
+    psutil = None
+
+# Pool settings (can be overridden with environment variables)
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "2"))
+BROWSER_LEASE_TIMEOUT = float(os.environ.get("BROWSER_LEASE_TIMEOUT", "30"))
+BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "50"))
+BROWSER_MAX_RSS_MB = float(os.environ.get("BROWSER_MAX_RSS_MB", "1500"))
+
+
+class BrowserUnavailable(RuntimeError):
+    """Raised when the pool is closed or can't launch a browser."""
+
+
+def browser_rss_mb(browser) -> float:
+    """
+    Return the resident memory of a browser's driver and browser processes.
+
+    Returns:
+        Memory in megabytes, or 0 when psutil is unavailable or the
+        process can't be found (e.g. remote or Safari drivers)
+    """
+    if psutil is None:
+        return 0.0
+    try:
+        process = psutil.Process(browser.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+class BrowserPool:
+    """
+    A pool of pre-launched WebDriver sessions shared between requests.
+
+    Each browser is leased to one request at a time. Browsers are health
+    checked when leased, and replaced after max_uses leases or once they
+    use more than max_rss_mb of memory, so a long-running server doesn't
+    accumulate leaks from one Chrome instance.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        factory: Optional[Callable[[], Any]] = None,
+        lease_timeout: float = BROWSER_LEASE_TIMEOUT,
+        max_uses: int = BROWSER_MAX_USES,
+        max_rss_mb: float = BROWSER_MAX_RSS_MB,
+        prewarm: bool = True,
+        profile: str = "lean",
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Maximum number of browsers
+            factory: Callable returning a new WebDriver, or None on failure;
+                defaults to setup_browser() with the given profile
+            lease_timeout: Default seconds to wait for a free browser
+            max_uses: Leases after which a browser is replaced
+            max_rss_mb: Memory after which a browser is replaced
+            prewarm: Launch all browsers in the background right away
+            profile: Browser profile of the default factory, see setup_browser
+        """
+        self.size = size
+        self.factory = factory or (
+            lambda: setup_browser(headless=True, profile=profile)
+        )
+        self.lease_timeout = lease_timeout
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+
+        self._idle: List[Any] = []
+        self._uses: Dict[int, int] = {}
+        # Browsers alive or being launched, leased or not
+        self._count = 0
+        self._waiting = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self.leases = 0
+        self.lease_timeouts = 0
+        self.recycled = 0
+        self.launch_failures = 0
+
+        if prewarm:
+            for _ in range(size):
+                self._launch_in_background()
+
+    def lease(self, timeout: Optional[float] = None):
+        """
+        Take a browser out of the pool, waiting for one to become free.
+
+        Args:
+            timeout: Seconds to wait, defaults to the pool's lease_timeout
+
+        Returns:
+            A healthy WebDriver, to be handed back with release()
+
+        Raises:
+            TimeoutError: If no browser became free in time
+            BrowserUnavailable: If the pool is closed or a new browser
+                couldn't be launched
+        """
+        deadline = time.monotonic() + (
+            self.lease_timeout if timeout is None else timeout
+        )
+
+        while True:
+            browser = None
+            with self._condition:
+                if self._closed:
+                    raise BrowserUnavailable("Browser pool is closed")
+
+                self._waiting += 1
+                try:
+                    while not self._idle and self._count >= self.size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.lease_timeouts += 1
+                            raise TimeoutError("No browser became free in time")
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+                if self._idle:
+                    browser = self._idle.pop()
+                else:
+                    self._count += 1
+
+            if browser is None:
+                browser = self._launch()
+                if browser is None:
+                    raise BrowserUnavailable("Could not launch a browser")
+            elif not self._is_healthy(browser):
+                self._retire(browser)
+                continue
+
+            with self._condition:
+                self.leases += 1
+            return browser
+
+    def release(self, browser, healthy: bool = True):
+        """
+        Hand a leased browser back to the pool.
+
+        Args:
+            browser: The browser returned by lease()
+            healthy: False if the browser is known to be broken
+        """
+        uses = self._uses.get(id(browser), 0) + 1
+        self._uses[id(browser)] = uses
+
+        if (
+            not healthy
+            or self._closed
+            or uses >= self.max_uses
+            or (self.max_rss_mb and browser_rss_mb(browser) > self.max_rss_mb)
+        ):
+            self._retire(browser)
+            if not self._closed:
+                self._launch_in_background()
+            return
+
+        with self._condition:
+            self._idle.append(browser)
+            self._condition.notify()
+
+    @contextmanager
+    def browser(self, timeout: Optional[float] = None):
+        """Lease a browser for the duration of a with block."""
+        browser = self.lease(timeout)
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def session(self, timeout: Optional[float] = None) -> "BrowserLease":
+        """Return a lease that takes a browser only when first needed."""
+        return BrowserLease(self, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool occupancy and counters, including the queue depth."""
+        with self._condition:
+            return {
+                "size": self.size,
+                "browsers": self._count,
+                "idle": len(self._idle),
+                "queue_depth": self._waiting,
+                "leases": self.leases,
+                "lease_timeouts": self.lease_timeouts,
+                "recycled": self.recycled,
+                "launch_failures": self.launch_failures,
+            }
+
+    def close(self):
+        """Quit every idle browser; leased ones are quit when released."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+
+        for browser in idle:
+            self._retire(browser)
+
+    def _launch(self):
+        """Start a new browser for a slot already counted in _count."""
+        try:
+            browser = self.factory()
+        except Exception as e:
+            print(f"Error launching pooled browser: {e}")
+            browser = None
+
+        if browser is None:
+            with self._condition:
+                self._count -= 1
+                self.launch_failures += 1
+                self._condition.notify()
+            return None
+
+        self._uses[id(browser)] = 0
+        return browser
+
+    def _launch_in_background(self):
+        """Launch a browser into the idle list, if the pool has room."""
+        with self._condition:
+            if self._closed or self._count >= self.size:
+                return
+            self._count += 1
+
+        def _run():
+            browser = self._launch()
+            if browser is not None:
+                with self._condition:
+                    self._idle.append(browser)
+                    self._condition.notify()
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _is_healthy(self, browser) -> bool:
+        """Check that the browser session still responds."""
+        try:
+            browser.execute_script("return 1")
+            return True
+        except Exception as e:
+            print(f"Pooled browser failed its health check: {e}")
+            return False
+
+    def _retire(self, browser):
+        """Quit a browser in the background and free its slot."""
+        self._uses.pop(id(browser), None)
+        with self._condition:
+            self._count -= 1
+            self.recycled += 1
+            self._condition.notify()
+
+        threading.Thread(target=close_browser, args=(browser,), daemon=True).start()
+
+
+class BrowserLease:
+    """
+    A browser leased from a pool on first use and returned on exit.
+
+    A command that never touches the browser never takes one from the pool,
+    and every tool call within a command gets the same browser.
+    """
+
+    def __init__(self, pool: BrowserPool, timeout: Optional[float] = None):
+        self.pool = pool
+        self.timeout = timeout
+        self._browser = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the leased browser, leasing one if needed."""
+        with self._lock:
+            if self._browser is None:
+                self._browser = self.pool.lease(self.timeout)
+            return self._browser
+
+    def release(self):
+        """Return the browser to the pool, if one was leased."""
+        with self._lock:
+            browser, self._browser = self._browser, None
+        if browser is not None:
+            self.pool.release(browser)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SharedBrowserLease:
+    """
+    A lease of one shared browser, held by one thread at a time.
+
+    Lets code written for pooled leases run against a single browser: get()
+    waits until no other lease holds the browser, and the browser stays
+    held until the lease is released.
+    """
+
+    def __init__(self, get_browser: Callable[[], Any], lock: threading.Lock):
+        self.get_browser = get_browser
+        self.lock = lock
+        self._held = False
+
+    def get(self):
+        """Return the shared browser, waiting for other leases to finish."""
+        if not self._held:
+            self.lock.acquire()
+            self._held = True
+        return self.get_browser()
+
+    def release(self):
+        """Let other leases use the browser."""
+        if self._held:
+            self._held = False
+            self.lock.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Cache settings (can be overridden with environment variables)
+CACHE_PATH = os.environ.get("COMPLETION_CACHE_PATH", "completion_cache.db")
+CACHE_TTL = float(os.environ.get("COMPLETION_CACHE_TTL", str(24 * 60 * 60)))
+# Chat replies are sampled, so a cached one is only reused for a short while
+CACHE_CHAT_TTL = float(os.environ.get("COMPLETION_CACHE_CHAT_TTL", str(10 * 60)))
+CACHE_MEMORY_ENTRIES = int(os.environ.get("COMPLETION_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_MAX_DISK_BYTES = int(
+    os.environ.get("COMPLETION_CACHE_MAX_DISK_BYTES", str(50 * 1024 * 1024))
+)
+
+
+def make_cache_key(
+    model: str,
+    system_prompt: Optional[str],
+    history: List[Dict[str, str]],
+    query: str,
+    tools: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """
+    Build a cache key for a completion request.
+
+    Args:
+        model: The model name
+        system_prompt: The system prompt sent with the request
+        history: The conversation history sent with the request
+        query: The user's query
+        tools: The tool definitions offered to the model, if any
+
+    Returns:
+        A hex digest identifying the request
+    """
+    history_digest = hashlib.sha256(
+        json.dumps(history, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    material = [model, system_prompt or "", history_digest, query.strip()]
+    if tools:
+        material.append(
+            hashlib.sha256(
+                json.dumps(tools, sort_keys=True).encode("utf-8")
+            ).hexdigest()
+        )
+    material = json.dumps(material, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Two-tier response cache: an in-memory LRU over a SQLite file on disk."""
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_PATH,
+        ttl: float = CACHE_TTL,
+        memory_entries: int = CACHE_MEMORY_ENTRIES,
+        max_disk_bytes: int = CACHE_MAX_DISK_BYTES,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file for the persistent tier, or None for memory only
+            ttl: Default time-to-live of an entry in seconds
+            memory_entries: Maximum number of entries kept in memory
+            max_disk_bytes: Maximum total size of values kept on disk
+        """
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS completions ("
+                    "key TEXT PRIMARY KEY, value TEXT, expires_at REAL, "
+                    "accessed_at REAL, size INTEGER)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error opening completion cache at {path}: {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for a key, or None if missing or expired."""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, expires_at FROM completions WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                    if row is not None:
+                        value, expires_at = row
+                        if expires_at > now:
+                            self._db.execute(
+                                "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                                (now, key),
+                            )
+                            self._db.commit()
+                            self._remember(key, expires_at, value)
+                            self.hits += 1
+                            self.disk_hits += 1
+                            return value
+                        self._db.execute(
+                            "DELETE FROM completions WHERE key = ?", (key,)
+                        )
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error reading completion cache: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """
+        Store a value in both tiers.
+
+        Args:
+            key: The cache key, see make_cache_key
+            value: The completion text
+            ttl: Time-to-live in seconds, defaults to the cache's ttl
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._remember(key, expires_at, value)
+
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO completions "
+                        "(key, value, expires_at, accessed_at, size) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, value, expires_at, now, len(value.encode("utf-8"))),
+                    )
+                    self._evict_disk(now)
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing completion cache: {e}")
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            disk_entries = disk_bytes = 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+                ).fetchone()
+
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def _remember(self, key: str, expires_at: float, value: str):
+        """Put an entry in the memory tier, evicting the least recently used."""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float):
+        """Drop expired entries, then least recently used ones until under the size cap."""
+        self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        if total <= self.max_disk_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, size FROM completions ORDER BY accessed_at"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+
+
+_cache: Optional[CompletionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_completion_cache() -> CompletionCache:
+    """Return the process-wide completion cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CompletionCache()
+    return _cache
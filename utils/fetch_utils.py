@@ -0,0 +1,565 @@
+import os
+import re
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from utils.http_utils import get_http_client
+
+# Fetch settings (can be overridden with environment variables)
+FETCH_CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", "3"))
+FETCH_READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", "10"))
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+# Pages with less main content than this are assumed to be rendered by JS
+FETCH_MIN_TEXT = int(os.environ.get("FETCH_MIN_TEXT", "200"))
+# Pages in a row that must need JavaScript before their domain is sent
+# straight to the browser, and seconds until the domain is tried again
+FETCH_JS_VERDICTS = int(os.environ.get("FETCH_JS_VERDICTS", "3"))
+FETCH_JS_TTL = float(os.environ.get("FETCH_JS_TTL", "1800"))
+
+FETCH_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.8",
+}
+
+# Same rules as the browser-side main content script in web_utils
+SKIP_TAGS = {
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "canvas",
+    "iframe",
+    "nav",
+    "footer",
+    "aside",
+    "form",
+    "button",
+    "select",
+    "dialog",
+    "head",
+}
+SKIP_ROLES = {
+    "navigation",
+    "banner",
+    "contentinfo",
+    "complementary",
+    "dialog",
+    "alertdialog",
+}
+BLOCK_TAGS = {
+    "p",
+    "div",
+    "section",
+    "article",
+    "main",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "ul",
+    "ol",
+    "table",
+    "pre",
+    "blockquote",
+}
+# Elements whose text is kept apart from the text around them
+SPACED_TAGS = BLOCK_TAGS | {"li", "br", "td", "th", "tr", "dt", "dd", "option"}
+NOISE = re.compile(
+    r"comment|footer|cookie|consent|banner|sidebar|sponsor|promo|related|share"
+    r"|social|\bnav|menu|modal|popup|subscribe|newsletter|breadcrumb|\bads?\b",
+    re.I,
+)
+CONTENT = re.compile(r"article|body|content|entry|main|post|text|story|result", re.I)
+
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+
+# Signs that a page only renders its content with JavaScript
+NOSCRIPT_WARNING = re.compile(
+    r"enable javascript|javascript is (?:disabled|required)|requires javascript"
+    r"|turn on javascript",
+    re.I,
+)
+CHALLENGE_PAGE = re.compile(
+    r"just a moment\.\.\.|cf-browser-verification|challenge-platform"
+    r"|are you a robot|unusual traffic",
+    re.I,
+)
+SPA_ROOT = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt|svelte)[\"'][^>]*>\s*</div>", re.I
+)
+
+# JavaScript verdicts in a row and when the last one came, by kind of
+# page ("page" or "results") and domain, learned as pages are fetched
+_js_domains: Dict[Tuple[str, str], Dict[str, float]] = {}
+_js_domains_lock = threading.Lock()
+
+
+class _Node:
+    """An element of a parsed page."""
+
+    __slots__ = ("tag", "attrs", "children", "parent", "_text")
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional["_Node"]):
+        self.tag = tag
+        self.attrs = attrs
+        self.children: List[Any] = []
+        self.parent = parent
+        self._text: Optional[str] = None
+
+    def elements(self) -> List["_Node"]:
+        return [child for child in self.children if isinstance(child, _Node)]
+
+    def text(self) -> str:
+        """Return the element's whitespace-collapsed text, like textContent."""
+        if self._text is None:
+            parts = []
+            for child in self.children:
+                if isinstance(child, str):
+                    parts.append(child)
+                elif child.tag in SPACED_TAGS:
+                    parts.append(f" {child.text()} ")
+                elif child.tag not in ("script", "style", "template"):
+                    parts.append(child.text())
+            self._text = " ".join("".join(parts).split())
+        return self._text
+
+    def iter(self):
+        """Yield all descendant elements in document order."""
+        for child in self.elements():
+            yield child
+            yield from child.iter()
+
+    def name(self) -> str:
+        return f"{self.attrs.get('id', '')} {self.attrs.get('class', '')}"
+
+    def select(self, selector: str) -> List["_Node"]:
+        """
+        Return the descendants matching a CSS selector.
+
+        Supports type, #id, .class and [attr], [attr=value], [attr^=value],
+        [attr$=value] and [attr*=value] selectors, joined by descendant and
+        child combinators, in comma-separated lists.
+        """
+        selectors = [_parse_selector(part) for part in selector.split(",")]
+        return [
+            node
+            for node in self.iter()
+            if any(_matches(node, parts, self) for parts in selectors)
+        ]
+
+    def select_one(self, selector: str) -> Optional["_Node"]:
+        """Return the first descendant matching a CSS selector, or None."""
+        matches = self.select(selector)
+        return matches[0] if matches else None
+
+
+_COMPOUND = re.compile(r"^([\w-]+|\*)?((?:[#.][\w-]+|\[[^\]]+\])*)$")
+_SIMPLE = re.compile(
+    r"([#.])([\w-]+)|\[([\w-]+)(?:([~^$*]?=)[\"']?([^\"'\]]*)[\"']?)?\]"
+)
+
+
+def _parse_selector(selector: str) -> List[Tuple[str, Any]]:
+    """Split a complex selector into (combinator, compound) pairs, last first."""
+    parts: List[Tuple[str, Any]] = []
+    combinator = " "
+    for token in re.findall(r">|[^\s>]+", selector.strip()):
+        if token == ">":
+            combinator = ">"
+            continue
+        match = _COMPOUND.match(token)
+        if match is None:
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        tag = match.group(1) if match.group(1) not in (None, "*") else None
+        parts.append((combinator, (tag, _SIMPLE.findall(match.group(2)))))
+        combinator = " "
+    parts.reverse()
+    return parts
+
+
+def _matches_compound(node: _Node, compound: Any) -> bool:
+    tag, simples = compound
+    if tag and node.tag != tag.lower():
+        return False
+    for kind, name, attr, op, value in simples:
+        if kind == "#" and node.attrs.get("id") != name:
+            return False
+        if kind == "." and name not in node.attrs.get("class", "").split():
+            return False
+        if attr:
+            actual = node.attrs.get(attr)
+            if actual is None:
+                return False
+            if (
+                (op == "=" and actual != value)
+                or (op == "~=" and value not in actual.split())
+                or (op == "^=" and not actual.startswith(value))
+                or (op == "$=" and not actual.endswith(value))
+                or (op == "*=" and value not in actual)
+            ):
+                return False
+    return True
+
+
+def _matches(node: _Node, parts: List[Tuple[str, Any]], scope: _Node) -> bool:
+    """Match a node against a parsed complex selector, within scope."""
+    (combinator, compound), rest = parts[0], parts[1:]
+    if not _matches_compound(node, compound):
+        return False
+    if not rest:
+        return True
+
+    ancestor = node.parent
+    while ancestor is not None and ancestor is not scope:
+        if _matches(ancestor, rest, scope):
+            return True
+        if combinator == ">":
+            return False
+        ancestor = ancestor.parent
+    return False
+
+
+class _TreeBuilder(HTMLParser):
+    """Build a lenient element tree from HTML."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#document", {}, None)
+        self.current = self.root
+
+    def handle_starttag(self, tag, attrs):
+        # A block starting inside a paragraph, or an item inside an item,
+        # closes it as browsers do
+        if (tag in BLOCK_TAGS and self.current.tag == "p") or (
+            tag == "li" and self.current.tag == "li"
+        ):
+            self.current = self.current.parent
+
+        node = _Node(tag, {k: v or "" for k, v in attrs}, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.current.children.append(
+            _Node(tag, {k: v or "" for k, v in attrs}, self.current)
+        )
+
+    def handle_endtag(self, tag):
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def _is_boilerplate(node: _Node) -> bool:
+    if node.tag in SKIP_TAGS or "hidden" in node.attrs:
+        return True
+    if node.attrs.get("aria-hidden") == "true":
+        return True
+    if node.attrs.get("role") in SKIP_ROLES:
+        return True
+    return bool(NOISE.search(node.name())) and not CONTENT.search(node.name())
+
+
+def _is_skipped(node: _Node, body: _Node) -> bool:
+    while node is not None and node is not body:
+        if _is_boilerplate(node):
+            return True
+        node = node.parent
+    return False
+
+
+def _link_density(node: _Node) -> float:
+    length = len(node.text())
+    if not length:
+        return 1.0
+    links = sum(len(a.text()) for a in node.iter() if a.tag == "a")
+    return links / length
+
+
+def _main_node(body: _Node) -> _Node:
+    """Pick the element holding the main content, like Readability."""
+    scores: Dict[int, Tuple[_Node, float]] = {}
+    for paragraph in body.iter():
+        if paragraph.tag not in ("p", "pre", "blockquote", "td", "li"):
+            continue
+        text = paragraph.text()
+        if len(text) < 25 or _is_skipped(paragraph, body):
+            continue
+
+        score = 1 + len(text.split(",")) + min(len(text) // 100, 3)
+        node = paragraph.parent
+        for level in range(3):
+            if node is None:
+                break
+            if id(node) not in scores:
+                base = 25 if CONTENT.search(node.name()) else 0
+                if node.tag in ("main", "article") or node.attrs.get("role") == "main":
+                    base += 25
+                scores[id(node)] = (node, base)
+            current = scores[id(node)]
+            scores[id(node)] = (node, current[1] + score / (level * 2 if level else 1))
+            node = node.parent
+
+    best, best_score = None, float("-inf")
+    for node, score in scores.values():
+        adjusted = score * (1 - _link_density(node))
+        if adjusted > best_score:
+            best, best_score = node, adjusted
+    if best is not None:
+        return best
+
+    for node in body.iter():
+        if node.tag in ("main", "article") or node.attrs.get("role") == "main":
+            return node
+    return body
+
+
+def parse_tree(html: str) -> _Node:
+    """Parse HTML into an element tree that supports select()."""
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def parse_html(
+    html: str, url: str = "", max_chars: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Extract the main content of an HTML page as structured blocks.
+
+    Returns the same structure as web_utils.extract_content, so the result
+    can be rendered with web_utils.format_blocks.
+
+    Args:
+        html: The page source
+        url: The page URL, used to make link targets absolute
+        max_chars: Stop after this many characters of text
+    """
+    root = parse_tree(html)
+    body = root.select_one("body") or root
+    title = root.select_one("title")
+    blocks: List[Dict[str, Any]] = []
+    state = {"size": 0, "truncated": False}
+
+    def add(block: Dict[str, Any], length: int) -> bool:
+        if max_chars and state["size"] + length > max_chars:
+            state["truncated"] = True
+            if block["type"] != "paragraph" or max_chars - state["size"] < 25:
+                return False
+            text = block["text"][: max_chars - state["size"]]
+            block["text"] = re.sub(r"\s+\S*$", "", text) + "..."
+            length = len(block["text"])
+        blocks.append(block)
+        state["size"] += length
+        return not state["truncated"]
+
+    def walk(element: _Node) -> bool:
+        for child in element.elements():
+            if _is_boilerplate(child):
+                continue
+            tag = child.tag
+            text = child.text()
+
+            if re.fullmatch(r"h[1-6]", tag):
+                go = not text or add(
+                    {"type": "heading", "level": int(tag[1]), "text": text}, len(text)
+                )
+            elif tag in ("ul", "ol"):
+                items = [item.text() for item in child.elements() if item.tag == "li"]
+                items = [item for item in items if item]
+                joined = "\n".join(items)
+                go = not items or add(
+                    {"type": "list", "items": items, "text": joined}, len(joined)
+                )
+            elif tag == "a" and child.attrs.get("href"):
+                href = urljoin(url, child.attrs["href"])
+                go = not text or add(
+                    {"type": "link", "text": text, "href": href}, len(text)
+                )
+            elif tag in ("p", "pre", "blockquote") or not any(
+                node.tag in BLOCK_TAGS for node in child.iter()
+            ):
+                go = not text or add({"type": "paragraph", "text": text}, len(text))
+            else:
+                go = walk(child)
+
+            if not go:
+                return False
+        return not state["truncated"]
+
+    walk(_main_node(body))
+    return {
+        "title": title.text() if title else "",
+        "url": url,
+        "blocks": blocks,
+        "truncated": state["truncated"],
+    }
+
+
+def needs_javascript(html: str, content: Dict[str, Any]) -> bool:
+    """
+    Guess whether a fetched page only shows its content with JavaScript.
+
+    Args:
+        html: The page source
+        content: The page parsed by parse_html
+    """
+    if content["truncated"]:
+        return False  # Cut short, so there was plenty of text
+
+    text_length = sum(len(block["text"]) for block in content["blocks"])
+    if CHALLENGE_PAGE.search(html[:20000]) and text_length < 1000:
+        return True
+    if text_length < FETCH_MIN_TEXT:
+        return True
+    noscript = re.findall(r"<noscript[^>]*>(.*?)</noscript>", html, re.I | re.S)
+    if any(NOSCRIPT_WARNING.search(block) for block in noscript):
+        return text_length < 1000
+    return bool(SPA_ROOT.search(html)) and text_length < 500
+
+
+def _domain(url: str) -> str:
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def learned_needs_javascript(url: str, kind: str = "page") -> bool:
+    """
+    Whether pages of a kind on the URL's domain are known to need a browser.
+
+    That takes FETCH_JS_VERDICTS pages in a row that needed one, and is
+    forgotten FETCH_JS_TTL seconds after the last, so one thin page doesn't
+    send a whole domain to the browser for good.
+
+    Args:
+        url: Any URL on the domain
+        kind: "page" for pages read with fetch_page, "results" for search
+            results pages, which are judged on their own
+    """
+    key = (kind, _domain(url))
+    with _js_domains_lock:
+        entry = _js_domains.get(key)
+        if entry is None:
+            return False
+        if time.monotonic() - entry["last"] > FETCH_JS_TTL:
+            del _js_domains[key]
+            return False
+        return entry["verdicts"] >= FETCH_JS_VERDICTS
+
+
+def mark_needs_javascript(url: str, needed: bool = True, kind: str = "page"):
+    """Record whether a page of a kind on the URL's domain needed a browser."""
+    key = (kind, _domain(url))
+    with _js_domains_lock:
+        if not needed:
+            _js_domains.pop(key, None)
+            return
+        entry = _js_domains.setdefault(key, {"verdicts": 0, "last": 0.0})
+        entry["verdicts"] += 1
+        entry["last"] = time.monotonic()
+
+
+def fetch_html(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Download a page through the shared HTTP client.
+
+    Returns:
+        The final URL after redirects and the page source, or None if the
+        request failed or didn't return HTML
+    """
+    if not url.startswith("http"):
+        url = "https://" + url
+
+    try:
+        response = get_http_client().get(
+            url,
+            headers=FETCH_HEADERS,
+            timeout=(FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT),
+            stream=True,
+        )
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+    with response:
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code != 200 or "html" not in content_type.lower():
+            return None
+
+        data = b""
+        for chunk in response.iter_content(64 * 1024):
+            data += chunk
+            if len(data) >= FETCH_MAX_BYTES:
+                break
+
+    charset = re.search(r"charset=([\w-]+)", content_type, re.I) or re.search(
+        rb"<meta[^>]+charset=[\"']?([\w-]+)", data[:4096], re.I
+    )
+    encoding = charset.group(1) if charset else "utf-8"
+    if isinstance(encoding, bytes):
+        encoding = encoding.decode("ascii")
+    try:
+        return response.url, data.decode(encoding, errors="replace")
+    except LookupError:
+        return response.url, data.decode("utf-8", errors="replace")
+
+
+def fetch_page(url: str, max_chars: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Get a page's main content over plain HTTP, without a browser.
+
+    Domains whose pages keep turning out to need JavaScript are skipped for
+    a while, so callers go straight to the browser for them.
+
+    Args:
+        url: The page URL
+        max_chars: Stop after this many characters of text
+
+    Returns:
+        The content as returned by parse_html, or None if the page needs a
+        browser
+    """
+    if learned_needs_javascript(url):
+        return None
+
+    fetched = fetch_html(url)
+    if fetched is None:
+        return None
+    final_url, html = fetched
+
+    content = parse_html(html, final_url, max_chars)
+    needed = needs_javascript(html, content)
+    mark_needs_javascript(url, needed)
+    return None if needed else content
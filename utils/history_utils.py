@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _ENCODING = None
+
+# History settings (can be overridden with environment variables)
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("SUMMARY_TOKEN_BUDGET", "300"))
+# Seconds before a failed summary is retried, doubled after every further
+# failure up to the maximum
+SUMMARY_RETRY_DELAY = float(os.environ.get("SUMMARY_RETRY_DELAY", "5"))
+SUMMARY_RETRY_MAX_DELAY = float(os.environ.get("SUMMARY_RETRY_MAX_DELAY", "300"))
+
+# Tokens the API adds around every message for the role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Message = Dict[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a piece of text uses.
+
+    Uses tiktoken when it is installed, otherwise the usual rule of thumb
+    of about four characters per token for English text.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(messages: List[Message]) -> int:
+    """Estimate the prompt tokens used by a list of chat messages."""
+    return sum(
+        estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to roughly max_tokens tokens, keeping the beginning."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text)[:max_tokens]) + " ..."
+    return text[: max_tokens * 4] + " ..."
+
+
+class TokenBudgetHistory:
+    """
+    Conversation history bounded by an estimated token budget.
+
+    When the history grows past the budget, the oldest exchanges are taken
+    out of the prompt and folded into a rolling summary. The summary is
+    written by a background thread, so adding a message never waits on it.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = HISTORY_TOKEN_BUDGET,
+        summarizer: Optional[Callable[[str, List[Message]], str]] = None,
+        summary_tokens: int = SUMMARY_TOKEN_BUDGET,
+    ):
+        """
+        Initialize the history.
+
+        Args:
+            max_tokens: Token budget for the history, including the summary
+            summarizer: Callable taking the current summary and a list of old
+                messages and returning an updated summary; without one, old
+                messages are simply dropped
+            summary_tokens: Token budget for the rolling summary
+        """
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_tokens = summary_tokens
+
+        self.turns: List[Message] = []
+        self.summary = ""
+        self._pending: List[Message] = []
+        self._summarizing = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def add_exchange(self, user_message: str, assistant_message: str):
+        """Add a user message and the assistant's reply."""
+        with self._lock:
+            self.turns.append({"role": "user", "content": user_message})
+            self.turns.append({"role": "assistant", "content": assistant_message})
+            self._enforce_budget()
+
+        self._start_summary()
+
+    def messages(self, reserve_tokens: int = 0) -> List[Message]:
+        """
+        Return the history as chat messages.
+
+        Args:
+            reserve_tokens: Tokens of the budget already used by the rest of
+                the prompt (system prompt and query); older turns are left
+                out of the result until it fits
+
+        Returns:
+            The summary (if any) followed by the most recent turns
+        """
+        with self._lock:
+            budget = max(self.max_tokens - reserve_tokens, 0)
+            result = []
+
+            if self.summary:
+                summary_message = {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {self.summary}",
+                }
+                if estimate_message_tokens([summary_message]) <= budget:
+                    result.append(summary_message)
+                    budget -= estimate_message_tokens([summary_message])
+
+            window = []
+            for message in reversed(self.turns):
+                cost = estimate_message_tokens([message])
+                if cost > budget:
+                    break
+                window.append(message)
+                budget -= cost
+
+            return result + list(reversed(window))
+
+    def token_count(self) -> int:
+        """Return the estimated tokens used by the summary and kept turns."""
+        return estimate_message_tokens(self.messages())
+
+    def clear(self):
+        """Remove all messages and the summary."""
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+            self._pending = []
+            self._failures = 0
+            self._retry_at = 0.0
+            self._generation += 1
+
+    def __len__(self):
+        return len(self.turns)
+
+    def _enforce_budget(self):
+        """Move the oldest exchanges out of the kept turns until they fit."""
+        # Room for the summary is reserved up front, so the total stays
+        # bounded whether or not a summary has been written yet
+        budget = self.max_tokens
+        if self.summarizer is not None:
+            budget -= self.summary_tokens + MESSAGE_OVERHEAD_TOKENS
+
+        while len(self.turns) > 2 and estimate_message_tokens(self.turns) > budget:
+            self._pending.extend(self.turns[:2])
+            self.turns = self.turns[2:]
+
+        # A single oversized exchange (e.g. pasted page text) is truncated
+        # rather than dropped, so the latest context is never lost entirely
+        if estimate_message_tokens(self.turns) > budget:
+            per_message = max(
+                budget // max(len(self.turns), 1) - MESSAGE_OVERHEAD_TOKENS, 1
+            )
+            self.turns = [
+                {
+                    "role": message["role"],
+                    "content": truncate_to_tokens(message["content"], per_message),
+                }
+                for message in self.turns
+            ]
+
+        if self.summarizer is None:
+            self._pending = []
+        self._cap_pending()
+
+    def _cap_pending(self):
+        """
+        Drop the oldest pending messages beyond the history's token budget.
+
+        Messages pile up while summaries fail, e.g. with the API down; the
+        cap keeps the prompt of the next attempt within the budget.
+        """
+        while (
+            len(self._pending) > 1
+            and estimate_message_tokens(self._pending) > self.max_tokens
+        ):
+            self._pending.pop(0)
+        if self._pending and estimate_message_tokens(self._pending) > self.max_tokens:
+            message = self._pending[0]
+            self._pending = [
+                {
+                    "role": message["role"],
+                    "content": truncate_to_tokens(
+                        message["content"],
+                        max(self.max_tokens - MESSAGE_OVERHEAD_TOKENS, 1),
+                    ),
+                }
+            ]
+
+    def _start_summary(self):
+        """Fold pending messages into the summary in a background thread."""
+        with self._lock:
+            if self._summarizing or not self._pending or self.summarizer is None:
+                return
+            # Back off after a failure rather than retry on every message
+            if time.monotonic() < self._retry_at:
+                return
+            self._summarizing = True
+            pending, self._pending = self._pending, []
+            previous_summary = self.summary
+            generation = self._generation
+
+        def _summarize():
+            try:
+                summary = self.summarizer(previous_summary, pending)
+                with self._lock:
+                    # Ignore summaries of a history that was cleared meanwhile
+                    if generation == self._generation:
+                        self.summary = truncate_to_tokens(
+                            summary, self.summary_tokens
+                        )
+                        self._failures = 0
+            except Exception as e:
+                print(f"Error summarizing conversation history: {e}")
+                with self._lock:
+                    # Keep the messages for the next attempt, which a message
+                    # added after the back-off starts, rather than losing them
+                    if generation == self._generation:
+                        self._pending = pending + self._pending
+                        self._cap_pending()
+                        self._failures += 1
+                        self._retry_at = time.monotonic() + min(
+                            SUMMARY_RETRY_DELAY * 2 ** (self._failures - 1),
+                            SUMMARY_RETRY_MAX_DELAY,
+                        )
+                    self._summarizing = False
+                return
+            with self._lock:
+                self._summarizing = False
+            # Messages may have been folded while this summary was written
+            self._start_summary()
+
+        threading.Thread(target=_summarize, daemon=True).start()
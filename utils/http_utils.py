@@ -0,0 +1,176 @@
+import os
+import tempfile
+import threading
+from http.cookiejar import Cookie, LoadError, MozillaCookieJar
+from typing import Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.lock_utils import FileLock
+
+# Connection pool settings (can be overridden with environment variables)
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
+
+# Cookie jar shared by the browser and the HTTP client, in the Netscape
+# cookies.txt format, so logins and consent made in the browser carry over
+COOKIE_JAR_PATH = os.environ.get("COOKIE_JAR_PATH", "cookies.txt")
+
+
+def load_cookie_jar(path: Optional[str] = None) -> MozillaCookieJar:
+    """Read a cookie jar, returning an empty one if it can't be read."""
+    jar = MozillaCookieJar(path or COOKIE_JAR_PATH)
+    try:
+        jar.load(ignore_discard=True)
+    except FileNotFoundError:
+        pass
+    except (OSError, LoadError) as e:
+        print(f"Error reading cookie jar {jar.filename}: {e}")
+    return jar
+
+
+def save_cookie_jar(jar: MozillaCookieJar, path: Optional[str] = None):
+    """
+    Write a cookie jar, session cookies included, without expired cookies.
+
+    The jar holds login cookies, so it is only readable by its owner. Call
+    with the jar's lock held if others may write it too, see
+    merge_cookie_jar().
+    """
+    path = path or jar.filename or COOKIE_JAR_PATH
+    jar.clear_expired_cookies()
+    tmp_path = None
+    try:
+        # mkstemp creates the file with 0600 permissions, which it keeps
+        # when it replaces the jar
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            delete=False,
+        ) as tmp:
+            tmp_path = tmp.name
+        jar.save(tmp_path, ignore_discard=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving cookie jar {path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def merge_cookie_jar(
+    cookies: Iterable[Cookie], path: Optional[str] = None
+) -> MozillaCookieJar:
+    """
+    Add cookies to the cookie jar on disk, replacing ones of the same name.
+
+    The jar is read, merged and written under a file lock, so concurrent
+    writers in any process don't lose each other's cookies.
+
+    Returns:
+        The merged jar
+    """
+    path = path or COOKIE_JAR_PATH
+    with FileLock(f"{path}.lock"):
+        jar = load_cookie_jar(path)
+        for cookie in cookies:
+            jar.set_cookie(cookie)
+        save_cookie_jar(jar)
+    return jar
+
+
+class HTTPClient:
+    """Thread-safe HTTP client that reuses keep-alive connections."""
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+    ):
+        """
+        Initialize the client with a pooled session.
+
+        Args:
+            pool_size: Maximum number of kept-alive connections per host
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait for the server to send data
+        """
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def load_cookies(self, path: Optional[str] = None) -> int:
+        """
+        Add the cookies of a cookie jar to the session.
+
+        Returns:
+            The number of cookies loaded
+        """
+        jar = load_cookie_jar(path)
+        for cookie in jar:
+            self.session.cookies.set_cookie(cookie)
+        return len(jar)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the shared connection pool."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def preconnect(self, url: str, background: bool = True):
+        """
+        Open a connection to a host ahead of the first real request.
+
+        The TCP and TLS handshakes happen now, so the connection is already
+        sitting in the pool when the first chat message is sent.
+
+        Args:
+            url: Any URL on the host to connect to
+            background: Whether to connect in a daemon thread
+        """
+
+        def _connect():
+            try:
+                self.session.head(url, timeout=self.timeout)
+            except Exception as e:
+                print(f"Error pre-connecting to {url}: {e}")
+
+        if background:
+            threading.Thread(target=_connect, daemon=True).start()
+        else:
+            _connect()
+
+    def close(self):
+        """Close all pooled connections."""
+        self.session.close()
+
+
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Return the process-wide shared HTTP client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient()
+                _client.load_cookies()
+    return _client
@@ -0,0 +1,270 @@
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "intent_corpus.json")
+
+# Below this confidence the LLM classifier is asked instead
+INTENT_CONFIDENCE_THRESHOLD = float(
+    os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.6")
+)
+
+# Intents that can't be undone are never acted on from the classifier's
+# guess, however confident; only an exact command pattern runs them
+DESTRUCTIVE_INTENTS = {"exit", "clear"}
+
+HASH_BUCKETS = 1 << 18
+_TOKEN_PATTERN = re.compile(r"[a-z0-9']+|[^\sa-z0-9]")
+
+
+def extract_features(text: str) -> Dict[int, float]:
+    """
+    Turn text into hashed n-gram features.
+
+    Uses word unigrams and bigrams plus character trigrams of each word, so
+    typos and unseen word forms still share features with the seed corpus.
+
+    Returns:
+        A sparse map of hash bucket to feature value
+    """
+    words = _TOKEN_PATTERN.findall(text.lower())
+    grams = [f"w:{word}" for word in words]
+    grams += [f"b:{a} {b}" for a, b in zip(["^"] + words, words + ["$"])]
+    for word in words:
+        padded = f"#{word}#"
+        grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    features: Dict[int, float] = {}
+    for gram in grams:
+        bucket = zlib.crc32(gram.encode("utf-8")) % HASH_BUCKETS
+        features[bucket] = features.get(bucket, 0.0) + 1.0
+
+    # Normalize so long inputs don't get more confident just by being long
+    norm = math.sqrt(sum(value * value for value in features.values())) or 1.0
+    return {bucket: value / norm for bucket, value in features.items()}
+
+
+class IntentClassifier:
+    """Multinomial logistic regression over hashed n-gram features."""
+
+    def __init__(self, epochs: int = 15, learning_rate: float = 0.5):
+        """
+        Initialize an untrained classifier.
+
+        Args:
+            epochs: Passes over the training data
+            learning_rate: Step size of the gradient updates
+        """
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.labels: List[str] = []
+        self.weights: Dict[str, Dict[int, float]] = {}
+        self.bias: Dict[str, float] = {}
+
+    def train(self, examples: List[Tuple[str, str]]):
+        """
+        Train on (text, label) pairs with plain stochastic gradient descent.
+
+        The examples are visited in a fixed interleaved order, so training is
+        deterministic.
+        """
+        self.labels = sorted({label for _, label in examples})
+        self.weights = {label: {} for label in self.labels}
+        self.bias = {label: 0.0 for label in self.labels}
+
+        data = [(extract_features(text), label) for text, label in examples]
+        order = sorted(range(len(data)), key=lambda i: (i * 7919) % len(data))
+
+        for epoch in range(self.epochs):
+            rate = self.learning_rate / (1 + epoch * 0.1)
+            for i in order:
+                features, label = data[i]
+                probabilities = self._probabilities(features)
+                for candidate in self.labels:
+                    gradient = probabilities[candidate] - (candidate == label)
+                    if abs(gradient) < 1e-4:
+                        continue
+                    weights = self.weights[candidate]
+                    for bucket, value in features.items():
+                        weights[bucket] = (
+                            weights.get(bucket, 0.0) - rate * gradient * value
+                        )
+                    self.bias[candidate] -= rate * gradient * 0.1
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Classify a piece of text.
+
+        Returns:
+            The most likely label and its probability
+        """
+        probabilities = self._probabilities(extract_features(text))
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def _probabilities(self, features: Dict[int, float]) -> Dict[str, float]:
+        """Return the softmax probability of each label."""
+        scores = {}
+        for label in self.labels:
+            weights = self.weights[label]
+            scores[label] = self.bias[label] + sum(
+                weights.get(bucket, 0.0) * value for bucket, value in features.items()
+            )
+
+        top = max(scores.values())
+        exps = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exps.values())
+        return {label: value / total for label, value in exps.items()}
+
+
+# Words that introduce a search rather than being part of the query
+_SEARCH_FILLER = re.compile(
+    r"^(?:please\s+)?(?:can you\s+)?(?:search(?:\s+the\s+web)?|find|look\s+(?:for|up)|"
+    r"play|watch|show\s+me|buy|order|shop\s+for|put\s+on|web\s+search|"
+    r"google|youtube|amazon|github|stack\s*overflow|so)\b\s*",
+)
+_SITE_MENTION = re.compile(
+    r"\s*\b(?:(?:on|from|in)\s+)?(?:youtube|google|amazon|github|stack\s*overflow)"
+    r"(?:\s+(?:search|for))*\b\s*",
+)
+_LEADING_FOR = re.compile(r"^(?:for|about|a|an)\s+")
+_TRAILING_WORDS = re.compile(
+    r"\s+(?:videos?|repositor(?:y|ies)|repos?|projects?|questions?|error|please)$"
+)
+_URL = re.compile(r"(https?://\S+|(?:www\.)?[a-z0-9-]+(?:\.[a-z0-9-]+)+(?::\d+)?\S*)")
+_CITY = re.compile(
+    r"\b(?:in|at|for)\s+([a-z][a-z .'-]*?)(?:\s+(?:today|tomorrow|now|this week))?\s*\??$"
+)
+_CITY_LEADING = re.compile(r"^([a-z][a-z .'-]*?)\s+weather\b")
+
+
+def extract_query(text: str) -> str:
+    """Strip command words and site names from a search command."""
+    query = text.lower().strip().rstrip("?.!")
+    for _ in range(3):
+        query = _SEARCH_FILLER.sub("", query)
+        query = _SITE_MENTION.sub(" ", query).strip()
+        query = _LEADING_FOR.sub("", query)
+    query = _TRAILING_WORDS.sub("", query)
+    return query.strip()
+
+
+def extract_parameters(command_type: str, text: str) -> Dict[str, Any]:
+    """
+    Pull the slots a command type needs out of the text.
+
+    Args:
+        command_type: The classified command type
+        text: The user's command
+
+    Returns:
+        The parameters in the same shape analyze_command returns
+    """
+    lowered = text.lower().strip()
+
+    if command_type == "website":
+        match = _URL.search(lowered)
+        if match:
+            return {"url": match.group(1)}
+        site = re.sub(
+            r"^(?:please\s+)?(?:can you\s+)?(?:open|go to|visit|navigate to|"
+            r"take me to|launch|browse to|pull up)\s+(?:the\s+)?(?:website\s+)?",
+            "",
+            lowered,
+        ).strip()
+        return {"url": f"{site}.com" if site and "." not in site else site}
+
+    if command_type in ("youtube", "google", "amazon", "github", "stackoverflow"):
+        return {"query": extract_query(text)}
+
+    if command_type == "weather":
+        match = _CITY.search(lowered) or _CITY_LEADING.search(lowered)
+        return {"city": match.group(1).strip().title()} if match else {}
+
+    if command_type == "note_save":
+        note = re.sub(
+            r"^(?:save\s+(?:a\s+)?note(?:\s+saying)?|make\s+a\s+note|add\s+a\s+note|"
+            r"take\s+a\s+note|note(?:\s+that)?|remember(?:\s+to)?|remind\s+me\s+to|"
+            r"jot\s+down|write\s+down)\s*:?\s*",
+            "",
+            text.strip(),
+            flags=re.IGNORECASE,
+        )
+        return {"note": note.strip()}
+
+    if command_type == "scroll":
+        direction = "up" if re.search(r"\bup\b", lowered) else "down"
+        amount = re.search(r"\b(\d+)\b", lowered)
+        return {"direction": direction, "amount": int(amount.group(1)) if amount else 1}
+
+    if command_type == "click":
+        target = re.sub(
+            r"^(?:click|press|tap|hit|push)\s+(?:on\s+)?(?:the\s+)?(?:link\s+)?",
+            "",
+            text.strip(),
+            flags=re.IGNORECASE,
+        )
+        target = re.sub(r"\s+(?:button|link)$", "", target, flags=re.IGNORECASE)
+        return {"text": target.strip()}
+
+    if command_type == "chat":
+        return {"message": text}
+
+    return {}
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Tuple[str, str]]:
+    """Load the seed corpus of (text, command type) examples."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(text, label) for text, label in json.load(f)]
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Return the shared classifier, training it on the seed corpus on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = IntentClassifier()
+                classifier.train(load_corpus())
+                _classifier = classifier
+    return _classifier
+
+
+def classify_intent(text: str) -> Dict[str, Any]:
+    """
+    Classify a command locally, without calling the API.
+
+    Args:
+        text: The user's command
+
+    Returns:
+        A dictionary with 'command_type', 'parameters' and 'confidence'
+    """
+    command_type, confidence = get_intent_classifier().predict(text)
+    return {
+        "command_type": command_type,
+        "parameters": extract_parameters(command_type, text),
+        "confidence": confidence,
+    }
+
+
+def is_confident(analysis: Dict[str, Any]) -> bool:
+    """
+    Whether a classify_intent() result can be acted on without asking the model.
+
+    Destructive intents never are: "close the popup" looks like "close" to
+    the classifier.
+    """
+    return (
+        analysis["command_type"] not in DESTRUCTIVE_INTENTS
+        and analysis["confidence"] >= INTENT_CONFIDENCE_THRESHOLD
+    )
@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+
+from utils.wait_utils import wait_for_condition
+
+# Candidate locators of each site's search controls, best first. "box" is
+# the search input; "opener" is a control that has to be clicked before
+# the input appears. Strategies are id, name, css and xpath.
+SEARCH_LOCATORS = {
+    "youtube": {
+        "box": [
+            ("name", "search_query"),
+            ("css", "input#search"),
+            ("css", "input[aria-label='Search']"),
+        ],
+    },
+    "google": {
+        "box": [
+            ("name", "q"),
+            ("css", "textarea[aria-label='Search']"),
+            ("css", "[role='combobox'][aria-label='Search']"),
+        ],
+    },
+    "amazon": {
+        "box": [
+            ("id", "twotabsearchtextbox"),
+            ("name", "field-keywords"),
+            ("css", "input[type='text'][aria-label*='Search']"),
+        ],
+    },
+    "github": {
+        "opener": [
+            ("xpath", "//button[@aria-label='Search']"),
+            ("css", "button[data-target='qbsearch-input.inputButton']"),
+            ("css", "qbsearch-input button.header-search-button"),
+        ],
+        "box": [
+            ("id", "query-builder-test"),
+            ("css", "input[name='query-builder-test']"),
+            ("css", "input[aria-label*='Search'][type='text']"),
+        ],
+    },
+    "stackoverflow": {
+        "box": [
+            ("name", "q"),
+            ("css", "input[type='text'][aria-label='Search']"),
+        ],
+    },
+}
+
+# File remembering which candidate worked on each site, and how often each
+# one was found or missing
+LOCATOR_REGISTRY_PATH = os.environ.get("LOCATOR_REGISTRY_PATH", "locator_registry.json")
+
+# Misses in a row after which a candidate counts as failing rather than
+# degrading
+LOCATOR_FAILING_STREAK = 3
+
+_FIND_FIRST_SCRIPT = """
+const candidates = arguments[0];
+const usable = [];
+let found = null;
+for (let i = 0; i < candidates.length; i++) {
+  const [kind, value] = candidates[i];
+  let element = null;
+  try {
+    element = kind === "xpath"
+      ? document.evaluate(
+          value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+        ).singleNodeValue
+      : document.querySelector(value);
+  } catch (e) {
+    // Invalid selector, treated as missing
+  }
+  const ok = Boolean(
+    element && element.getClientRects().length && !element.disabled
+  );
+  usable.push(ok);
+  if (ok && !found) found = [i, element];
+}
+return found && [found[0], found[1], usable];
+"""
+
+_registry: Optional[Dict[str, Any]] = None
+_registry_lock = threading.Lock()
+
+
+def _key(candidate: Tuple[str, str]) -> str:
+    return f"{candidate[0]}={candidate[1]}"
+
+
+def _to_selector(candidate: Tuple[str, str]) -> List[str]:
+    """Turn a candidate into a CSS selector or XPath for the finder script."""
+    strategy, value = candidate
+    quoted = value.replace("\\", "\\\\").replace('"', '\\"')
+    if strategy == "id":
+        return ["css", f'[id="{quoted}"]']
+    if strategy == "name":
+        return ["css", f'[name="{quoted}"]']
+    return [strategy, value]
+
+
+def _load_registry() -> Dict[str, Any]:
+    """Return the registry, reading it from disk on first use."""
+    global _registry
+    if _registry is None:
+        try:
+            with open(LOCATOR_REGISTRY_PATH, "r", encoding="utf-8") as f:
+                _registry = json.load(f)
+            if not isinstance(_registry, dict):
+                _registry = {}
+        except (OSError, ValueError):
+            _registry = {}
+    return _registry
+
+
+def _save_registry():
+    """Write the registry to disk; call with _registry_lock held."""
+    try:
+        tmp_path = f"{LOCATOR_REGISTRY_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_registry, f, indent=2)
+        os.replace(tmp_path, LOCATOR_REGISTRY_PATH)
+    except OSError as e:
+        print(f"Error saving locator registry: {e}")
+
+
+def ranked_candidates(site: str, part: str = "box") -> List[Tuple[str, str]]:
+    """Return a site's candidates for a part, the last one that worked first."""
+    candidates = [tuple(candidate) for candidate in SEARCH_LOCATORS[site][part]]
+    with _registry_lock:
+        winner = _load_registry().get(site, {}).get(part, {}).get("winner")
+    for candidate in candidates:
+        if _key(candidate) == winner:
+            candidates.remove(candidate)
+            candidates.insert(0, candidate)
+            break
+    return candidates
+
+
+def _record(
+    site: str,
+    part: str,
+    candidates,
+    found: Optional[int],
+    usable: Optional[List[bool]] = None,
+):
+    """
+    Count a hit or a miss for every candidate of a lookup.
+
+    Every candidate is checked on each lookup, not just those ranked before
+    the one used, so a primary locator that broke keeps collecting misses
+    after a fallback has taken its place.
+    """
+    now = time.time()
+    usable = usable or [False] * len(candidates)
+    with _registry_lock:
+        entry = _load_registry().setdefault(site, {}).setdefault(part, {})
+        stats = entry.setdefault("stats", {})
+        for candidate, hit in zip(candidates, usable):
+            record = stats.setdefault(
+                _key(candidate), {"hits": 0, "misses": 0, "miss_streak": 0}
+            )
+            if hit:
+                record["hits"] += 1
+                record["miss_streak"] = 0
+                record["last_hit"] = now
+            else:
+                record["misses"] += 1
+                record["miss_streak"] += 1
+                record["last_miss"] = now
+        if found is not None:
+            entry["winner"] = _key(candidates[found])
+        _save_registry()
+
+
+def find_locator(
+    browser, site: str, part: str = "box", timeout: Optional[float] = None
+) -> Optional[Any]:
+    """
+    Find a visible, enabled element of a site's search controls.
+
+    All candidates are checked together, best first, by one script call per
+    poll, so a stale locator costs nothing once another candidate matches
+    instead of a full timeout of its own. The candidate found is remembered
+    and ranked first from then on.
+
+    Args:
+        browser: The browser instance
+        site: One of the SEARCH_LOCATORS sites
+        part: "box" or "opener"
+        timeout: Seconds to wait for any candidate, defaults to the element
+            budget
+
+    Returns:
+        The element, or None if no candidate appeared in time
+    """
+    candidates = ranked_candidates(site, part)
+    selectors = [_to_selector(candidate) for candidate in candidates]
+    try:
+        found = wait_for_condition(
+            browser,
+            lambda driver: driver.execute_script(_FIND_FIRST_SCRIPT, selectors),
+            timeout,
+        )
+    except WebDriverException as e:
+        print(f"Error finding {site} search {part}: {e}")
+        found = None
+
+    if found is None:
+        _record(site, part, candidates, None)
+        return None
+    index, element, usable = found
+    _record(site, part, candidates, index, usable)
+    return element
+
+
+def locator_health() -> List[Dict[str, Any]]:
+    """
+    Report how each search locator has been doing.
+
+    Returns:
+        One dict per candidate with its "site", "part", "locator", "hits",
+        "misses", whether it is the current "winner" and a "status": "ok",
+        "degrading" (missed lately, but has worked), "failing" (missed
+        LOCATOR_FAILING_STREAK times in a row or never worked) or "unused"
+    """
+    with _registry_lock:
+        registry = json.loads(json.dumps(_load_registry()))
+
+    report = []
+    for site, parts in SEARCH_LOCATORS.items():
+        for part, candidates in parts.items():
+            entry = registry.get(site, {}).get(part, {})
+            for candidate in candidates:
+                key = _key(candidate)
+                record = entry.get("stats", {}).get(key)
+                if record is None:
+                    status = "unused"
+                elif record["miss_streak"] >= LOCATOR_FAILING_STREAK or (
+                    record["misses"] and not record["hits"]
+                ):
+                    status = "failing"
+                elif record["miss_streak"]:
+                    status = "degrading"
+                else:
+                    status = "ok"
+                report.append(
+                    {
+                        "site": site,
+                        "part": part,
+                        "locator": key,
+                        "hits": record["hits"] if record else 0,
+                        "misses": record["misses"] if record else 0,
+                        "winner": entry.get("winner") == key,
+                        "status": status,
+                    }
+                )
+    return report
@@ -0,0 +1,71 @@
+try:
+    import fcntl
+except ImportError:  # Windows locks with msvcrt instead
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    An exclusive lock on a file, shared across processes and threads.
+
+    Every instance opens the lock file itself, so two threads of one
+    process exclude each other just like two processes do. The lock is
+    released by the operating system if the process dies, so it never
+    goes stale.
+    """
+
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Take the lock.
+
+        Args:
+            blocking: Wait for the lock instead of giving up if it is held
+
+        Returns:
+            True if the lock was taken, False if it is held elsewhere and
+            blocking is False
+        """
+        lock_file = open(self.lock_path, "a+")
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(lock_file.fileno(), flags)
+            else:
+                lock_file.seek(0)
+                mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                msvcrt.locking(lock_file.fileno(), mode, 1)
+        except OSError:
+            lock_file.close()
+            if blocking:
+                raise
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        """Give the lock up, if held."""
+        lock_file, self._file = self._file, None
+        if lock_file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError as e:
+            print(f"Error unlocking {self.lock_path}: {e}")
+        finally:
+            lock_file.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
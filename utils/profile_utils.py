@@ -0,0 +1,287 @@
+import json
+import os
+import shutil
+import threading
+from http.cookiejar import Cookie
+from typing import Any, Dict, Optional
+
+from selenium.common.exceptions import WebDriverException
+
+from utils.http_utils import get_http_client, load_cookie_jar, merge_cookie_jar
+from utils.lock_utils import FileLock
+
+# Directory of the persistent browser profiles, one per backend and
+# setup_browser() profile; set to "" to start every browser with an empty
+# throwaway profile
+BROWSER_PROFILE_DIR = os.environ.get("BROWSER_PROFILE_DIR", "browser_profile")
+
+# Size above which a profile's caches are deleted before the browser starts
+BROWSER_PROFILE_MAX_MB = float(os.environ.get("BROWSER_PROFILE_MAX_MB", "500"))
+
+# Cache directories inside a profile, relative to it, deleted in this order
+# when the profile grows past its cap. Cookies, logins and site storage are
+# never trimmed.
+PROFILE_CACHE_DIRS = {
+    "chrome": [
+        os.path.join("Default", "Cache"),
+        os.path.join("Default", "Code Cache"),
+        os.path.join("Default", "Service Worker", "CacheStorage"),
+        os.path.join("Default", "Service Worker", "ScriptCache"),
+        os.path.join("Default", "GPUCache"),
+        "GrShaderCache",
+        "GraphiteDawnCache",
+        "ShaderCache",
+        "component_crx_cache",
+    ],
+    "firefox": ["cache2", "startupCache", "thumbnails", "shader-cache"],
+}
+
+PROFILE_LOCK_FILE = ".agent.lock"
+CONSENT_FILE = "consent.json"
+
+# Profile lock held by each running browser, by id of the browser
+_profiles: Dict[int, "ProfileLock"] = {}
+_profiles_lock = threading.Lock()
+
+
+class ProfileLock(FileLock):
+    """
+    An exclusive lock on a profile directory, shared across processes.
+
+    Two browsers writing to one profile corrupt it, so a profile is only
+    used by the browser that holds its lock.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(os.path.join(path, PROFILE_LOCK_FILE))
+        self.path = path
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """
+        Take the lock, by default without waiting.
+
+        Returns:
+            True if the lock was taken, False if another browser holds it
+        """
+        os.makedirs(self.path, exist_ok=True)
+        return super().acquire(blocking)
+
+
+def _dir_size(path: str) -> int:
+    """Return the total size of the files under a directory, in bytes."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def trim_profile(path: str, backend: str, max_mb: Optional[float] = None) -> int:
+    """
+    Delete a profile's caches, in PROFILE_CACHE_DIRS order, until it fits its cap.
+
+    Only call this while the profile's browser isn't running.
+
+    Args:
+        path: The profile directory
+        backend: The browser backend the profile belongs to
+        max_mb: The cap, defaults to BROWSER_PROFILE_MAX_MB; 0 disables it
+
+    Returns:
+        The number of bytes freed
+    """
+    limit = (BROWSER_PROFILE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    size = _dir_size(path)
+    if not limit or size <= limit:
+        return 0
+
+    freed = 0
+    for cache_dir in PROFILE_CACHE_DIRS.get(backend, []):
+        if size - freed <= limit:
+            break
+        cache_path = os.path.join(path, cache_dir)
+        if os.path.isdir(cache_path):
+            freed += _dir_size(cache_path)
+            shutil.rmtree(cache_path, ignore_errors=True)
+
+    if size - freed > limit:
+        print(
+            f"Browser profile {path} is still {(size - freed) / 1024 / 1024:.0f} MB "
+            "after clearing its caches"
+        )
+    return freed
+
+
+def acquire_profile(
+    backend: str, profile: str = "interactive", trim: bool = True
+) -> Optional[ProfileLock]:
+    """
+    Lock and trim the persistent profile of a backend and setup_browser() profile.
+
+    Pass trim=False when a browser may still be running on the profile,
+    e.g. a detached one that is about to be reattached.
+
+    Returns:
+        The held lock, whose path is the profile directory, or None if
+        persistent profiles are off, the backend has no profile directory
+        (Safari always uses the user's own), or another browser is using it
+    """
+    if not BROWSER_PROFILE_DIR or backend not in PROFILE_CACHE_DIRS:
+        return None
+
+    lock = ProfileLock(
+        os.path.abspath(os.path.join(BROWSER_PROFILE_DIR, f"{backend}-{profile}"))
+    )
+    try:
+        acquired = lock.acquire()
+    except OSError as e:
+        print(f"Error locking browser profile {lock.path}: {e}")
+        return None
+    if not acquired:
+        print(f"Browser profile {lock.path} is in use by another browser")
+        return None
+
+    if trim:
+        trim_profile(lock.path, backend)
+    return lock
+
+
+def attach_profile(browser, lock: ProfileLock):
+    """Record that a browser runs on a locked profile, until release_profile()."""
+    with _profiles_lock:
+        _profiles[id(browser)] = lock
+
+
+def browser_profile(browser) -> Optional[str]:
+    """Return the persistent profile directory a browser runs on, if any."""
+    with _profiles_lock:
+        lock = _profiles.get(id(browser))
+    return lock.path if lock else None
+
+
+def release_profile(browser):
+    """Unlock a browser's profile once the browser has quit."""
+    with _profiles_lock:
+        lock = _profiles.pop(id(browser), None)
+    if lock:
+        lock.release()
+
+
+def _read_consent(path: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(path, CONSENT_FILE), "r", encoding="utf-8") as f:
+            consent = json.load(f)
+        return consent if isinstance(consent, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def consent_handled(browser, site: str) -> bool:
+    """Whether a site's cookie consent was accepted in the browser's profile."""
+    path = browser_profile(browser)
+    return bool(path) and site in _read_consent(path)
+
+
+def mark_consent_handled(browser, site: str):
+    """Remember in the browser's profile that a site's consent was accepted."""
+    path = browser_profile(browser)
+    if not path:
+        # A temporary profile forgets the consent cookie when it quits
+        return
+    consent = _read_consent(path)
+    consent[site] = True
+    try:
+        with open(os.path.join(path, CONSENT_FILE), "w", encoding="utf-8") as f:
+            json.dump(consent, f, indent=2)
+    except OSError as e:
+        print(f"Error saving consent state: {e}")
+
+
+def _to_jar_cookie(cookie: Dict[str, Any]) -> Cookie:
+    """Convert a WebDriver or DevTools cookie to a cookie jar cookie."""
+    domain = cookie["domain"]
+    # DevTools uses -1 for session cookies, WebDriver leaves expiry out
+    expires = cookie.get("expiry", cookie.get("expires"))
+    expires = int(expires) if expires is not None and expires >= 0 else None
+    return Cookie(
+        version=0,
+        name=cookie["name"],
+        value=cookie["value"],
+        port=None,
+        port_specified=False,
+        domain=domain,
+        domain_specified=domain.startswith("."),
+        domain_initial_dot=domain.startswith("."),
+        path=cookie.get("path", "/"),
+        path_specified=True,
+        secure=bool(cookie.get("secure")),
+        expires=expires,
+        discard=expires is None,
+        comment=None,
+        comment_url=None,
+        rest={"HttpOnly": None} if cookie.get("httpOnly") else {},
+    )
+
+
+def export_cookies(browser, path: Optional[str] = None) -> int:
+    """
+    Merge a browser's cookies into the cookie jar and the shared HTTP client.
+
+    Chromium browsers export the cookies of every site; other browsers only
+    those of the current page.
+
+    Returns:
+        The number of cookies exported
+    """
+    try:
+        if hasattr(browser, "execute_cdp_cmd"):
+            cookies = browser.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        else:
+            cookies = browser.get_cookies()
+    except Exception as e:
+        print(f"Error reading browser cookies: {e}")
+        return 0
+
+    jar = merge_cookie_jar([_to_jar_cookie(cookie) for cookie in cookies], path)
+    get_http_client().load_cookies(jar.filename)
+    return len(cookies)
+
+
+def import_cookies(browser, path: Optional[str] = None) -> int:
+    """
+    Load the cookie jar into a browser, e.g. one on a temporary profile.
+
+    Only Chromium browsers can set cookies of sites they aren't on, so
+    other browsers are left as they are.
+
+    Returns:
+        The number of cookies imported
+    """
+    if not hasattr(browser, "execute_cdp_cmd"):
+        return 0
+
+    cookies = []
+    for cookie in load_cookie_jar(path):
+        entry = {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": cookie.secure,
+            "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+        }
+        if cookie.expires is not None:
+            entry["expires"] = cookie.expires
+        cookies.append(entry)
+    if not cookies:
+        return 0
+
+    try:
+        browser.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        return len(cookies)
+    except WebDriverException as e:
+        print(f"Error loading cookies into the browser: {e}")
+        return 0
@@ -0,0 +1,477 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urljoin, urlparse
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+
+from utils.fetch_utils import (
+    fetch_html,
+    learned_needs_javascript,
+    mark_needs_javascript,
+    parse_tree,
+)
+from utils.wait_utils import wait_for_document_ready, wait_for_element
+from utils.web_utils import build_search_url, scroll_down
+
+# Where the results are on each site's results page. "item" matches one
+# result; the other selectors are looked up inside it. The "fields" are
+# extra details such as prices, stars or votes.
+RESULT_SELECTORS = {
+    "google": {
+        "item": "div.g, div.MjjYud",
+        "title": "h3",
+        "link": "a[href]",
+        "snippet": "div.VwiC3b, div[data-sncf], span.st",
+        "fields": {},
+    },
+    "youtube": {
+        "item": "ytd-video-renderer",
+        "title": "#video-title",
+        "link": "a#video-title, a#thumbnail",
+        "snippet": ".metadata-snippet-text, #description-text",
+        "fields": {
+            "channel": "ytd-channel-name a, #channel-name a",
+            "views": "#metadata-line span",
+        },
+    },
+    "amazon": {
+        "item": "div[data-component-type=s-search-result]",
+        "title": "h2",
+        "link": "h2 a, a.a-link-normal[href]",
+        "snippet": None,
+        "fields": {
+            "price": "span.a-price span.a-offscreen",
+            "rating": "span.a-icon-alt",
+        },
+    },
+    "github": {
+        "item": "div[data-testid=results-list] > div, li.repo-list-item",
+        "title": ".search-title, a.v-align-middle",
+        "link": ".search-title a, a.v-align-middle",
+        "snippet": "span.search-match, p.mb-1",
+        "fields": {"stars": "a[href$='/stargazers']"},
+    },
+    "stackoverflow": {
+        "item": "div.s-post-summary",
+        "title": "h3 a, .s-post-summary--content-title a",
+        "link": "h3 a, .s-post-summary--content-title a",
+        "snippet": ".s-post-summary--content-excerpt",
+        "fields": {
+            "votes": ".s-post-summary--stats-item-number",
+            "tags": ".s-post-summary--meta-tags",
+        },
+    },
+}
+
+# Query parameter, step and first value of each site's result pages. Sites
+# without one (YouTube) load more results as the page is scrolled.
+PAGE_PARAMS = {
+    "google": ("start", 10, 0),
+    "amazon": ("page", 1, 1),
+    "github": ("p", 1, 1),
+    "stackoverflow": ("page", 1, 1),
+}
+
+# Number of results shown in the chat after a search
+SEARCH_RESULTS_SHOWN = int(os.environ.get("SEARCH_RESULTS_SHOWN", "5"))
+
+# Seconds each site gets in a multi-site search before it's left out
+FAN_OUT_DEADLINE = float(os.environ.get("FAN_OUT_DEADLINE", "12"))
+
+SITE_NAMES = {
+    "youtube": "YouTube",
+    "google": "Google",
+    "amazon": "Amazon",
+    "github": "GitHub",
+    "stackoverflow": "Stack Overflow",
+}
+SITE_PATTERN = r"youtube|google|amazon|github|stack\s*overflow"
+
+# Fields holding counts such as "1.2k", returned as numbers
+COUNT_FIELDS = {"stars", "votes"}
+
+_RESULTS_SCRIPT = """
+const selectors = arguments[0];
+const clean = (text) => (text || "").replace(/\\s+/g, " ").trim();
+const results = [];
+for (const item of document.querySelectorAll(selectors.item)) {
+  const find = (selector) => (selector ? item.querySelector(selector) : null);
+  const title = find(selectors.title);
+  const link = find(selectors.link);
+  const snippet = find(selectors.snippet);
+  const result = {
+    title: clean(title && title.textContent),
+    url: link ? link.href : "",
+    snippet: clean(snippet && snippet.textContent),
+  };
+  for (const [name, selector] of Object.entries(selectors.fields)) {
+    const field = find(selector);
+    if (field) result[name] = clean(field.textContent);
+  }
+  results.push(result);
+}
+return results;
+"""
+
+
+def _parse_count(text: str) -> Optional[int]:
+    """Turn counts such as "1,204" or "1.2k" into numbers."""
+    match = re.search(r"(-?\d[\d.,]*)\s*([kKmM]?)", text or "")
+    if match is None:
+        return None
+    number = float(match.group(1).replace(",", "") or 0)
+    scale = {"k": 1_000, "m": 1_000_000}.get(match.group(2).lower(), 1)
+    return int(number * scale)
+
+
+def _clean_result(
+    site: str, result: Dict[str, Any], page_url: str
+) -> Optional[Dict[str, Any]]:
+    """Normalize a raw result, or return None if it has no title or link."""
+    url = urljoin(page_url, result.get("url") or "")
+    if not result.get("title") or not url.startswith("http"):
+        return None
+
+    # Google's script-free results link through a redirect
+    parsed = urlparse(url)
+    if parsed.path == "/url" and "google." in parsed.netloc:
+        url = parse_qs(parsed.query).get("q", [url])[0]
+
+    cleaned = {"site": site, **result, "url": url}
+    for name in COUNT_FIELDS & cleaned.keys():
+        cleaned[name] = _parse_count(cleaned[name])
+    return cleaned
+
+
+def _embedded_json(html: str, pattern: str) -> Optional[Any]:
+    """Decode the JSON object that starts where pattern matches."""
+    match = re.search(pattern, html)
+    if match is None:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, match.end())
+        return data
+    except ValueError:
+        return None
+
+
+def _youtube_json(html: str) -> List[Dict[str, Any]]:
+    """Read YouTube's results from the ytInitialData embedded in the page."""
+    data = _embedded_json(html, r"ytInitialData\s*=\s*")
+    results = []
+    try:
+        sections = data["contents"]["twoColumnSearchResultsRenderer"][
+            "primaryContents"
+        ]["sectionListRenderer"]["contents"]
+    except (KeyError, TypeError):
+        return results
+
+    for section in sections:
+        for item in section.get("itemSectionRenderer", {}).get("contents", []):
+            video = item.get("videoRenderer")
+            if not video or "videoId" not in video:
+                continue
+
+            def runs(key):
+                return "".join(
+                    run.get("text", "") for run in video.get(key, {}).get("runs", [])
+                )
+
+            snippets = video.get("detailedMetadataSnippets") or [{}]
+            results.append(
+                {
+                    "title": runs("title"),
+                    "url": f"https://www.youtube.com/watch?v={video['videoId']}",
+                    "snippet": "".join(
+                        run.get("text", "")
+                        for run in snippets[0].get("snippetText", {}).get("runs", [])
+                    ),
+                    "channel": runs("ownerText"),
+                    "views": video.get("viewCountText", {}).get("simpleText", ""),
+                }
+            )
+    return results
+
+
+def _github_json(html: str) -> List[Dict[str, Any]]:
+    """Read GitHub's results from the JSON embedded for its React app."""
+    data = _embedded_json(
+        html, r'<script type="application/json" data-target="react-app\.embeddedData">'
+    )
+    try:
+        items = data["payload"]["results"]
+    except (KeyError, TypeError):
+        return []
+
+    def strip(text):
+        # Matches are highlighted with <em> tags
+        return re.sub(r"</?em>", "", text or "")
+
+    results = []
+    for item in items:
+        repository = item.get("repo", {}).get("repository", {})
+        name = f"{repository.get('owner_login', '')}/{repository.get('name', '')}"
+        if name == "/":
+            continue
+        results.append(
+            {
+                "title": strip(item.get("hl_name")) or name,
+                "url": f"https://github.com/{name}",
+                "snippet": strip(item.get("hl_trunc_description")),
+                "stars": str(item.get("followers", "")),
+            }
+        )
+    return results
+
+
+# Sites whose pages embed their results as JSON, read before the HTML
+_JSON_PARSERS = {"youtube": _youtube_json, "github": _github_json}
+
+
+def _unique_results(raw: List[Dict[str, Any]], site: str, page_url: str):
+    """
+    Clean raw results, dropping empty ones and repeats of a URL.
+
+    Result wrappers can nest, such as Google's div.MjjYud around div.g, so
+    one result may be matched more than once.
+    """
+    results = []
+    seen = set()
+    for result in raw:
+        result = _clean_result(site, result, page_url)
+        if result and result["url"] not in seen:
+            seen.add(result["url"])
+            results.append(result)
+    return results
+
+
+def parse_results_html(site: str, html: str, url: str = "") -> List[Dict[str, Any]]:
+    """
+    Parse a results page fetched over HTTP.
+
+    Args:
+        site: One of the RESULT_SELECTORS sites
+        html: The page source
+        url: The page URL, used to make links absolute
+
+    Returns:
+        The results as dicts with "site", "title", "url", "snippet" and the
+        site's extra fields where present, one per URL
+    """
+    raw = _JSON_PARSERS[site](html) if site in _JSON_PARSERS else []
+    if not raw:
+        selectors = RESULT_SELECTORS[site]
+        raw = []
+        for item in parse_tree(html).select(selectors["item"]):
+
+            def find(selector):
+                return item.select_one(selector) if selector else None
+
+            title = find(selectors["title"])
+            link = find(selectors["link"])
+            snippet = find(selectors["snippet"])
+            result = {
+                "title": title.text() if title else "",
+                "url": link.attrs.get("href", "") if link else "",
+                "snippet": snippet.text() if snippet else "",
+            }
+            for name, selector in selectors["fields"].items():
+                field = find(selector)
+                if field is not None:
+                    result[name] = field.text()
+            raw.append(result)
+
+    return _unique_results(raw, site, url)
+
+
+def parse_results(browser, site: str, wait: bool = True) -> List[Dict[str, Any]]:
+    """
+    Parse the results page open in the browser with one script call.
+
+    Args:
+        browser: The browser instance, showing a site's results page
+        site: One of the RESULT_SELECTORS sites
+        wait: Wait for the first result to render first
+
+    Returns:
+        The results, as returned by parse_results_html
+    """
+    selectors = RESULT_SELECTORS[site]
+    if wait:
+        wait_for_element(browser, By.CSS_SELECTOR, selectors["item"])
+    try:
+        raw = browser.execute_script(_RESULTS_SCRIPT, selectors)
+        page_url = browser.current_url
+    except WebDriverException as e:
+        print(f"Error parsing {site} results: {e}")
+        return []
+
+    return _unique_results(raw or [], site, page_url)
+
+
+def results_page_url(site: str, query: str, page: int = 0) -> str:
+    """Return the URL of a page of search results, counting from 0."""
+    url = build_search_url(site, query)
+    if page and site in PAGE_PARAMS:
+        name, step, first = PAGE_PARAMS[site]
+        url += f"&{name}={first + page * step}"
+    return url
+
+
+def iter_search_results(
+    site: str,
+    query: str,
+    get_browser: Optional[Callable[[], Any]] = None,
+    max_pages: int = 5,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield a site's search results, loading further pages only as needed.
+
+    Each page is fetched over plain HTTP when the site serves its results
+    without JavaScript, and loaded in the browser otherwise.
+
+    Args:
+        site: One of the RESULT_SELECTORS sites
+        query: The search query
+        get_browser: Callable returning a browser, called only when a page
+            needs one; without it only HTTP is used
+        max_pages: Stop after this many pages
+
+    Yields:
+        Results as returned by parse_results_html, without duplicates
+    """
+    seen = set()
+    browser = None
+    for page in range(max_pages):
+        url = results_page_url(site, query, page)
+        results = []
+
+        needs_browser = learned_needs_javascript(url, "results")
+        if not needs_browser:
+            fetched = fetch_html(url)
+            if fetched is not None:
+                results = parse_results_html(site, fetched[1], fetched[0])
+                # Judge the site by its first page; later pages may run out
+                if page == 0:
+                    mark_needs_javascript(url, not results, "results")
+            needs_browser = not results and page == 0
+
+        if needs_browser and browser is None and get_browser is not None:
+            browser = get_browser()
+        if needs_browser and browser is not None:
+            try:
+                if page and site not in PAGE_PARAMS:
+                    scroll_down(browser, 3)
+                else:
+                    browser.get(url)
+                    wait_for_document_ready(browser)
+            except WebDriverException as e:
+                print(f"Error loading {site} results: {e}")
+                return
+            results = parse_results(browser, site)
+
+        new_results = [result for result in results if result["url"] not in seen]
+        if not new_results:
+            return
+        for result in new_results:
+            seen.add(result["url"])
+            yield result
+
+
+def format_results(results: List[Dict[str, Any]], snippet_chars: int = 160) -> str:
+    """Render search results as a numbered Markdown list for the chat."""
+    if not results:
+        return "No results found."
+
+    lines = []
+    for number, result in enumerate(results, 1):
+        details = []
+        for name in ("price", "rating", "channel", "views", "tags"):
+            if result.get(name):
+                details.append(str(result[name]))
+        if result.get("stars") is not None:
+            details.append(f"{result['stars']:,} stars")
+        if result.get("votes") is not None:
+            details.append(f"{result['votes']:,} votes")
+
+        lines.append(f"{number}. [{result['title']}]({result['url']})")
+        if details:
+            lines.append("   " + " · ".join(details))
+        snippet = result.get("snippet", "")
+        if snippet:
+            if len(snippet) > snippet_chars:
+                snippet = snippet[:snippet_chars].rsplit(" ", 1)[0] + "..."
+            lines.append(f"   {snippet}")
+    return "\n".join(lines)
+
+
+def parse_sites(text: str) -> List[str]:
+    """Return the search sites named in text, in order and without repeats."""
+    sites = []
+    for name in re.findall(SITE_PATTERN, text, re.IGNORECASE):
+        site = re.sub(r"\s+", "", name.lower())
+        if site not in sites:
+            sites.append(site)
+    return sites
+
+
+def fan_out_search(
+    sites: List[str],
+    query: str,
+    browser_session: Optional[Callable[[], Any]] = None,
+    limit: int = SEARCH_RESULTS_SHOWN,
+    deadline: float = FAN_OUT_DEADLINE,
+) -> Iterator[Tuple[str, Optional[List[Dict[str, Any]]]]]:
+    """
+    Search several sites at once, yielding each site's results as they arrive.
+
+    Every site is searched on its own thread. Sites served over HTTP need
+    no browser; the others take one from browser_session, so each gets its
+    own pooled driver.
+
+    Args:
+        sites: The RESULT_SELECTORS sites to search
+        query: The search query
+        browser_session: Callable returning a browser lease (an object with
+            get() that releases its browser on exiting a with block), such
+            as BrowserPool.session; without it only HTTP is used
+        limit: Results per site
+        deadline: Seconds after which sites still searching are given up on
+
+    Yields:
+        (site, results) pairs in the order the sites finish; results is
+        None for sites that missed the deadline
+    """
+
+    def _search(site):
+        with browser_session() if browser_session else nullcontext() as lease:
+            results = iter_search_results(site, query, lease.get if lease else None)
+            return list(islice(results, limit))
+
+    def _result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Error searching {futures[future]}: {e}")
+            return []
+
+    executor = ThreadPoolExecutor(max_workers=max(len(sites), 1))
+    futures = {executor.submit(_search, site): site for site in sites}
+    pending = set(futures)
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            pending.discard(future)
+            yield futures[future], _result(future)
+    except FutureTimeout:
+        for future in [future for future in futures if future in pending]:
+            yield futures[future], _result(future) if future.done() else None
+    finally:
+        # Late sites finish in the background and release their browsers
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,312 @@
+import re
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+Alternative = Tuple[str, str, int, Optional[Set[str]]]
+
+# Most literal prefixes worked out per pattern before giving up on them
+MAX_PREFIXES = 64
+
+# Most distinct first words whose pattern buckets are kept
+MAX_WORD_BUCKETS = 1024
+
+
+def literal_prefixes(pattern: str, flags: int = 0) -> Optional[Set[str]]:
+    """
+    Work out the literal text a match of a pattern can start with.
+
+    Each prefix runs up to the first item that isn't a literal character,
+    so "(?:search|find)\\s+(.+)" gives {"search", "find"}.
+
+    Args:
+        pattern: The regex pattern
+        flags: Regex flags the pattern is compiled with
+
+    Returns:
+        The lowercased possible prefixes, or None if a match can start
+        with any character (or be empty)
+    """
+    prefixes = _prefixes_of_sequence(list(sre_parse.parse(pattern, flags)))
+    if prefixes is None or any(not prefix for prefix, _ in prefixes):
+        return None
+    return {prefix for prefix, _ in prefixes}
+
+
+def _prefixes_of_sequence(items: List[Any]) -> Optional[Set[Tuple[str, bool]]]:
+    """
+    Return the literal prefixes of a parsed sequence, or None if too many.
+
+    Each prefix comes with whether it ends the literal text (True) or the
+    whole sequence was literal, so what follows the sequence extends it.
+    """
+    prefixes = {("", False)}
+    for item in items:
+        options = _prefixes_of_item(item)
+        if options is None:
+            return None
+        prefixes = {
+            (prefix + option, ended)
+            for prefix, done in prefixes
+            if not done
+            for option, ended in options
+        } | {entry for entry in prefixes if entry[1]}
+        if len(prefixes) > MAX_PREFIXES:
+            return None
+        if all(done for _, done in prefixes):
+            break
+    return prefixes
+
+
+def _prefixes_of_item(item: Tuple[Any, Any]) -> Optional[Set[Tuple[str, bool]]]:
+    """Return the literal prefixes of one parsed item, see _prefixes_of_sequence."""
+    op, value = item
+    if op is sre_constants.LITERAL:
+        return {(chr(value).lower(), False)}
+    if op is sre_constants.SUBPATTERN:
+        return _prefixes_of_sequence(list(value[-1]))
+    if op is sre_constants.BRANCH:
+        options: Set[Tuple[str, bool]] = set()
+        for branch in value[1]:
+            branch_options = _prefixes_of_sequence(list(branch))
+            if branch_options is None:
+                return None
+            options |= branch_options
+        return options
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        low, high, repeated = value
+        options = _prefixes_of_sequence(list(repeated))
+        if options is None:
+            return None
+        if high != 1:
+            # Further repetitions aren't expanded
+            options = {(prefix, True) for prefix, _ in options}
+        if low == 0:
+            # The item can be skipped, so what follows counts too
+            options.add(("", False))
+        return options
+    return {("", True)}
+
+
+def _starts_with_word(prefix: str, word: str) -> bool:
+    """Whether text whose first word is word can start with prefix."""
+    if len(prefix) <= len(word):
+        return word.startswith(prefix)
+    return prefix.startswith(word) and prefix[len(word)].isspace()
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton that finds every occurrence of a set of keywords.
+
+    The text is scanned once, so the cost grows linearly with its length no
+    matter how many keywords there are or how they overlap.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Build the automaton.
+
+        Args:
+            keywords: The keywords to look for, in lowercase
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for keyword in keywords:
+            state = 0
+            for character in keyword:
+                if character not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][character] = len(self._goto) - 1
+                state = self._goto[state][character]
+            self._output[state].append(keyword)
+
+        # Breadth-first, so the failure state of each parent is known first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and character not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(character, 0)
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+
+        # Used to skip ahead to the next possible keyword start in C
+        self._starts = re.compile(
+            "[" + "".join(re.escape(c) for c in sorted(self._goto[0])) + "]"
+            if self._goto[0]
+            else "(?!)"
+        )
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Find every keyword occurrence in a piece of text.
+
+        Returns:
+            (start position, keyword) pairs, ordered by where they end
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        matches = []
+        state = 0
+        position = 0
+        length = len(text)
+
+        while position < length:
+            if state == 0:
+                start = self._starts.search(text, position)
+                if start is None:
+                    break
+                position = start.start()
+
+            character = text[position]
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+
+            for keyword in output[state]:
+                matches.append((position - len(keyword) + 1, keyword))
+            position += 1
+
+        return matches
+
+
+class CommandRouter:
+    """
+    Dispatch commands by matching them against one combined regex.
+
+    The patterns of a command table are compiled into a single alternation,
+    in table order, so one fullmatch call finds the highest-priority pattern
+    that matches and returns its captured arguments. Alternatives are also
+    bucketed by the literal text they start with, so a command is only tried
+    against the patterns that could match its first word.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]], flags: int = re.IGNORECASE):
+        """
+        Compile a command table.
+
+        Args:
+            patterns: Command names mapped to their regex patterns, in
+                priority order; each pattern must match the whole command
+            flags: Regex flags for the combined pattern
+        """
+        self.flags = flags | re.DOTALL
+        self.handlers: Dict[str, Callable[..., Any]] = {}
+
+        alternatives: List[Alternative] = []
+        for command, command_patterns in patterns.items():
+            for pattern in command_patterns:
+                alternatives.append(
+                    (
+                        command,
+                        pattern,
+                        re.compile(pattern, flags).groups,
+                        literal_prefixes(pattern, flags),
+                    )
+                )
+
+        self._alternatives = alternatives
+        self.pattern, self._groups = self._compile(alternatives)
+        # Buckets by first word, and the compiled buckets by the
+        # alternatives in them, since many words share a bucket
+        self._word_buckets: Dict[str, Tuple[Any, Dict[int, Tuple[str, int, int]]]] = {}
+        self._compiled_buckets: Dict[Tuple[int, ...], Any] = {}
+
+    def _compile(self, alternatives: List[Alternative]):
+        """
+        Compile alternatives into one regex.
+
+        Returns:
+            The regex and a map of each alternative's outer group index to
+            its command name and the slice of match.groups() it captured
+        """
+        parts = []
+        groups = {}
+        index = 1
+        for command, pattern, inner_groups, _ in alternatives:
+            groups[index] = (command, index, index + inner_groups)
+            parts.append(f"({pattern})")
+            index += inner_groups + 1
+
+        # (?!) never matches, so an empty bucket simply finds nothing
+        return re.compile("|".join(parts) or "(?!)", self.flags), groups
+
+    def _bucket(self, word: str):
+        """Return the compiled alternatives that could match text starting with word."""
+        bucket = self._word_buckets.get(word)
+        if bucket is not None:
+            return bucket
+
+        indexes = tuple(
+            index
+            for index, alt in enumerate(self._alternatives)
+            if alt[3] is None
+            or any(_starts_with_word(prefix, word) for prefix in alt[3])
+        )
+        bucket = self._compiled_buckets.get(indexes)
+        if bucket is None:
+            bucket = self._compile([self._alternatives[i] for i in indexes])
+            self._compiled_buckets[indexes] = bucket
+        if len(self._word_buckets) < MAX_WORD_BUCKETS:
+            self._word_buckets[word] = bucket
+        return bucket
+
+    def register(self, command: str, handler: Callable[..., Any]):
+        """Register the function that handles a command."""
+        self.handlers[command] = handler
+
+    def route(self, text: str) -> Optional[Tuple[str, Tuple[Optional[str], ...]]]:
+        """
+        Find the command a piece of text matches.
+
+        Returns:
+            The command name and its captured arguments, or None
+        """
+        text = text.strip()
+        word = text.split(None, 1)[0].lower() if text else ""
+        if word.isascii():
+            pattern, groups = self._bucket(word)
+        else:
+            # Case folding can map non-ASCII characters onto pattern letters
+            pattern, groups = self.pattern, self._groups
+
+        match = pattern.fullmatch(text)
+        if match is None:
+            return None
+
+        # The outer group of the matching alternative is the last one closed
+        command, start, end = groups[match.lastindex]
+        return command, match.groups()[start:end]
+
+    def dispatch(self, text: str) -> bool:
+        """
+        Route a piece of text and call the registered handler.
+
+        Returns:
+            True if a handler was found and called
+        """
+        routed = self.route(text)
+        if routed is None:
+            return False
+
+        command, args = routed
+        handler = self.handlers.get(command)
+        if handler is None:
+            return False
+
+        handler(*[arg.strip() if isinstance(arg, str) else arg for arg in args])
+        return True
@@ -0,0 +1,310 @@
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from utils.http_utils import get_http_client
+from utils.profile_utils import (
+    BROWSER_PROFILE_DIR,
+    acquire_profile,
+    attach_profile,
+    export_cookies,
+    release_profile,
+    trim_profile,
+)
+from utils.wait_utils import PAGE_LOAD_STRATEGY, configure_timeouts
+from utils.web_utils import (
+    LEAN_WINDOW_SIZE,
+    _driver_path,
+    load_driver_probe,
+    save_driver_probe,
+)
+
+# File recording the detached browser's debugger port, so the next start
+# of the assistant can reattach to it
+BROWSER_SESSION_PATH = os.environ.get("BROWSER_SESSION_PATH", "browser_session.json")
+
+# Seconds a newly launched detached browser gets to open its debugger port
+DETACHED_START_TIMEOUT = float(os.environ.get("DETACHED_START_TIMEOUT", "15"))
+
+# Chrome executables looked for when CHROME_BINARY isn't set
+CHROME_BINARIES = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "chrome",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+    r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+]
+
+
+def find_chrome_binary() -> Optional[str]:
+    """Return the path of the Chrome executable, or None if it isn't installed."""
+    candidates = [os.environ.get("CHROME_BINARY")] + CHROME_BINARIES
+    for candidate in filter(None, candidates):
+        path = shutil.which(candidate) or (
+            candidate if os.path.isfile(candidate) else None
+        )
+        if path:
+            return path
+    return None
+
+
+def load_session(path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Return the detached browser recorded for this host.
+
+    Returns:
+        A dict with "port", "pid", "profile_dir" and "headless", or None
+    """
+    try:
+        with open(path or BROWSER_SESSION_PATH, "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(session, dict) or session.get("host") != socket.gethostname():
+        return None
+    return session
+
+
+def save_session(session: Dict[str, Any], path: Optional[str] = None):
+    """Record the detached browser, replacing the previous one."""
+    path = path or BROWSER_SESSION_PATH
+    try:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(session, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving browser session: {e}")
+
+
+def session_alive(session: Dict[str, Any]) -> bool:
+    """Check that a detached browser still answers on its debugger port."""
+    try:
+        response = get_http_client().get(
+            f"http://127.0.0.1:{session['port']}/json/version", timeout=(1, 2)
+        )
+        return response.ok and "webSocketDebuggerUrl" in response.json()
+    except (requests.RequestException, ValueError, KeyError):
+        return False
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_detached(
+    profile_dir: Optional[str] = None, headless: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Start Chrome in its own process group with a debugger port open.
+
+    The browser isn't a child of the driver, so it keeps running, with its
+    tabs, after the assistant exits.
+
+    Args:
+        profile_dir: The profile to run on, defaults to a new temporary one
+        headless: Run the browser without a window
+
+    Returns:
+        The recorded session, or None if Chrome couldn't be started
+    """
+    binary = find_chrome_binary()
+    if binary is None:
+        print("Chrome was not found; set CHROME_BINARY to its path")
+        return None
+
+    port = _free_port()
+    profile_dir = profile_dir or tempfile.mkdtemp(prefix="agent-browser-")
+    args = [
+        binary,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={profile_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        "--hide-crash-restore-bubble",
+    ]
+    if headless:
+        args += ["--headless=new", f"--window-size={LEAN_WINDOW_SIZE}"]
+    else:
+        args.append("--start-maximized")
+
+    if sys.platform == "win32":
+        detach = {
+            "creationflags": subprocess.DETACHED_PROCESS
+            | subprocess.CREATE_NEW_PROCESS_GROUP
+        }
+    else:
+        detach = {"start_new_session": True}
+    try:
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **detach,
+        )
+    except OSError as e:
+        print(f"Error starting detached browser: {e}")
+        return None
+
+    session = {
+        "host": socket.gethostname(),
+        "port": port,
+        "pid": process.pid,
+        "profile_dir": profile_dir,
+        "headless": headless,
+    }
+    deadline = time.monotonic() + DETACHED_START_TIMEOUT
+    while not session_alive(session):
+        if process.poll() is not None or time.monotonic() > deadline:
+            print("Detached browser did not open its debugger port")
+            stop_session(session)
+            return None
+        time.sleep(0.2)
+
+    save_session(session)
+    return session
+
+
+def stop_session(session: Dict[str, Any]):
+    """Terminate a detached browser, e.g. one that no longer accepts drivers."""
+    try:
+        os.kill(session["pid"], signal.SIGTERM)
+    except (OSError, KeyError) as e:
+        print(f"Error stopping detached browser: {e}")
+
+
+def _attach_session(session: Dict[str, Any], driver_path: Optional[str] = None):
+    """Connect a new driver to a detached browser, or return None."""
+    from selenium.webdriver.chrome.service import Service as ChromeService
+
+    options = Options()
+    options.debugger_address = f"127.0.0.1:{session['port']}"
+    options.page_load_strategy = PAGE_LOAD_STRATEGY
+    # Fall back to a fresh driver lookup if the cached binary moved
+    for path in dict.fromkeys([driver_path, None]):
+        try:
+            if path:
+                return webdriver.Chrome(
+                    options=options, service=ChromeService(executable_path=path)
+                )
+            return webdriver.Chrome(options=options)
+        except Exception as e:
+            print(f"Error attaching to detached browser: {e}")
+    return None
+
+
+def attach_browser(headless: bool = False):
+    """
+    Reattach to the detached browser, launching it first if it isn't running.
+
+    The browser runs on the "detached" Chrome profile under
+    BROWSER_PROFILE_DIR. A recorded session that doesn't answer on its
+    debugger port, or that refuses a driver, is replaced by a new browser.
+    Leave it with detach_browser() so it stays open for the next start.
+
+    Args:
+        headless: Run a newly launched browser without a window
+
+    Returns:
+        The attached WebDriver, or None if Chrome isn't available or another
+        assistant is attached to the browser
+    """
+    profile_lock = acquire_profile("chrome", "detached", trim=False)
+    if BROWSER_PROFILE_DIR and profile_lock is None:
+        return None
+    known = load_driver_probe()
+    driver_path = (
+        known.get("driver_path") if known and known["backend"] == "chrome" else None
+    )
+
+    browser = None
+    session = load_session()
+    if session and session_alive(session):
+        browser = _attach_session(session, driver_path)
+        if browser is not None:
+            print("Reattached to the running browser")
+        else:
+            stop_session(session)
+
+    if browser is None:
+        if profile_lock:
+            # Only trimmed here, while no browser is running on it
+            trim_profile(profile_lock.path, "chrome")
+        session = launch_detached(profile_lock.path if profile_lock else None, headless)
+        if session is not None:
+            browser = _attach_session(session, driver_path)
+            if browser is None:
+                # Don't leave a browser running that nothing can attach to
+                stop_session(session)
+
+    if browser is None:
+        if profile_lock:
+            profile_lock.release()
+        return None
+
+    if profile_lock:
+        attach_profile(browser, profile_lock)
+    configure_timeouts(browser)
+    save_driver_probe("chrome", _driver_path(browser))
+    return browser
+
+
+def browser_alive(browser) -> bool:
+    """Check that a browser session still responds."""
+    try:
+        browser.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+
+def ensure_attached(browser, headless: bool = False):
+    """
+    Return the browser if it is alive, or reattach or relaunch it.
+
+    Returns:
+        A live WebDriver, or None if none could be attached
+    """
+    if browser is not None and browser_alive(browser):
+        return browser
+    if browser is not None:
+        print("Browser session is dead; reattaching")
+        detach_browser(browser, save_cookies=False)
+    return attach_browser(headless)
+
+
+def detach_browser(browser, save_cookies: bool = True):
+    """
+    End the driver of a detached browser, leaving the browser and its tabs open.
+
+    Args:
+        browser: A browser returned by attach_browser()
+        save_cookies: Export the browser's cookies to the cookie jar first
+    """
+    if save_cookies:
+        export_cookies(browser)
+    try:
+        # A driver attached by debugger address disconnects on quit
+        # instead of closing the browser it didn't launch
+        browser.quit()
+    except Exception as e:
+        print(f"Error detaching from browser: {e}")
+    finally:
+        release_profile(browser)
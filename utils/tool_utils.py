@@ -0,0 +1,366 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.api_utils import get_news, get_notes, get_weather, save_note
+from utils.fetch_utils import fetch_page
+from utils.result_utils import RESULT_SELECTORS, format_results, iter_search_results
+from utils.web_utils import (
+    EXTRACT_MAX_CHARS,
+    click_button,
+    extract_text,
+    fill_form,
+    format_blocks,
+    open_website,
+    scroll_down,
+    search_amazon,
+    search_github,
+    search_google,
+    search_stackoverflow,
+    search_youtube,
+    take_screenshot,
+)
+
+TOOLS_SYSTEM_PROMPT = (
+    "You are Sam.AI, a personal assistant that can control a web browser and "
+    "look up weather, news and notes. When the user asks for something a tool "
+    "can do, call the tool directly instead of describing it; call several "
+    "tools at once if the request needs them. Otherwise answer concisely."
+)
+
+
+class Tool:
+    """A function the model can call, described by a JSON schema."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        function: Callable[..., Any],
+        parameters: Optional[Dict[str, Any]] = None,
+        required: Optional[List[str]] = None,
+        needs_browser: bool = False,
+    ):
+        """
+        Initialize the tool.
+
+        Args:
+            name: The name the model calls the tool by
+            description: What the tool does, shown to the model
+            function: The Python function to run
+            parameters: JSON schema of each argument, by argument name
+            required: Names of the required arguments
+            needs_browser: Whether the function drives the shared browser
+        """
+        self.name = name
+        self.description = description
+        self.function = function
+        self.parameters = parameters or {}
+        self.required = required if required is not None else list(self.parameters)
+        self.needs_browser = needs_browser
+
+    def schema(self) -> Dict[str, Any]:
+        """Return the tool definition in the chat completions format."""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": {
+                    "type": "object",
+                    "properties": self.parameters,
+                    "required": self.required,
+                },
+            },
+        }
+
+
+class ToolRegistry:
+    """A set of tools the model can call, and the engine that runs them."""
+
+    def __init__(self, max_workers: int = 4, system_prompt: str = TOOLS_SYSTEM_PROMPT):
+        """
+        Initialize an empty registry.
+
+        Args:
+            max_workers: Maximum number of tool calls to run at the same time
+            system_prompt: System prompt to use when these tools are offered
+        """
+        self.tools: Dict[str, Tool] = {}
+        self.max_workers = max_workers
+        self.system_prompt = system_prompt
+
+    def register(self, tool: Tool):
+        """Add a tool to the registry."""
+        self.tools[tool.name] = tool
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """Return the definitions of all tools for the request payload."""
+        return [tool.schema() for tool in self.tools.values()]
+
+    def call(self, name: str, arguments: str) -> str:
+        """
+        Run one tool call.
+
+        Args:
+            name: The tool name chosen by the model
+            arguments: The JSON-encoded arguments chosen by the model
+
+        Returns:
+            The tool's result as text
+        """
+        tool = self.tools.get(name)
+        if tool is None:
+            return f"Unknown tool: {name}"
+
+        try:
+            kwargs = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError:
+            return f"Invalid arguments for {name}: {arguments}"
+
+        try:
+            result = tool.function(**kwargs)
+        except Exception as e:
+            print(f"Error running tool {name}: {e}")
+            return f"Error running {name}: {str(e)}"
+
+        if result is True:
+            return f"Done: {name.replace('_', ' ')}."
+        if result is False or result is None:
+            return f"Couldn't complete {name.replace('_', ' ')}."
+        return str(result)
+
+    def run_tool_calls(self, tool_calls: List[Dict[str, Any]]) -> List[str]:
+        """
+        Run the tool calls from a completion.
+
+        Independent calls run in parallel. Calls that drive the browser run
+        one after another in a single lane, in the order the model gave
+        them, because a WebDriver session can't be shared between threads.
+
+        Args:
+            tool_calls: Tool calls in the chat completions format
+
+        Returns:
+            The result of each call, in the same order as tool_calls
+        """
+        results = [""] * len(tool_calls)
+        browser_calls = []
+        other_calls = []
+
+        for index, tool_call in enumerate(tool_calls):
+            function = tool_call.get("function", {})
+            tool = self.tools.get(function.get("name"))
+            if tool is not None and tool.needs_browser:
+                browser_calls.append((index, function))
+            else:
+                other_calls.append((index, function))
+
+        def _run_lane(calls):
+            for index, function in calls:
+                results[index] = self.call(
+                    function.get("name"), function.get("arguments")
+                )
+
+        lanes = [[call] for call in other_calls]
+        if browser_calls:
+            lanes.append(browser_calls)
+
+        if len(lanes) == 1:
+            _run_lane(lanes[0])
+        elif lanes:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(lanes))
+            ) as executor:
+                list(executor.map(_run_lane, lanes))
+
+        return results
+
+
+def build_default_registry(
+    get_browser: Callable[[], Any],
+    get_background_browser: Optional[Callable[[], Any]] = None,
+) -> ToolRegistry:
+    """
+    Build a registry exposing the web and API utilities as tools.
+
+    Args:
+        get_browser: Callable returning the WebDriver to use, or None when
+            browser automation is unavailable
+        get_background_browser: Callable returning a hidden lightweight
+            WebDriver; when given, browser tools take a "background" flag
+            that selects it
+
+    Returns:
+        A ToolRegistry with the default tools
+    """
+    registry = ToolRegistry()
+
+    def with_browser(function):
+        def _call(*args, background=False, **kwargs):
+            if background and get_background_browser is not None:
+                browser = get_background_browser()
+            else:
+                browser = get_browser()
+            if browser is None:
+                return "Browser automation is not available right now."
+            return function(browser, *args, **kwargs)
+
+        return _call
+
+    query = {"type": "string", "description": "The search query"}
+
+    registry.register(
+        Tool(
+            "open_website",
+            "Open a website in the browser.",
+            with_browser(open_website),
+            {"url": {"type": "string", "description": "URL or domain to open"}},
+            needs_browser=True,
+        )
+    )
+    for name, function, site in [
+        ("search_youtube", search_youtube, "YouTube for videos"),
+        ("search_google", search_google, "Google"),
+        ("search_amazon", search_amazon, "Amazon for products"),
+        ("search_github", search_github, "GitHub for repositories"),
+        ("search_stackoverflow", search_stackoverflow, "Stack Overflow for questions"),
+    ]:
+        registry.register(
+            Tool(
+                name,
+                f"Search {site} in the browser.",
+                with_browser(function),
+                {"query": query},
+                needs_browser=True,
+            )
+        )
+
+    def get_search_results(site, query, limit=5, background=True):
+        # Results are read over HTTP where possible, so most searches never
+        # touch a browser; the hidden one is used unless asked otherwise
+        if background and get_background_browser is not None:
+            browser_getter = get_background_browser
+        else:
+            browser_getter = get_browser
+        results = iter_search_results(site, query, browser_getter)
+        return format_results(list(islice(results, limit)))
+
+    registry.register(
+        Tool(
+            "get_search_results",
+            "Search a site and list its top results (titles, links, snippets, "
+            "prices, stars or votes) without opening them for the user.",
+            get_search_results,
+            {
+                "site": {"type": "string", "enum": list(RESULT_SELECTORS)},
+                "query": query,
+                "limit": {"type": "integer", "description": "Number of results"},
+            },
+            required=["site", "query"],
+            needs_browser=True,
+        )
+    )
+    registry.register(
+        Tool(
+            "take_screenshot",
+            "Take a screenshot of the current page.",
+            with_browser(take_screenshot),
+            needs_browser=True,
+        )
+    )
+    registry.register(
+        Tool(
+            "scroll_down",
+            "Scroll down the current page.",
+            with_browser(scroll_down),
+            {"amount": {"type": "integer", "description": "Screens to scroll"}},
+            required=[],
+            needs_browser=True,
+        )
+    )
+    registry.register(
+        Tool(
+            "click_button",
+            "Click a button or link on the current page by its text.",
+            with_browser(click_button),
+            {"button_text": {"type": "string", "description": "Visible text"}},
+            needs_browser=True,
+        )
+    )
+
+    def read_page(url=None, background=False):
+        # Pages that don't need JavaScript are fetched without a browser
+        if url:
+            content = fetch_page(url, EXTRACT_MAX_CHARS)
+            if content is not None:
+                return format_blocks(content)
+        return with_browser(extract_text)(
+            mode="main",
+            max_chars=EXTRACT_MAX_CHARS,
+            url=url,
+            fetch=False,
+            background=background,
+        )
+
+    registry.register(
+        Tool(
+            "extract_text",
+            "Get the main content of a web page, by default the current page.",
+            read_page,
+            {"url": {"type": "string", "description": "URL of another page to read"}},
+            required=[],
+            needs_browser=True,
+        )
+    )
+    registry.register(
+        Tool(
+            "fill_form",
+            "Fill in form fields on the current page.",
+            with_browser(fill_form),
+            {
+                "form_data": {
+                    "type": "object",
+                    "description": "Map of field ID, name or CSS selector to value",
+                    "additionalProperties": {"type": "string"},
+                },
+                "typed": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Fields to type into key by key, e.g. autocomplete boxes",
+                },
+            },
+            required=["form_data"],
+            needs_browser=True,
+        )
+    )
+    registry.register(
+        Tool(
+            "get_weather",
+            "Get the current weather for a city.",
+            get_weather,
+            {"city": {"type": "string", "description": "City name"}},
+        )
+    )
+    registry.register(Tool("get_news", "Get the latest news headlines.", get_news))
+    registry.register(
+        Tool(
+            "save_note",
+            "Save a note for the user.",
+            save_note,
+            {"note": {"type": "string", "description": "The note text"}},
+        )
+    )
+    registry.register(Tool("get_notes", "Read the user's saved notes.", get_notes))
+
+    if get_background_browser is not None:
+        for tool in registry.tools.values():
+            if tool.needs_browser:
+                tool.parameters["background"] = {
+                    "type": "boolean",
+                    "description": "Use a hidden lightweight browser, for pages "
+                    "the user doesn't need to see",
+                }
+
+    return registry
@@ -0,0 +1,165 @@
+import os
+from typing import Any, Callable, Optional
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+# How browser.get() waits: "normal" (all resources), "eager" (DOM ready)
+# or "none" (returns immediately); the waits below take it from there
+PAGE_LOAD_STRATEGY = os.environ.get("PAGE_LOAD_STRATEGY", "eager")
+
+# Timeout budget of each kind of wait in seconds (can be overridden with
+# environment variables such as WAIT_ELEMENT_TIMEOUT)
+WAIT_TIMEOUTS = {
+    "page_load": float(os.environ.get("WAIT_PAGE_LOAD_TIMEOUT", "15")),
+    "document_ready": float(os.environ.get("WAIT_DOCUMENT_READY_TIMEOUT", "10")),
+    "element": float(os.environ.get("WAIT_ELEMENT_TIMEOUT", "5")),
+    "network_idle": float(os.environ.get("WAIT_NETWORK_IDLE_TIMEOUT", "3")),
+}
+WAIT_POLL_INTERVAL = float(os.environ.get("WAIT_POLL_INTERVAL", "0.1"))
+
+# Quiet period without new network requests that counts as idle
+NETWORK_IDLE_TIME = float(os.environ.get("NETWORK_IDLE_TIME", "0.5"))
+
+_RESOURCE_COUNT_SCRIPT = """
+return [document.readyState, performance.getEntriesByType('resource').length];
+"""
+
+
+def _wait(browser, timeout: Optional[float], operation: str) -> WebDriverWait:
+    """Build a WebDriverWait using the budget of an operation."""
+    return WebDriverWait(
+        browser,
+        WAIT_TIMEOUTS[operation] if timeout is None else timeout,
+        poll_frequency=WAIT_POLL_INTERVAL,
+    )
+
+
+def configure_timeouts(browser):
+    """Apply the page load budget to a new browser."""
+    try:
+        browser.set_page_load_timeout(WAIT_TIMEOUTS["page_load"])
+    except WebDriverException as e:
+        print(f"Error setting page load timeout: {e}")
+
+
+def wait_for_document_ready(
+    browser, timeout: Optional[float] = None, complete: bool = False
+) -> bool:
+    """
+    Wait until the page's DOM is ready.
+
+    Args:
+        browser: The browser instance
+        timeout: Seconds to wait, defaults to the document_ready budget
+        complete: Also wait for images and other subresources
+
+    Returns:
+        True if the page became ready in time
+    """
+    states = ("complete",) if complete else ("interactive", "complete")
+    try:
+        _wait(browser, timeout, "document_ready").until(
+            lambda driver: driver.execute_script("return document.readyState") in states
+        )
+        return True
+    except TimeoutException:
+        print("Timed out waiting for the page to load")
+        return False
+
+
+def wait_for_element(
+    browser,
+    by: str,
+    value: str,
+    timeout: Optional[float] = None,
+    clickable: bool = False,
+) -> Optional[Any]:
+    """
+    Wait until an element is present, or present and clickable.
+
+    Args:
+        browser: The browser instance
+        by: The locator strategy, e.g. By.NAME
+        value: The locator value
+        timeout: Seconds to wait, defaults to the element budget
+        clickable: Wait until the element is visible and enabled
+
+    Returns:
+        The element, or None if it didn't appear in time
+    """
+    condition = (
+        EC.element_to_be_clickable((by, value))
+        if clickable
+        else EC.presence_of_element_located((by, value))
+    )
+    try:
+        return _wait(browser, timeout, "element").until(condition)
+    except TimeoutException:
+        return None
+
+
+def wait_for_condition(
+    browser,
+    condition: Callable[[Any], Any],
+    timeout: Optional[float] = None,
+    operation: str = "element",
+) -> Optional[Any]:
+    """
+    Wait until a condition returns something truthy.
+
+    Args:
+        browser: The browser instance
+        condition: Called with the browser on every poll
+        timeout: Seconds to wait, defaults to the operation's budget
+        operation: The WAIT_TIMEOUTS budget to use
+
+    Returns:
+        The condition's last result, or None if it timed out
+    """
+    try:
+        return _wait(browser, timeout, operation).until(condition)
+    except TimeoutException:
+        return None
+
+
+def wait_for_network_idle(
+    browser,
+    idle_time: float = NETWORK_IDLE_TIME,
+    timeout: Optional[float] = None,
+) -> bool:
+    """
+    Wait until the page stops loading new resources.
+
+    The page counts as idle once it has finished loading and no resource
+    request has started for idle_time seconds, going by the browser's
+    resource timing entries.
+
+    Args:
+        browser: The browser instance
+        idle_time: Quiet period that counts as idle
+        timeout: Seconds to wait, defaults to the network_idle budget
+
+    Returns:
+        True if the page went idle in time
+    """
+    last_count = None
+    quiet_polls = 0
+    polls_needed = max(int(idle_time / WAIT_POLL_INTERVAL), 1)
+
+    def _idle(driver):
+        nonlocal last_count, quiet_polls
+        state, count = driver.execute_script(_RESOURCE_COUNT_SCRIPT)
+        if state == "complete" and count == last_count:
+            quiet_polls += 1
+        else:
+            quiet_polls = 0
+        last_count = count
+        return quiet_polls >= polls_needed
+
+    try:
+        _wait(browser, timeout, "network_idle").until(_idle)
+        return True
+    except TimeoutException:
+        return False
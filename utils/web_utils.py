@@ -1,51 +1,607 @@
+import json
+import os
+import socket
+import sys
+import threading
 import time
+from urllib.parse import quote_plus, urlparse
 
 from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 
+from utils.fetch_utils import fetch_page
+from utils.locator_utils import SEARCH_LOCATORS, find_locator
+from utils.profile_utils import (
+    acquire_profile,
+    attach_profile,
+    consent_handled,
+    export_cookies,
+    import_cookies,
+    mark_consent_handled,
+    release_profile,
+)
+from utils.wait_utils import (
+    PAGE_LOAD_STRATEGY,
+    configure_timeouts,
+    wait_for_document_ready,
+    wait_for_network_idle,
+)
+
+# Search results pages, so a search is a single page load
+SEARCH_URLS = {
+    "google": "https://www.google.com/search?q={query}",
+    "youtube": "https://www.youtube.com/results?search_query={query}",
+    "amazon": "https://www.amazon.com/s?k={query}",
+    "github": "https://github.com/search?q={query}&type=repositories",
+    "stackoverflow": "https://stackoverflow.com/search?q={query}",
+}
+
+# Browser backends in the order setup_browser() tries them, and the file
+# remembering which one works on each host
+BROWSER_BACKENDS = ["chrome", "safari", "firefox"]
+DRIVER_PROBE_PATH = os.environ.get("DRIVER_PROBE_PATH", "driver_probe.json")
+_driver_probe_lock = threading.Lock()
+
+# Settings of the "lean" browser profile used for scripted runs
+BLOCKLIST_PATH = os.path.join(os.path.dirname(__file__), "blocklist.txt")
+LEAN_WINDOW_SIZE = "1280,720"
+LEAN_CACHE_BYTES = 32 * 1024 * 1024
+LEAN_BLOCKED_URLS = [
+    # Fonts
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    # Audio and video, including YouTube's video streams
+    "*.mp4",
+    "*.webm",
+    "*.m4s",
+    "*.m3u8",
+    "*.mp3",
+    "*://*.googlevideo.com/*",
+]
+
+# Cookie consent buttons shown by sites on their home page
+CONSENT_BUTTONS = {
+    "google": "//button[contains(text(), 'Accept all')]",
+    "stackoverflow": "//button[contains(text(), 'Accept all cookies')]",
+}
+
+
+# Lookup that found each form field, by site and then selector
+_form_strategies = {}
+
+_FILL_FORM_SCRIPT = """
+const [fields, hints] = arguments;
+const lookups = {
+  id: (selector) => document.getElementById(selector),
+  name: (selector) => document.getElementsByName(selector)[0] || null,
+  css: (selector) => {
+    try {
+      return document.querySelector(selector);
+    } catch (e) {
+      return null;  // Not a valid CSS selector
+    }
+  },
+};
+
+function find(selector) {
+  const hint = (hints[selector] || {})[location.host];
+  const order = ["id", "name", "css"].filter((s) => s !== hint);
+  if (hint in lookups) order.unshift(hint);
+  for (const strategy of order) {
+    const element = lookups[strategy](selector);
+    if (element) return [strategy, element];
+  }
+  return [null, null];
+}
+
+function fill(element, value) {
+  const type = (element.type || "").toLowerCase();
+  if (type === "checkbox" || type === "radio") {
+    const checked = !["", "false", "0", "off", "no"].includes(
+      String(value).toLowerCase()
+    );
+    if (element.checked === checked) return;
+    element.checked = checked;
+  } else {
+    // Go through the prototype's setter so frameworks such as React see the change
+    const proto = Object.getPrototypeOf(element);
+    const descriptor = Object.getOwnPropertyDescriptor(proto, "value");
+    if (descriptor && descriptor.set) descriptor.set.call(element, String(value));
+    else element.value = String(value);
+  }
+  element.dispatchEvent(new Event("input", { bubbles: true }));
+  element.dispatchEvent(new Event("change", { bubbles: true }));
+}
+
+const results = fields.map(([selector, value, keystrokes]) => {
+  const [strategy, element] = find(selector);
+  if (element && !keystrokes) fill(element, value);
+  return [strategy, keystrokes ? element : null];
+});
+return [location.host, results];
+"""
+
+
+def _contains_text(expr):
+    """XPath test that expr contains {text}, ignoring the case of ASCII letters."""
+    upper = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return f"contains(translate({expr}, '{upper}', '{upper.lower()}'), {{text}})"
+
+
+# Elements click_button() matches, in order of preference; {text} is a
+# lowercase XPath literal
+CLICK_LOCATORS = {
+    "button": (
+        f"//button[{_contains_text('normalize-space(.)')}"
+        f" or {_contains_text('@aria-label')}]"
+    ),
+    "input": (
+        "//input[@type='button' or @type='submit' or @type='reset']"
+        f"[{_contains_text('@value')} or {_contains_text('@aria-label')}]"
+    ),
+    "role": (
+        f"//*[@role='button'][{_contains_text('normalize-space(.)')}"
+        f" or {_contains_text('@aria-label')}]"
+    ),
+    "link": (
+        f"//a[{_contains_text('normalize-space(.)')}"
+        f" or {_contains_text('@aria-label')}]"
+    ),
+}
+
+# Locator that last found a button, by site
+_click_locators = {}
+
+_FIND_BUTTON_SCRIPT = """
+const [locators, cache, target] = arguments;
+const cached = cache[location.host];
+locators.sort((a, b) => (b[0] === cached) - (a[0] === cached));
+
+function labels(element) {
+  return [
+    (element.innerText || element.textContent || "").replace(/\\s+/g, " ").trim(),
+    element.getAttribute("aria-label") || "",
+    element.value || "",
+  ].map((label) => label.toLowerCase());
+}
+
+// An exact match of any kind beats a partial one; among equals, the first
+// kind in the (cache-sorted) list wins
+let partial = null;
+for (const [name, xpath] of locators) {
+  const found = document.evaluate(
+    xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+  );
+  for (let i = 0; i < found.snapshotLength; i++) {
+    const element = found.snapshotItem(i);
+    if (!element.getClientRects().length) continue;  // Hidden
+    if (labels(element).includes(target)) return [location.host, name, element];
+    partial = partial || [location.host, name, element];
+  }
+}
+if (partial) return partial;
+return [location.host, null, null];
+"""
+
+
+# Default cap on extracted page content sent to the LLM, and the rough
+# size of a token used to turn token caps into character caps
+EXTRACT_MAX_CHARS = int(os.environ.get("EXTRACT_MAX_CHARS", "8000"))
+CHARS_PER_TOKEN = 4
+
+_MAIN_CONTENT_SCRIPT = r"""
+const maxChars = arguments[0];
+const SKIP = new Set([
+  "SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE", "SVG", "CANVAS", "IFRAME",
+  "NAV", "FOOTER", "ASIDE", "FORM", "BUTTON", "SELECT", "DIALOG",
+]);
+const SKIP_ROLES = new Set([
+  "navigation", "banner", "contentinfo", "complementary", "dialog", "alertdialog",
+]);
+const BLOCK_TAGS = "p,div,section,article,main,h1,h2,h3,h4,h5,h6,ul,ol,table,pre,blockquote";
+const NOISE = /comment|footer|cookie|consent|banner|sidebar|sponsor|promo|related|share|social|\bnav|menu|modal|popup|subscribe|newsletter|breadcrumb|\bads?\b/i;
+const CONTENT = /article|body|content|entry|main|post|text|story|result/i;
+
+function clean(text) {
+  return (text || "").replace(/\s+/g, " ").trim();
+}
+
+function isBoilerplate(element) {
+  if (SKIP.has(element.tagName) || element.hidden) return true;
+  if (element.getAttribute("aria-hidden") === "true") return true;
+  if (SKIP_ROLES.has(element.getAttribute("role"))) return true;
+  const name = `${element.id} ${element.getAttribute("class") || ""}`;
+  return NOISE.test(name) && !CONTENT.test(name);
+}
+
+function isSkipped(element) {
+  for (let node = element; node && node !== document.body; node = node.parentElement) {
+    if (isBoilerplate(node)) return true;
+  }
+  return false;
+}
+
+function linkDensity(element, textLength) {
+  let linkLength = 0;
+  for (const link of element.querySelectorAll("a")) {
+    linkLength += clean(link.textContent).length;
+  }
+  return textLength ? linkLength / textLength : 1;
+}
+
+// Score containers by the paragraphs inside them, like Readability
+const scores = new Map();
+for (const paragraph of document.body.querySelectorAll("p,pre,blockquote,td,li")) {
+  const text = clean(paragraph.textContent);
+  if (text.length < 25 || isSkipped(paragraph)) continue;
+
+  const score = 1 + text.split(",").length + Math.min(Math.floor(text.length / 100), 3);
+  let node = paragraph.parentElement;
+  for (let level = 0; node && level < 3; level++, node = node.parentElement) {
+    if (!scores.has(node)) {
+      const name = `${node.id} ${node.getAttribute("class") || ""}`;
+      let base = CONTENT.test(name) ? 25 : 0;
+      if (["MAIN", "ARTICLE"].includes(node.tagName) || node.getAttribute("role") === "main") {
+        base += 25;
+      }
+      scores.set(node, base);
+    }
+    scores.set(node, scores.get(node) + score / (level ? level * 2 : 1));
+  }
+}
+
+let root = document.querySelector("main,article,[role=main]") || document.body;
+let best = -Infinity;
+for (const [node, score] of scores) {
+  const adjusted = score * (1 - linkDensity(node, clean(node.textContent).length));
+  if (adjusted > best) {
+    best = adjusted;
+    root = node;
+  }
+}
+
+// Walk the main content into blocks
+const blocks = [];
+let size = 0;
+let truncated = false;
+
+function add(block, length) {
+  if (maxChars && size + length > maxChars) {
+    truncated = true;
+    if (block.type !== "paragraph" || maxChars - size < 25) return false;
+    block.text = block.text.slice(0, maxChars - size).replace(/\s+\S*$/, "") + "...";
+    length = block.text.length;
+  }
+  blocks.push(block);
+  size += length;
+  return !truncated;
+}
+
+function walk(element) {
+  for (const child of element.children) {
+    if (isBoilerplate(child)) continue;
+    const tag = child.tagName;
+    let go = true;
+
+    if (/^H[1-6]$/.test(tag)) {
+      const text = clean(child.textContent);
+      if (text) go = add({ type: "heading", level: Number(tag[1]), text }, text.length);
+    } else if (tag === "UL" || tag === "OL") {
+      const items = [];
+      for (const item of child.children) {
+        const text = clean(item.textContent);
+        if (item.tagName === "LI" && text) items.push(text);
+      }
+      const text = items.join("\n");
+      if (items.length) go = add({ type: "list", items, text }, text.length);
+    } else if (tag === "A" && child.getAttribute("href")) {
+      const text = clean(child.textContent);
+      if (text) go = add({ type: "link", text, href: child.href }, text.length);
+    } else if (tag === "P" || tag === "PRE" || tag === "BLOCKQUOTE" || !child.querySelector(BLOCK_TAGS)) {
+      const text = clean(child.textContent);
+      if (text) go = add({ type: "paragraph", text }, text.length);
+    } else {
+      walk(child);
+      go = !truncated;
+    }
+
+    if (!go) return;
+  }
+}
+
+walk(root);
+return { title: document.title, url: location.href, blocks, truncated };
+"""
+
+
+def build_search_url(site, query):
+    """Return the search results URL of a site for a query."""
+    return SEARCH_URLS[site].format(query=quote_plus(query.strip()))
+
+
+def load_blocklist(path=BLOCKLIST_PATH):
+    """Read the blocked domains, one per line, ignoring blank lines and # comments."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip().lower() for line in f]
+    except OSError as e:
+        print(f"Error reading blocklist {path}: {e}")
+        return []
+    return [line for line in lines if line]
+
+
+def block_resources(browser, domains=None):
+    """
+    Stop the browser from requesting fonts, media and blocklisted domains.
+
+    Uses the DevTools protocol, so it only works on Chromium-based browsers.
+
+    Args:
+        browser: The browser instance
+        domains: Domains to block, defaults to the blocklist file
+
+    Returns:
+        True if blocking was enabled
+    """
+    if not hasattr(browser, "execute_cdp_cmd"):
+        return False
+
+    if domains is None:
+        domains = load_blocklist()
+    patterns = list(LEAN_BLOCKED_URLS)
+    for domain in domains:
+        patterns += [f"*://{domain}/*", f"*://*.{domain}/*"]
+
+    try:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        return True
+    except WebDriverException as e:
+        print(f"Error blocking resources: {e}")
+        return False
 
-def setup_browser():
-    """Initialize and return a web browser."""
+
+def _probe_key():
+    """Return the key of this host's entry in the driver probe file."""
+    return f"{socket.gethostname()}:{sys.platform}"
+
+
+def load_driver_probe(path=None):
+    """
+    Return the backend that last started on this host.
+
+    Returns:
+        A dict with "backend" and "driver_path" (None for Safari, or when
+        the driver path couldn't be read), or None if nothing was recorded
+    """
+    try:
+        with open(path or DRIVER_PROBE_PATH, "r", encoding="utf-8") as f:
+            entry = json.load(f).get(_probe_key())
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not isinstance(entry, dict) or entry.get("backend") not in BROWSER_BACKENDS:
+        return None
+    return entry
+
+
+def save_driver_probe(backend, driver_path=None, path=None):
+    """Record the backend and driver binary that started on this host."""
+    path = path or DRIVER_PROBE_PATH
+    with _driver_probe_lock:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                probes = json.load(f)
+            if not isinstance(probes, dict):
+                probes = {}
+        except (OSError, ValueError):
+            probes = {}
+
+        entry = {"backend": backend, "driver_path": driver_path}
+        if probes.get(_probe_key()) == entry:
+            return
+        probes[_probe_key()] = entry
+
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(probes, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving driver probe: {e}")
+
+
+def _chrome_options(headless, lean, profile_dir=None):
+    """Build the Chrome options of a profile."""
     chrome_options = Options()
-    chrome_options.add_argument("--start-maximized")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    # Uncomment the line below if you want the browser to run in the background
-    # chrome_options.add_argument("--headless")
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+        chrome_options.add_argument("--hide-crash-restore-bubble")
+    chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument(f"--window-size={LEAN_WINDOW_SIZE}")
+    else:
+        chrome_options.add_argument("--start-maximized")
+    if lean:
+        chrome_options.add_argument(f"--disk-cache-size={LEAN_CACHE_BYTES}")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--mute-audio")
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-background-networking")
+        chrome_options.add_experimental_option(
+            "prefs",
+            {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.notifications": 2,
+            },
+        )
+    return chrome_options
+
+
+def _firefox_options(headless, lean, profile_dir=None):
+    """Build the Firefox options of a profile."""
+    from selenium.webdriver.firefox.options import Options as FirefoxOptions
+
+    firefox_options = FirefoxOptions()
+    firefox_options.page_load_strategy = PAGE_LOAD_STRATEGY
+    if profile_dir:
+        firefox_options.add_argument("-profile")
+        firefox_options.add_argument(profile_dir)
+    if headless:
+        width, height = LEAN_WINDOW_SIZE.split(",")
+        firefox_options.add_argument("-headless")
+        firefox_options.add_argument(f"--width={width}")
+        firefox_options.add_argument(f"--height={height}")
+    if lean:
+        # Firefox has no DevTools URL blocking, so only the
+        # asset types are turned off
+        firefox_options.set_preference("permissions.default.image", 2)
+        firefox_options.set_preference("gfx.downloadable_fonts.enabled", False)
+        firefox_options.set_preference("media.autoplay.default", 5)
+        firefox_options.set_preference(
+            "browser.cache.disk.capacity", LEAN_CACHE_BYTES // 1024
+        )
+    return firefox_options
+
+
+def _launch_chrome(headless, lean, driver_path=None, profile_dir=None):
+    """Start Chrome, resolving chromedriver with Selenium Manager unless given."""
+    from selenium.webdriver.chrome.service import Service as ChromeService
+
+    options = _chrome_options(headless, lean, profile_dir)
+    if driver_path:
+        return webdriver.Chrome(
+            options=options, service=ChromeService(executable_path=driver_path)
+        )
+    return webdriver.Chrome(options=options)
+
+
+def _launch_safari(headless, lean, driver_path=None, profile_dir=None):
+    """Start Safari, which only exists on macOS and can't run headless."""
+    return webdriver.Safari()
+
+
+def _launch_firefox(headless, lean, driver_path=None, profile_dir=None):
+    """Start Firefox, resolving geckodriver with Selenium Manager unless given."""
+    from selenium.webdriver.firefox.service import Service as FirefoxService
+
+    options = _firefox_options(headless, lean, profile_dir)
+    if driver_path:
+        return webdriver.Firefox(
+            options=options, service=FirefoxService(executable_path=driver_path)
+        )
+    return webdriver.Firefox(options=options)
+
+
+_LAUNCHERS = {
+    "chrome": _launch_chrome,
+    "safari": _launch_safari,
+    "firefox": _launch_firefox,
+}
+
+
+def _driver_path(browser):
+    """Return the driver binary a browser was started with, if known."""
+    path = getattr(getattr(browser, "service", None), "path", None)
+    return path if isinstance(path, str) and os.path.isabs(path) else None
 
-    try:
-        # Try using Selenium's built-in manager (newer versions of Selenium)
-        browser = webdriver.Chrome(options=chrome_options)
-        return browser
-    except Exception as e:
-        print(f"Error with default Chrome setup: {e}")
-        try:
-            # Fallback to Safari on macOS
-            print("Trying Safari as a fallback...")
-            browser = webdriver.Safari()
-            return browser
-        except Exception as e2:
-            print(f"Error with Safari fallback: {e2}")
 
-            # Last resort - try Firefox if available
+def setup_browser(headless=False, profile="interactive"):
+    """
+    Initialize and return a web browser.
+
+    Tries Chrome, then Safari (macOS only), then Firefox. The backend and
+    driver binary that worked are remembered per host in the driver probe
+    file, so later starts go straight to them and skip the driver lookup;
+    the other backends are only probed again if that one stops working.
+
+    Chrome and Firefox run on a persistent profile per backend and profile
+    under BROWSER_PROFILE_DIR, so cookie consent and site logins survive
+    restarts. The profile is locked while the browser runs; a browser that
+    finds it in use starts on a temporary profile loaded with the shared
+    cookie jar instead. Close browsers with close_browser() to unlock it.
+
+    Args:
+        headless: Run the browser without a window, e.g. on a server
+        profile: "interactive" for a normal maximized browser, or "lean" for
+            scripted runs: headless, without images, fonts, media or
+            blocklisted trackers, with a small window and cache
+    """
+    lean = profile == "lean"
+    headless = headless or lean
+
+    # Safari only exists on macOS and can't run headless
+    backends = [
+        backend
+        for backend in BROWSER_BACKENDS
+        if backend != "safari" or (sys.platform == "darwin" and not headless)
+    ]
+    known = load_driver_probe()
+    if known and known["backend"] in backends:
+        backends.remove(known["backend"])
+        backends.insert(0, known["backend"])
+
+    for backend in backends:
+        attempts = [None]
+        if known and known["backend"] == backend and known.get("driver_path"):
+            # Fall back to a fresh driver lookup if the binary moved
+            attempts.insert(0, known["driver_path"])
+
+        profile_lock = acquire_profile(backend, profile)
+        profile_dir = profile_lock.path if profile_lock else None
+        for driver_path in attempts:
             try:
-                print("Trying Firefox as a last resort...")
-                from selenium.webdriver.firefox.options import Options as FirefoxOptions
-
-                firefox_options = FirefoxOptions()
-                browser = webdriver.Firefox(options=firefox_options)
-                return browser
-            except Exception as e3:
-                print(f"Error with Firefox fallback: {e3}")
-                print("\n=== BROWSER INITIALIZATION FAILED ===")
-                print("Please install Chrome, Safari, or Firefox and try again.")
-                print(
-                    "Alternatively, you can run with SKIP_BROWSER=True to disable browser features."
-                )
-                print("=== BROWSER INITIALIZATION FAILED ===\n")
-                return None
+                browser = _LAUNCHERS[backend](headless, lean, driver_path, profile_dir)
+            except Exception as e:
+                print(f"Error starting {backend}: {e}")
+                continue
+
+            if profile_lock:
+                attach_profile(browser, profile_lock)
+            else:
+                import_cookies(browser)
+            configure_timeouts(browser)
+            if lean:
+                block_resources(browser)
+            save_driver_probe(backend, _driver_path(browser))
+            return browser
+
+        if profile_lock:
+            profile_lock.release()
+
+    print("\n=== BROWSER INITIALIZATION FAILED ===")
+    print("Please install Chrome, Safari, or Firefox and try again.")
+    print(
+        "Alternatively, you can run with SKIP_BROWSER=True to disable browser features."
+    )
+    print("=== BROWSER INITIALIZATION FAILED ===\n")
+    return None
+
+
+def close_browser(browser):
+    """
+    Quit a browser, saving its cookies to the cookie jar and unlocking its profile.
+
+    Returns:
+        True if the browser quit cleanly
+    """
+    export_cookies(browser)
+    try:
+        browser.quit()
+        return True
+    except Exception as e:
+        print(f"Error closing browser: {e}")
+        return False
+    finally:
+        release_profile(browser)
 
 
 def open_website(browser, url):
@@ -53,20 +609,72 @@ def open_website(browser, url):
     if not url.startswith("http"):
         url = "https://" + url
     browser.get(url)
-    time.sleep(2)  # Wait for the page to load
+    wait_for_document_ready(browser)
     return True
 
 
+def open_search_results(browser, site, query):
+    """
+    Navigate straight to a site's search results page.
+
+    Returns:
+        True if the results page loaded, False if navigation failed or the
+        site redirected elsewhere (e.g. to a consent page)
+    """
+    url = build_search_url(site, query)
+    try:
+        browser.get(url)
+        wait_for_document_ready(browser)
+        return urlparse(browser.current_url).netloc == urlparse(url).netloc
+    except WebDriverException as e:
+        print(f"Error opening {site} search results: {e}")
+        return False
+
+
+def _accept_consent(browser, site):
+    """
+    Accept a site's cookie consent dialog, if it shows one.
+
+    Once accepted on a persistent profile the consent cookie is kept, so
+    the dialog isn't looked for again.
+    """
+    if consent_handled(browser, site):
+        return
+    try:
+        consent_buttons = browser.find_elements(By.XPATH, CONSENT_BUTTONS[site])
+        if consent_buttons:
+            consent_buttons[0].click()
+            mark_consent_handled(browser, site)
+    except WebDriverException:
+        pass
+
+
+def _submit_search(browser, site, query):
+    """Wait for a site's search box to become usable, type the query and submit it."""
+    if "opener" in SEARCH_LOCATORS[site]:
+        # The search input may only appear once its button is clicked
+        opener = find_locator(browser, site, "opener")
+        if opener is not None:
+            opener.click()
+
+    search_box = find_locator(browser, site, "box")
+    if search_box is None:
+        raise NoSuchElementException(f"{site} search box did not appear")
+    search_box.clear()
+    search_box.send_keys(query)
+    search_box.send_keys(Keys.RETURN)
+
+
 def search_youtube(browser, query):
     """Search for a video on YouTube."""
+    if open_search_results(browser, "youtube", query):
+        return True
+
+    # Fall back to typing into the home page's search box
     open_website(browser, "youtube.com")
-    time.sleep(2)  # Wait for page to load
 
     try:
-        search_box = browser.find_element(By.NAME, "search_query")
-        search_box.clear()
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+        _submit_search(browser, "youtube", query)
         return True
     except Exception as e:
         print(f"Error searching YouTube: {e}")
@@ -75,25 +683,16 @@ def search_youtube(browser, query):
 
 def search_google(browser, query):
     """Perform a Google search."""
+    if open_search_results(browser, "google", query):
+        return True
+
+    # Fall back to typing into the home page's search box
     open_website(browser, "google.com")
-    time.sleep(1)
 
     try:
-        # Handle cookie consent if it appears
-        try:
-            consent_buttons = browser.find_elements(
-                By.XPATH, "//button[contains(text(), 'Accept all')]"
-            )
-            if consent_buttons:
-                consent_buttons[0].click()
-                time.sleep(1)
-        except:
-            pass
-
-        search_box = browser.find_element(By.NAME, "q")
-        search_box.clear()
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+        _accept_consent(browser, "google")
+
+        _submit_search(browser, "google", query)
         return True
     except Exception as e:
         print(f"Error searching Google: {e}")
@@ -102,14 +701,14 @@ def search_google(browser, query):
 
 def search_amazon(browser, query):
     """Search for products on Amazon."""
+    if open_search_results(browser, "amazon", query):
+        return True
+
+    # Fall back to typing into the home page's search box
     open_website(browser, "amazon.com")
-    time.sleep(2)
 
     try:
-        search_box = browser.find_element(By.ID, "twotabsearchtextbox")
-        search_box.clear()
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+        _submit_search(browser, "amazon", query)
         return True
     except Exception as e:
         print(f"Error searching Amazon: {e}")
@@ -118,20 +717,14 @@ def search_amazon(browser, query):
 
 def search_github(browser, query):
     """Search for repositories on GitHub."""
+    if open_search_results(browser, "github", query):
+        return True
+
+    # Fall back to typing into the home page's search box
     open_website(browser, "github.com")
-    time.sleep(2)
 
     try:
-        # Click on the search box
-        search_button = browser.find_element(By.XPATH, "//button[@aria-label='Search']")
-        search_button.click()
-        time.sleep(1)
-
-        # Find the search input that appears
-        search_box = browser.find_element(By.ID, "query-builder-test")
-        search_box.clear()
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+        _submit_search(browser, "github", query)
         return True
     except Exception as e:
         print(f"Error searching GitHub: {e}")
@@ -140,25 +733,16 @@ def search_github(browser, query):
 
 def search_stackoverflow(browser, query):
     """Search for questions on Stack Overflow."""
+    if open_search_results(browser, "stackoverflow", query):
+        return True
+
+    # Fall back to typing into the home page's search box
     open_website(browser, "stackoverflow.com")
-    time.sleep(2)
 
     try:
-        # Handle cookie consent if it appears
-        try:
-            consent_buttons = browser.find_elements(
-                By.XPATH, "//button[contains(text(), 'Accept all cookies')]"
-            )
-            if consent_buttons:
-                consent_buttons[0].click()
-                time.sleep(1)
-        except:
-            pass
-
-        search_box = browser.find_element(By.NAME, "q")
-        search_box.clear()
-        search_box.send_keys(query)
-        search_box.send_keys(Keys.RETURN)
+        _accept_consent(browser, "stackoverflow")
+
+        _submit_search(browser, "stackoverflow", query)
         return True
     except Exception as e:
         print(f"Error searching Stack Overflow: {e}")
@@ -178,85 +762,191 @@ def take_screenshot(browser, filename=None):
         return f"Error taking screenshot: {str(e)}"
 
 
-def scroll_down(browser, amount=1):
-    """Scroll down the page by a certain amount."""
+def scroll_down(browser, amount=1, direction="down"):
+    """Scroll the page by a certain amount, down unless direction is "up"."""
+    step = -500 if direction == "up" else 500
     try:
         for _ in range(amount):
-            browser.execute_script("window.scrollBy(0, 500);")
-            time.sleep(0.5)
+            browser.execute_script("window.scrollBy(0, arguments[0]);", step)
+        # Give lazily loaded content a moment to arrive, but no longer
+        wait_for_network_idle(browser, idle_time=0.2)
         return True
     except Exception as e:
         print(f"Error scrolling: {e}")
         return False
 
 
-def fill_form(browser, form_data):
+def fill_form(browser, form_data, typed=None):
     """
     Fill a form with the provided data.
 
+    All fields are looked up and filled by a single injected script, which
+    fires the input and change events a page's scripts listen for. The
+    lookup that found each field (ID, name or CSS selector) is remembered
+    per site and tried first next time.
+
     Args:
         browser: The browser instance
         form_data: A dictionary mapping field names or IDs to values
+        typed: Selectors of fields to type into key by key instead, for
+            fields that react to individual keystrokes (e.g. autocomplete)
+
+    Returns:
+        A dict with the "filled" and "unresolved" selectors, or False if
+        the form couldn't be filled
     """
-    try:
-        for selector, value in form_data.items():
-            try:
-                # Try to find by ID first
-                element = browser.find_element(By.ID, selector)
-            except:
-                try:
-                    # Then try by name
-                    element = browser.find_element(By.NAME, selector)
-                except:
-                    try:
-                        # Then try by CSS selector
-                        element = browser.find_element(By.CSS_SELECTOR, selector)
-                    except:
-                        print(f"Could not find form element: {selector}")
-                        continue
-
-            # Clear the field and enter the value
-            element.clear()
-            element.send_keys(value)
+    typed = set(typed or ())
+    fields = [
+        [selector, value, selector in typed] for selector, value in form_data.items()
+    ]
+    hints = {
+        selector: {
+            host: strategies[selector]
+            for host, strategies in _form_strategies.items()
+            if selector in strategies
+        }
+        for selector, _, _ in fields
+    }
 
-        return True
-    except Exception as e:
+    try:
+        host, results = browser.execute_script(_FILL_FORM_SCRIPT, fields, hints)
+    except WebDriverException as e:
         print(f"Error filling form: {e}")
         return False
 
+    filled, unresolved = [], []
+    strategies = _form_strategies.setdefault(host, {})
+    for (selector, value, keystrokes), (strategy, element) in zip(fields, results):
+        if strategy is None:
+            print(f"Could not find form element: {selector}")
+            unresolved.append(selector)
+            continue
+
+        strategies[selector] = strategy
+        if keystrokes:
+            try:
+                element.clear()
+                element.send_keys(value)
+            except WebDriverException as e:
+                print(f"Error typing into form element {selector}: {e}")
+                unresolved.append(selector)
+                continue
+        filled.append(selector)
+
+    return {"filled": filled, "unresolved": unresolved}
+
+
+def _xpath_literal(text):
+    """Quote text as an XPath string literal, whatever quotes it contains."""
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    parts = text.split("'")
+    return "concat(" + ', "\'", '.join(f"'{part}'" for part in parts) + ")"
+
 
 def click_button(browser, button_text):
-    """Click a button with the given text."""
+    """
+    Click a button with the given text.
+
+    Buttons, submit inputs, ARIA buttons and links are matched by visible
+    text, ARIA label or value in one script call, ignoring the case of
+    ASCII letters, preferring visible elements and exact matches of any
+    kind over partial ones. The kind of element that matched is remembered
+    per site and tried first next time.
+    """
+    target = button_text.strip().lower()
+    text = _xpath_literal(target)
+    locators = [
+        [name, xpath.format(text=text)] for name, xpath in CLICK_LOCATORS.items()
+    ]
     try:
-        # Try to find button by text
-        button = browser.find_element(
-            By.XPATH, f"//button[contains(text(), '{button_text}')]"
+        host, name, button = browser.execute_script(
+            _FIND_BUTTON_SCRIPT, locators, _click_locators, target
         )
+    except WebDriverException as e:
+        print(f"Error clicking button '{button_text}': {e}")
+        return False
+
+    if button is None:
+        print(f"Error clicking button '{button_text}': no matching element")
+        return False
+    _click_locators[host] = name
+
+    try:
         button.click()
-        return True
-    except:
+    except WebDriverException:
+        # Covered or off-screen elements can still be clicked from a script
         try:
-            # Try to find input button by value
-            button = browser.find_element(
-                By.XPATH,
-                f"//input[@type='button' or @type='submit'][contains(@value, '{button_text}')]",
-            )
-            button.click()
-            return True
-        except:
-            try:
-                # Try to find a link with the text
-                button = browser.find_element(
-                    By.XPATH, f"//a[contains(text(), '{button_text}')]"
-                )
-                button.click()
-                return True
-            except Exception as e:
-                print(f"Error clicking button '{button_text}': {e}")
-                return False
+            browser.execute_script("arguments[0].click();", button)
+        except WebDriverException as e:
+            print(f"Error clicking button '{button_text}': {e}")
+            return False
+    return True
 
 
-def extract_text(browser, selector_type="body", selector_value="body"):
+def extract_content(browser, max_chars=None, max_tokens=None):
+    """
+    Extract the main content of the page as structured blocks.
+
+    The DOM is read once by an injected script, which scores the page's
+    containers by the text they hold, readability-style, and keeps the best
+    one, leaving out navigation, footers, cookie banners and other
+    boilerplate.
+
+    Args:
+        browser: The browser instance
+        max_chars: Stop after this many characters of text
+        max_tokens: Stop after roughly this many LLM tokens
+
+    Returns:
+        A dict with the page "title", "url", a list of "blocks" and whether
+        the content was "truncated". Each block has a "type" of heading
+        (with a "level"), paragraph, list (with "items") or link (with an
+        "href"), and its "text".
+    """
+    limit = _content_limit(max_chars, max_tokens)
+    return browser.execute_script(_MAIN_CONTENT_SCRIPT, limit or 0)
+
+
+def format_blocks(content):
+    """Render extracted content as Markdown-style text."""
+    lines = [f"# {content['title']}"] if content.get("title") else []
+    for block in content["blocks"]:
+        if block["type"] == "heading":
+            lines.append("#" * min(block["level"] + 1, 6) + " " + block["text"])
+        elif block["type"] == "list":
+            lines.append("\n".join(f"- {item}" for item in block["items"]))
+        elif block["type"] == "link":
+            lines.append(f"[{block['text']}]({block['href']})")
+        else:
+            lines.append(block["text"])
+    if content.get("truncated"):
+        lines.append("[...]")
+    return "\n\n".join(lines)
+
+
+def _content_limit(max_chars=None, max_tokens=None):
+    """Combine a character and a token cap into one character cap."""
+    limits = [
+        limit
+        for limit in (max_chars, max_tokens and max_tokens * CHARS_PER_TOKEN)
+        if limit
+    ]
+    return min(limits) if limits else None
+
+
+def extract_text(
+    browser,
+    selector_type="body",
+    selector_value="body",
+    mode="text",
+    max_chars=None,
+    max_tokens=None,
+    url=None,
+    fetch=True,
+):
     """
     Extract text from an element on the page.
 
@@ -264,8 +954,28 @@ def extract_text(browser, selector_type="body", selector_value="body"):
         browser: The browser instance
         selector_type: The type of selector (id, class, tag, xpath)
         selector_value: The value of the selector
+        mode: "text" for the element's rendered text, or "main" for the
+            page's main content only (the selector is ignored), see
+            extract_content
+        max_chars: Cut the text after this many characters
+        max_tokens: Cut the text after roughly this many LLM tokens
+        url: Open this page first. In "main" mode it is fetched over plain
+            HTTP if it doesn't need JavaScript, leaving the browser alone.
+        fetch: Whether to try fetching url over HTTP
     """
     try:
+        if url:
+            if mode == "main" and fetch:
+                content = fetch_page(url, _content_limit(max_chars, max_tokens))
+                if content is not None:
+                    return format_blocks(content)
+            if browser is None:
+                return "Browser automation is not available right now."
+            open_website(browser, url)
+
+        if mode == "main":
+            return format_blocks(extract_content(browser, max_chars, max_tokens))
+
         if selector_type == "id":
             element = browser.find_element(By.ID, selector_value)
         elif selector_type == "class":
@@ -277,7 +987,11 @@ def extract_text(browser, selector_type="body", selector_value="body"):
         else:  # Default to CSS selector
             element = browser.find_element(By.CSS_SELECTOR, selector_value)
 
-        return element.text
+        text = element.text
+        limit = _content_limit(max_chars, max_tokens)
+        if limit and len(text) > limit:
+            text = text[:limit] + " [...]"
+        return text
     except Exception as e:
         print(f"Error extracting text: {e}")
         return f"Error extracting text: {str(e)}"
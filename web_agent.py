@@ -1,15 +1,41 @@
+import json
 import os
 import re
 import secrets
 import threading
 import time
 import webbrowser
+from contextlib import nullcontext
 from functools import wraps
-
-from flask import Flask, jsonify, redirect, render_template, request, session, url_for
+from itertools import islice
+
+from flask import (
+    Flask,
+    Response,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
 
 from utils.ai_utils import GPT4oAssistant
 from utils.api_utils import get_news, get_notes, get_weather, save_note
+from utils.browser_pool import BrowserPool, BrowserUnavailable
+from utils.locator_utils import locator_health
+from utils.result_utils import (
+    SEARCH_RESULTS_SHOWN,
+    SITE_NAMES,
+    SITE_PATTERN,
+    fan_out_search,
+    format_results,
+    iter_search_results,
+    parse_sites,
+)
+from utils.router_utils import KeywordAutomaton
+from utils.tool_utils import build_default_registry
 from utils.web_utils import (
     click_button,
     extract_text,
@@ -20,14 +46,13 @@ from utils.web_utils import (
     search_github,
     search_google,
     search_stackoverflow,
-    search_youtube,
-    setup_browser,
     take_screenshot,
 )
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)  # Generate a secure secret key
 SKIP_BROWSER = True  # Set to False to enable web automation
+PRECONNECT_API = True  # Open the OpenAI connection in the background at startup
 
 # Simulated user database (replace with a real database in production)
 users = {
@@ -53,60 +78,101 @@ def login_required(f):
 # Add natural language processing capabilities
 class CommandProcessor:
     def __init__(self):
-        # Command patterns for better recognition
+        # Command patterns for better recognition, in priority order. Each
+        # pattern starts with its keyword and is only tried where that
+        # keyword occurs, so a long message is never rescanned or
+        # backtracked over by patterns that can't match it.
         self.command_patterns = {
+            "multi_search": [
+                (
+                    keyword,
+                    # The query ends on a non-space character, so each
+                    # whitespace run is only scanned for "on" once
+                    rf"{keyword}\s+(?:for\s+)?[\"']?"
+                    rf"([^\"'\s](?:[^\"']*?[^\"'\s])?)[\"']?\s+on\s+"
+                    rf"((?:{SITE_PATTERN})(?:(?:\s*(?:,|&|\band\b))+\s*(?:{SITE_PATTERN}))+)",
+                )
+                for keyword in ("search", "find", "look")
+            ],
             "youtube": [
-                r'(?:search|find|look\s+for|show)?\s*(?:on)?\s*youtube\s+(?:for)?\s*["\']?([^"\']+)["\']?',
-                r'youtube\s+(?:search|find)?\s*["\']?([^"\']+)["\']?',
-                r'find\s+videos?\s+(?:of|about|on)?\s*["\']?([^"\']+)["\']?',
+                (
+                    "youtube",
+                    r'youtube\s+(?:(?:search|find)\s+)?(?:for\s+)?["\']?([^"\']+)["\']?',
+                ),
+                (
+                    "find",
+                    r'find\s+videos?\s+(?:(?:of|about|on)\s+)?["\']?([^"\']+)["\']?',
+                ),
             ],
             "google": [
-                r'(?:search|find|look\s+for)?\s*(?:on)?\s*google\s+(?:for)?\s*["\']?([^"\']+)["\']?',
-                r'google\s+(?:search|find)?\s*["\']?([^"\']+)["\']?',
-                r'search\s+(?:for|about)?\s*["\']?([^"\']+)["\']?',
-            ],
-            "weather": [
-                r"(?:what\'?s?\s+the)?\s*weather\s+(?:in|at|for)?\s*([^?]+)",
-                r"(?:how\'?s?\s+the)?\s*weather\s+(?:in|at|for)?\s*([^?]+)",
+                (
+                    "google",
+                    r'google\s+(?:(?:search|find)\s+)?(?:for\s+)?["\']?([^"\']+)["\']?',
+                ),
+                ("search", r'search\s+(?:(?:for|about)\s+)?["\']?([^"\']+)["\']?'),
             ],
+            "weather": [("weather", r"weather\s+(?:(?:in|at|for)\s+)?([^?]+)")],
             "open": [
-                r"open\s+(?:the\s+)?(?:website\s+)?([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
-                r"go\s+to\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
-                r"visit\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+                (
+                    "open",
+                    r"open\s+(?:the\s+)?(?:website\s+)?([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+                ),
+                ("go", r"go\s+to\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"),
+                ("visit", r"visit\s+([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})"),
             ],
         }
+        # Commands tried only at the first occurrence of each keyword: their
+        # query runs up to a later anchor ("on <sites>"), so trying every
+        # occurrence would rescan the rest of the text each time
+        self.first_occurrence_only = {"multi_search"}
+        self.parameter_names = {
+            "multi_search": ("query", "sites"),
+            "youtube": "query",
+            "google": "query",
+            "weather": "location",
+            "open": "website",
+        }
+
+        self.compiled_patterns = {
+            command: [(keyword, re.compile(pattern)) for keyword, pattern in patterns]
+            for command, patterns in self.command_patterns.items()
+        }
+        self.keywords = KeywordAutomaton(
+            {
+                keyword
+                for patterns in self.command_patterns.values()
+                for keyword, _ in patterns
+            }
+        )
 
     def extract_command(self, text):
         """Extract command and parameters from natural language input"""
         text = text.lower().strip()
 
-        # Check for YouTube search
-        for pattern in self.command_patterns["youtube"]:
-            match = re.search(pattern, text)
-            if match:
-                query = match.group(1).strip()
-                return {"command": "youtube", "query": query}
-
-        # Check for Google search
-        for pattern in self.command_patterns["google"]:
-            match = re.search(pattern, text)
-            if match:
-                query = match.group(1).strip()
-                return {"command": "google", "query": query}
-
-        # Check for weather
-        for pattern in self.command_patterns["weather"]:
-            match = re.search(pattern, text)
-            if match:
-                location = match.group(1).strip()
-                return {"command": "weather", "location": location}
-
-        # Check for opening websites
-        for pattern in self.command_patterns["open"]:
-            match = re.search(pattern, text)
-            if match:
-                website = match.group(1).strip()
-                return {"command": "open", "website": website}
+        # Find every keyword in one pass; commands whose keywords don't
+        # occur are never tried
+        positions = {}
+        for position, keyword in self.keywords.find_all(text):
+            positions.setdefault(keyword, []).append(position)
+
+        for command, patterns in self.compiled_patterns.items():
+            for keyword, pattern in patterns:
+                occurrences = positions.get(keyword, ())
+                if command in self.first_occurrence_only:
+                    occurrences = occurrences[:1]
+                for position in occurrences:
+                    match = pattern.match(text, position)
+                    if match:
+                        names = self.parameter_names[command]
+                        if isinstance(names, str):
+                            names = (names,)
+                        return {
+                            "command": command,
+                            **{
+                                name: match.group(index).strip()
+                                for index, name in enumerate(names, 1)
+                            },
+                        }
 
         # Default to chat if no command is recognized
         return {"command": "chat", "message": text}
@@ -115,11 +181,14 @@ class CommandProcessor:
 # Update the WebAssistant class
 class WebAssistant:
     def __init__(self):
-        self.browser = None if SKIP_BROWSER else setup_browser()
+        # Users share a pool of pre-launched headless browsers
+        self.browser_pool = None if SKIP_BROWSER else BrowserPool()
         self.command_processor = CommandProcessor()
         # Initialize AI assistant
         try:
             self.ai_assistant = GPT4oAssistant()
+            if PRECONNECT_API:
+                self.ai_assistant.preconnect()
         except Exception as e:
             print(f"Error initializing AI assistant: {e}")
             # Create a fallback method if GPT4oAssistant doesn't have process_command
@@ -134,26 +203,66 @@ class WebAssistant:
 
         return FallbackAssistant()
 
+    def _browser_session(self):
+        """Return a browser lease for one command, or None without web automation"""
+        if self.browser_pool is None:
+            return nullcontext()
+        return self.browser_pool.session()
+
+    def _tools_for(self, lease):
+        """Build the model's tools around the browser leased for a command"""
+        return build_default_registry(lease.get if lease else lambda: None)
+
     def process_command(self, command_text):
         """Process user command with improved understanding"""
+        with self._browser_session() as lease:
+            try:
+                return self._process_command(command_text, lease)
+            except (TimeoutError, BrowserUnavailable):
+                return "All browsers are busy right now. Please try again in a moment."
+
+    def _search_results(self, site, name, query, lease):
+        """Search a site and list its top results in the reply"""
+        # Results are fetched over HTTP where possible, and only need a
+        # browser for sites that render them with JavaScript
+        results = iter_search_results(site, query, lease.get if lease else None)
+        results = list(islice(results, SEARCH_RESULTS_SHOWN))
+        if results:
+            return f"Top {name} results for '{query}':\n{format_results(results)}"
+        if SKIP_BROWSER:
+            return (
+                f"I would search {name} for '{query}', but web automation is disabled."
+            )
+        return f"Sorry, I couldn't find any {name} results for '{query}'."
+
+    def _multi_search(self, query, sites):
+        """Search several sites at once and list each one's top results"""
+        # Every site that needs a browser gets its own from the pool
+        session = self.browser_pool.session if self.browser_pool else None
+        sections = []
+        for site, results in fan_out_search(parse_sites(sites), query, session):
+            name = SITE_NAMES[site]
+            if results is None:
+                sections.append(f"{name} took too long to respond.")
+            elif results:
+                sections.append(f"{name}:\n{format_results(results)}")
+            else:
+                sections.append(f"No {name} results found.")
+        return f"Results for '{query}':\n\n" + "\n\n".join(sections)
+
+    def _process_command(self, command_text, lease):
+        """Process a user command using the browser lease of the request"""
         # First try to extract command using pattern matching
         extracted = self.command_processor.extract_command(command_text)
 
-        if extracted["command"] == "youtube":
-            query = extracted["query"]
-            if SKIP_BROWSER:
-                return f"I would search YouTube for '{query}', but web automation is disabled."
-            else:
-                search_youtube(self.browser, query)
-                return f"Searching YouTube for '{query}'."
+        if extracted["command"] == "multi_search":
+            return self._multi_search(extracted["query"], extracted["sites"])
+
+        elif extracted["command"] == "youtube":
+            return self._search_results("youtube", "YouTube", extracted["query"], lease)
 
         elif extracted["command"] == "google":
-            query = extracted["query"]
-            if SKIP_BROWSER:
-                return f"I would search Google for '{query}', but web automation is disabled."
-            else:
-                search_google(self.browser, query)
-                return f"Searching Google for '{query}'."
+            return self._search_results("google", "Google", extracted["query"], lease)
 
         elif extracted["command"] == "weather":
             location = extracted["location"]
@@ -171,7 +280,7 @@ class WebAssistant:
             if SKIP_BROWSER:
                 return f"I would open {website}, but web automation is disabled."
             else:
-                open_website(self.browser, website)
+                open_website(lease.get(), website)
                 return f"Opening {website}."
 
         # If pattern matching fails or it's a chat command, use AI to understand
@@ -182,6 +291,10 @@ class WebAssistant:
                     return self.ai_assistant.process_command(command_text)
                 elif hasattr(self.ai_assistant, "generate_response"):
                     return self.ai_assistant.generate_response(command_text)
+                elif hasattr(self.ai_assistant, "ask"):
+                    return self.ai_assistant.ask(
+                        command_text, tools=self._tools_for(lease)
+                    )
                 else:
                     # Fallback response if no appropriate method exists
                     return f"I understood your message: '{command_text}', but I'm not sure how to respond appropriately."
@@ -189,6 +302,26 @@ class WebAssistant:
                 print(f"Error processing with AI: {e}")
                 return f"I received your message, but I'm having trouble processing it right now."
 
+    def stream_command(self, command_text):
+        """Process a user command, yielding the response as it is generated"""
+        extracted = self.command_processor.extract_command(command_text)
+
+        # Only chat replies come from the model; commands answer in one piece
+        if extracted["command"] != "chat" or not hasattr(
+            self.ai_assistant, "ask_stream"
+        ):
+            yield self.process_command(command_text)
+            return
+
+        with self._browser_session() as lease:
+            try:
+                yield from self.ai_assistant.ask_stream(
+                    command_text, tools=self._tools_for(lease)
+                )
+            except Exception as e:
+                print(f"Error streaming from AI: {e}")
+                yield "I received your message, but I'm having trouble processing it right now."
+
 
 # Initialize the assistant
 assistant = WebAssistant()
@@ -252,6 +385,52 @@ def chat():
     return jsonify({"response": response})
 
 
+@app.route("/api/chat/stream", methods=["POST"])
+@login_required
+def chat_stream():
+    """Stream the chat response to the client as server-sent events"""
+    data = request.json
+    user_message = data.get("message", "")
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+
+    def generate():
+        for delta in assistant.stream_command(user_message):
+            yield f"data: {json.dumps({'delta': delta})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/browser_pool", methods=["GET"])
+@login_required
+def browser_pool_stats():
+    """Report browser pool occupancy, including how many requests are queued"""
+    if assistant.browser_pool is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **assistant.browser_pool.stats()})
+
+
+@app.route("/api/locator_health", methods=["GET"])
+@login_required
+def search_locator_health():
+    """Report which search box locators still work and which are degrading"""
+    report = locator_health()
+    return jsonify(
+        {
+            "locators": report,
+            "degraded": [
+                entry for entry in report if entry["status"] in ("degrading", "failing")
+            ],
+        }
+    )
+
+
 def open_browser():
     """Open the browser after a short delay"""
     time.sleep(1)
@@ -443,8 +622,9 @@ def execute_command():
                     }
                 )
             else:
-                # Actually open the website using the browser
-                success = open_website(url)
+                # Actually open the website using a pooled browser
+                with assistant.browser_pool.browser() as browser:
+                    success = open_website(browser, url)
                 return jsonify({"success": success, "message": f"Opened {url}"})
         except Exception as e:
             return jsonify(
@@ -474,7 +654,8 @@ def execute_command():
                 )
             else:
                 # Actually perform the search
-                success = search_google(url)
+                with assistant.browser_pool.browser() as browser:
+                    success = search_google(browser, query)
                 return jsonify({"success": success, "message": f"Searched for {query}"})
         except Exception as e:
             return jsonify(